@@ -20,6 +20,22 @@ from resources.check_in import blp as CheckInBluePrint
 from resources.comment import blp as CommentBluePrint
 from resources.reaction import blp as ReactionBluePrint
 from resources.feed import blp as FeedBluePrint
+from resources.metrics import blp as MetricsBluePrint
+
+# Registers the SQLAlchemy listeners that keep feed_entries, feed versions and the feed cache in sync
+import services.feed_entries
+import services.feed_version
+import services.feed_stream
+import services.circle_stream
+import services.check_in_counts
+import services.circle_stats
+import services.streaks
+from services.feed_cache import init_feed_cache
+from services.read_cache import init_read_cache
+from services.membership import init_membership_cache
+from services.broker import init_broker
+from services.read_markers import init_read_markers
+from commands import feed_cli, check_ins_cli, circles_cli, goals_cli
 
 
 
@@ -42,8 +58,49 @@ def create_app(db_url=None):
     app.config["SQLALCHEMY_DATABASE_URI"] = db_url or os.getenv("DATABASE_URL", "sqlite:///data.db")
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
+    # Feed read path: "fanout" reads the materialized feed_entries table, "pull" computes it per request,
+    # "hybrid" fans out everyone except authors with at least FEED_HIGH_FANOUT_THRESHOLD followers,
+    # whose check-ins are pulled and merged in at read time
+    app.config["FEED_STRATEGY"] = os.getenv("FEED_STRATEGY", "fanout")
+    app.config["FEED_HIGH_FANOUT_THRESHOLD"] = int(os.getenv("FEED_HIGH_FANOUT_THRESHOLD", 10000))
+    # A high-fanout author is fanned out again only once they drop below this many followers, so an
+    # author hovering around the threshold does not trigger a follower backfill on every unfollow
+    app.config["FEED_HIGH_FANOUT_EXIT_THRESHOLD"] = int(os.getenv("FEED_HIGH_FANOUT_EXIT_THRESHOLD", 9000))
+    # How long removals are remembered for /feed/since; older cursors get a 410
+    app.config["FEED_TOMBSTONE_DAYS"] = int(os.getenv("FEED_TOMBSTONE_DAYS", 7))
+
+    # Per-user feed response cache (in-process LRU; see services/feed_cache.py for shared backends)
+    app.config["FEED_CACHE_SIZE"] = int(os.getenv("FEED_CACHE_SIZE", 1024))
+    app.config["FEED_CACHE_TTL"] = int(os.getenv("FEED_CACHE_TTL", 60))
+
+    # Coalesced, short-lived cache for circle detail and leaderboard responses
+    app.config["READ_CACHE_SIZE"] = int(os.getenv("READ_CACHE_SIZE", 512))
+    app.config["READ_CACHE_TTL"] = int(os.getenv("READ_CACHE_TTL", 5))
+
+    # Per-worker cache of circle membership checks; 0 disables it
+    app.config["MEMBERSHIP_CACHE_SIZE"] = int(os.getenv("MEMBERSHIP_CACHE_SIZE", 4096))
+    app.config["MEMBERSHIP_CACHE_TTL"] = int(os.getenv("MEMBERSHIP_CACHE_TTL", 0))
+
+    # Server-sent event streams: per-client queue bound and keep-alive interval
+    app.config["STREAM_QUEUE_SIZE"] = int(os.getenv("STREAM_QUEUE_SIZE", 100))
+    app.config["STREAM_KEEPALIVE_SECONDS"] = int(os.getenv("STREAM_KEEPALIVE_SECONDS", 15))
+
+    # Chat read markers are written at most this often per user and circle (0 writes every update)
+    app.config["READ_MARKER_FLUSH_SECONDS"] = int(os.getenv("READ_MARKER_FLUSH_SECONDS", 5))
+
+    # Circle messages older than this are moved to gzip NDJSON files by `flask circles archive-messages`
+    app.config["MESSAGE_RETENTION_DAYS"] = int(os.getenv("MESSAGE_RETENTION_DAYS", 90))
+    app.config["MESSAGE_ARCHIVE_DIR"] = os.getenv(
+        "MESSAGE_ARCHIVE_DIR", os.path.join(app.instance_path, "message_archive")
+    )
+
     # Initialize a Flask-SQLAlchemy database instance with your Flask application
     db.init_app(app)
+    init_feed_cache(app)
+    init_read_cache(app)
+    init_membership_cache(app)
+    init_broker(app)
+    init_read_markers(app)
 
     # Set up database migrations for the Flask application using Flask-Migrate (built on Alembic)
     migrate = Migrate(app, db)
@@ -121,6 +178,12 @@ def create_app(db_url=None):
     api.register_blueprint(CommentBluePrint)
     api.register_blueprint(ReactionBluePrint)
     api.register_blueprint(FeedBluePrint)
+    api.register_blueprint(MetricsBluePrint)
+
+    app.cli.add_command(feed_cli)
+    app.cli.add_command(check_ins_cli)
+    app.cli.add_command(circles_cli)
+    app.cli.add_command(goals_cli)
 
     return app
 
@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from db import db
+from services.feed_entries import rebuild_feed_entries, prune_tombstones
+from services.feed_query import high_fanout_threshold
+from services.check_in_counts import recount_check_in_counters
+from services.streaks import recompute_goal_streaks
+from services.circle_stats import rebuild_circle_member_stats, compact_daily_stats
+from services.message_archive import archive_messages
+
+feed_cli = AppGroup("feed", help="Maintenance commands for the materialized feed.")
+check_ins_cli = AppGroup("check-ins", help="Maintenance commands for check-ins.")
+circles_cli = AppGroup("circles", help="Maintenance commands for circles.")
+goals_cli = AppGroup("goals", help="Maintenance commands for goals.")
+
+
+@feed_cli.command("rebuild")
+def rebuild_feed():
+    """Recompute feed_entries from check-ins, follows and circle memberships."""
+    rebuild_feed_entries(db.session.connection(), high_fanout_threshold())
+    db.session.commit()
+    click.echo("Feed entries rebuilt.")
+
+
+@feed_cli.command("prune-tombstones")
+def prune_feed_tombstones():
+    """Delete feed removal records older than FEED_TOMBSTONE_DAYS."""
+    cutoff = datetime.utcnow() - timedelta(days=current_app.config["FEED_TOMBSTONE_DAYS"])
+    prune_tombstones(db.session.connection(), cutoff)
+    db.session.commit()
+    click.echo(f"Feed tombstones older than {cutoff.isoformat()} pruned.")
+
+
+@check_ins_cli.command("recount")
+def recount_check_ins():
+    """Recompute comment_count and reaction_count on every check-in."""
+    updated = recount_check_in_counters(db.session.connection())
+    db.session.commit()
+    click.echo(f"Recounted comments and reactions on {updated} check-ins.")
+
+
+@circles_cli.command("rebuild-stats")
+def rebuild_circle_stats():
+    """Recompute circle_member_stats and the daily buckets from check-ins and goals."""
+    rebuild_circle_member_stats(db.session.connection())
+    db.session.commit()
+    click.echo("Circle member stats rebuilt.")
+
+
+@circles_cli.command("compact-stats")
+def compact_circle_stats():
+    """Drop daily leaderboard buckets older than any window needs."""
+    compact_daily_stats(db.session.connection())
+    db.session.commit()
+    click.echo("Old daily circle stats removed.")
+
+
+@circles_cli.command("archive-messages")
+@click.option("--days", type=int, default=None, help="Archive messages older than this (default MESSAGE_RETENTION_DAYS).")
+def archive_circle_messages(days):
+    """Move old circle messages out of circle_messages into the per-circle monthly archive files."""
+    if days is None:
+        days = current_app.config["MESSAGE_RETENTION_DAYS"]
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    # Commits batch by batch on its own connections
+    moved = archive_messages(db.engine, current_app.config["MESSAGE_ARCHIVE_DIR"], cutoff)
+    click.echo(f"Archived {moved} circle messages sent before {cutoff.isoformat()}.")
+
+
+@goals_cli.command("recompute-streaks")
+def recompute_streaks():
+    """Recompute every goal's streaks from its check-in history."""
+    updated = recompute_goal_streaks(db.session.connection())
+    db.session.commit()
+    click.echo(f"Recomputed streaks for {updated} goals.")
@@ -20,8 +20,8 @@ export function useReceivedBuddyRequests() {
   return useQuery({
     queryKey: ['buddy-requests', 'received'],
     queryFn: async () => {
-      const response = await api.get<BuddyRequest[]>('/buddy/requests/received');
-      return response.data;
+      const response = await api.get<{ requests: BuddyRequest[]; next_cursor: string | null }>('/buddy/requests/received');
+      return response.data.requests;
     },
   });
 }
@@ -31,8 +31,8 @@ export function useSentBuddyRequests() {
   return useQuery({
     queryKey: ['buddy-requests', 'sent'],
     queryFn: async () => {
-      const response = await api.get<BuddyRequest[]>('/buddy/requests/sent');
-      return response.data;
+      const response = await api.get<{ requests: BuddyRequest[]; next_cursor: string | null }>('/buddy/requests/sent');
+      return response.data.requests;
     },
   });
 }
@@ -0,0 +1,26 @@
+"""follows following index
+
+Revision ID: 3b7e1d94a6c2
+Revises: f2c95e7b3a18
+Create Date: 2026-10-17 16:05:48.271903
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b7e1d94a6c2'
+down_revision = 'f2c95e7b3a18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('follows', schema=None) as batch_op:
+        batch_op.create_index('ix_follows_following', ['following_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('follows', schema=None) as batch_op:
+        batch_op.drop_index('ix_follows_following')
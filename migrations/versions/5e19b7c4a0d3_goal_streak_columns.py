@@ -0,0 +1,33 @@
+"""goal streak columns
+
+Revision ID: 5e19b7c4a0d3
+Revises: c3a8f61d2e94
+Create Date: 2026-10-17 14:09:12.304871
+
+Existing goals start with empty streaks; run ``flask goals recompute-streaks``
+after upgrading to rebuild them from check-in history.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e19b7c4a0d3'
+down_revision = 'c3a8f61d2e94'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('goals', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('current_streak', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('longest_streak', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('last_period', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('goals', schema=None) as batch_op:
+        batch_op.drop_column('last_period')
+        batch_op.drop_column('longest_streak')
+        batch_op.drop_column('current_streak')
@@ -0,0 +1,46 @@
+"""feed entries
+
+Revision ID: 6d0c8a3f5e27
+Revises: 3b7e1d94a6c2
+Create Date: 2026-10-17 16:12:30.884217
+
+The table starts empty; run ``flask feed rebuild`` once after upgrading to
+materialize existing feeds.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6d0c8a3f5e27'
+down_revision = '3b7e1d94a6c2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('feed_entries',
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    sa.Column('check_in_id', sa.Integer(), nullable=False),
+    sa.Column('author_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('via_self', sa.Boolean(), nullable=False),
+    sa.Column('via_follow', sa.Boolean(), nullable=False),
+    sa.Column('via_circle', sa.Boolean(), nullable=False),
+    sa.ForeignKeyConstraint(['author_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['check_in_id'], ['check_ins.id'], ),
+    sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('owner_id', 'check_in_id')
+    )
+    with op.batch_alter_table('feed_entries', schema=None) as batch_op:
+        batch_op.create_index('ix_feed_entries_author', ['author_id'], unique=False)
+        batch_op.create_index('ix_feed_entries_owner_created', ['owner_id', 'created_at', 'check_in_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('feed_entries', schema=None) as batch_op:
+        batch_op.drop_index('ix_feed_entries_owner_created')
+        batch_op.drop_index('ix_feed_entries_author')
+
+    op.drop_table('feed_entries')
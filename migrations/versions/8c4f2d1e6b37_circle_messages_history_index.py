@@ -0,0 +1,26 @@
+"""circle messages history index
+
+Revision ID: 8c4f2d1e6b37
+Revises: 2f67adaeb5f5
+Create Date: 2026-10-17 09:12:41.318604
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c4f2d1e6b37'
+down_revision = '2f67adaeb5f5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('circle_messages', schema=None) as batch_op:
+        batch_op.create_index('ix_circle_messages_circle_sent', ['circle_id', 'sent_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('circle_messages', schema=None) as batch_op:
+        batch_op.drop_index('ix_circle_messages_circle_sent')
@@ -0,0 +1,40 @@
+"""feed tombstones
+
+Revision ID: 9e4a7b2c1d58
+Revises: 6d0c8a3f5e27
+Create Date: 2026-10-17 16:14:02.519640
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e4a7b2c1d58'
+down_revision = '6d0c8a3f5e27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('feed_tombstones',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('owner_id', sa.Integer(), nullable=True),
+    sa.Column('author_id', sa.Integer(), nullable=True),
+    sa.Column('check_in_id', sa.Integer(), nullable=False),
+    sa.Column('removed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['author_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('feed_tombstones', schema=None) as batch_op:
+        batch_op.create_index('ix_feed_tombstones_author_removed', ['author_id', 'removed_at'], unique=False)
+        batch_op.create_index('ix_feed_tombstones_owner_removed', ['owner_id', 'removed_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('feed_tombstones', schema=None) as batch_op:
+        batch_op.drop_index('ix_feed_tombstones_owner_removed')
+        batch_op.drop_index('ix_feed_tombstones_author_removed')
+
+    op.drop_table('feed_tombstones')
@@ -0,0 +1,41 @@
+"""circle member stats
+
+Revision ID: a18f6c3d9b40
+Revises: 9e4a7b2c1d58
+Create Date: 2026-10-17 16:20:44.103958
+
+The table starts empty, so leaderboards show zeros for existing activity until
+``flask circles rebuild-stats`` has run once after upgrading.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a18f6c3d9b40'
+down_revision = '9e4a7b2c1d58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('circle_member_stats',
+    sa.Column('circle_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('total_check_ins', sa.Integer(), nullable=False),
+    sa.Column('active_goals', sa.Integer(), nullable=False),
+    sa.Column('last_check_in', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['circle_id'], ['circles.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('circle_id', 'user_id')
+    )
+    with op.batch_alter_table('circle_member_stats', schema=None) as batch_op:
+        batch_op.create_index('ix_circle_member_stats_rank', ['circle_id', 'total_check_ins'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('circle_member_stats', schema=None) as batch_op:
+        batch_op.drop_index('ix_circle_member_stats_rank')
+
+    op.drop_table('circle_member_stats')
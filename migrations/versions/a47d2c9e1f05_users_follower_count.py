@@ -0,0 +1,33 @@
+"""users follower count
+
+Revision ID: a47d2c9e1f05
+Revises: 5e19b7c4a0d3
+Create Date: 2026-10-17 14:15:37.662094
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a47d2c9e1f05'
+down_revision = '5e19b7c4a0d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('follower_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.create_index(batch_op.f('ix_users_follower_count'), ['follower_count'], unique=False)
+
+    op.execute(
+        'UPDATE users SET follower_count = '
+        '(SELECT COUNT(*) FROM follows WHERE follows.following_id = users.id)'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_users_follower_count'))
+        batch_op.drop_column('follower_count')
@@ -0,0 +1,37 @@
+"""circle read markers
+
+Revision ID: b71e0a94c5d2
+Revises: 8c4f2d1e6b37
+Create Date: 2026-10-17 11:38:05.904217
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b71e0a94c5d2'
+down_revision = '8c4f2d1e6b37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('circle_read_markers',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('circle_id', sa.Integer(), nullable=False),
+    sa.Column('last_read_message_id', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['circle_id'], ['circles.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'circle_id')
+    )
+    with op.batch_alter_table('circle_messages', schema=None) as batch_op:
+        batch_op.create_index('ix_circle_messages_circle_id', ['circle_id', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('circle_messages', schema=None) as batch_op:
+        batch_op.drop_index('ix_circle_messages_circle_id')
+
+    op.drop_table('circle_read_markers')
@@ -0,0 +1,34 @@
+"""circle memberships unique and joined indexes
+
+Revision ID: c3a8f61d2e94
+Revises: b71e0a94c5d2
+Create Date: 2026-10-17 14:02:41.518330
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3a8f61d2e94'
+down_revision = 'b71e0a94c5d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Nothing stopped a user joining a circle twice before this revision; keep
+    # the oldest membership of each pair so the unique index can be built.
+    op.execute(
+        'DELETE FROM circle_memberships WHERE id NOT IN '
+        '(SELECT MIN(id) FROM circle_memberships GROUP BY circle_id, user_id)'
+    )
+    with op.batch_alter_table('circle_memberships', schema=None) as batch_op:
+        batch_op.create_index('ux_circle_memberships_circle_user', ['circle_id', 'user_id'], unique=True)
+        batch_op.create_index('ix_circle_memberships_circle_joined', ['circle_id', 'joined_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('circle_memberships', schema=None) as batch_op:
+        batch_op.drop_index('ix_circle_memberships_circle_joined')
+        batch_op.drop_index('ux_circle_memberships_circle_user')
@@ -0,0 +1,41 @@
+"""circle member daily stats
+
+Revision ID: c5b2e8f07a13
+Revises: a18f6c3d9b40
+Create Date: 2026-10-17 16:22:17.650284
+
+The table starts empty, so the week/month/30d leaderboard windows show zeros
+until ``flask circles rebuild-stats`` (which also fills the daily buckets) has
+run once after upgrading.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5b2e8f07a13'
+down_revision = 'a18f6c3d9b40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('circle_member_daily_stats',
+    sa.Column('circle_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('check_ins', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['circle_id'], ['circles.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('circle_id', 'user_id', 'day')
+    )
+    with op.batch_alter_table('circle_member_daily_stats', schema=None) as batch_op:
+        batch_op.create_index('ix_circle_member_daily_stats_circle_day', ['circle_id', 'day'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('circle_member_daily_stats', schema=None) as batch_op:
+        batch_op.drop_index('ix_circle_member_daily_stats_circle_day')
+
+    op.drop_table('circle_member_daily_stats')
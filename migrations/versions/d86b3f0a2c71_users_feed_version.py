@@ -0,0 +1,26 @@
+"""users feed version
+
+Revision ID: d86b3f0a2c71
+Revises: a47d2c9e1f05
+Create Date: 2026-10-17 14:18:04.127530
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd86b3f0a2c71'
+down_revision = 'a47d2c9e1f05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('feed_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('feed_version')
@@ -0,0 +1,29 @@
+"""users high fanout
+
+Revision ID: f2c95e7b3a18
+Revises: d86b3f0a2c71
+Create Date: 2026-10-17 14:41:26.905318
+
+Deployments on the "hybrid" feed strategy should run ``flask feed rebuild``
+after upgrading to flag their high-fanout authors.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c95e7b3a18'
+down_revision = 'd86b3f0a2c71'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('high_fanout', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('high_fanout')
@@ -8,4 +8,10 @@ from models.buddy_request import BuddyRequestModel
 from models.target import TargetModel
 from models.check_in import CheckInModel
 from models.comment import CommentModel
-from models.reaction import ReactModel
\ No newline at end of file
+from models.reaction import ReactModel
+from models.feed_entry import FeedEntryModel
+
+from models.feed_tombstone import FeedTombstoneModel
+from models.circle_member_stats import CircleMemberStatsModel
+from models.circle_member_daily_stats import CircleMemberDailyStatsModel
+from models.circle_read_marker import CircleReadMarkerModel
\ No newline at end of file
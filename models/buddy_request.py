@@ -17,5 +17,11 @@ class BuddyRequestModel(db.Model):
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     responded_at = db.Column(db.DateTime, nullable=True)
 
+    __table_args__ = (
+        # Received and sent listings: a user's requests by status, newest first
+        db.Index("ix_buddy_requests_to_status_created", "to_user_id", "status", "created_at", "id"),
+        db.Index("ix_buddy_requests_from_created", "from_user_id", "created_at", "id"),
+    )
+
     from_user = db.relationship("UserModel", foreign_keys=[from_user_id], backref="sent_buddy_requests")
     to_user = db.relationship("UserModel", foreign_keys=[to_user_id], backref="received_buddy_requests")
@@ -1,5 +1,6 @@
 from db import db
 from datetime import datetime
+from sqlalchemy.orm import joinedload
 
 class CheckInModel(db.Model):
     __tablename__ = "check_ins"
@@ -8,10 +9,27 @@ class CheckInModel(db.Model):
     goal_id = db.Column(db.Integer, db.ForeignKey("goals.id"), unique=False, nullable=True)
     target_id = db.Column(db.Integer, db.ForeignKey("targets.id"), unique=False, nullable=True)
     content = db.Column(db.String(255), nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow())
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Maintained by services/check_in_counts.py
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    reaction_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
     user = db.relationship("UserModel", back_populates="check_ins")
     goal = db.relationship("GoalModel", back_populates="check_ins")
     target = db.relationship("TargetModel", back_populates="check_ins")
     comments = db.relationship("CommentModel", back_populates="check_in")
-    reactions = db.relationship("ReactModel", back_populates="check_in")
\ No newline at end of file
+    reactions = db.relationship("ReactModel", back_populates="check_in")
+
+    __table_args__ = (
+        db.Index("ix_check_ins_user_created", "user_id", "created_at"),
+        db.Index("ix_check_ins_created_id", "created_at", "id"),
+    )
+
+
+def check_in_schema_loads():
+    """Loader options for the relations CheckInSchema dumps, fetched in the same SELECT."""
+    return (
+        joinedload(CheckInModel.user),
+        joinedload(CheckInModel.goal),
+        joinedload(CheckInModel.target),
+    )
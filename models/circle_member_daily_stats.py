@@ -0,0 +1,13 @@
+from db import db
+
+class CircleMemberDailyStatsModel(db.Model):
+    __tablename__ = "circle_member_daily_stats"
+
+    circle_id = db.Column(db.Integer, db.ForeignKey("circles.id"), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    check_ins = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index("ix_circle_member_daily_stats_circle_day", "circle_id", "day"),
+    )
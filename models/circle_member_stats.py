@@ -0,0 +1,14 @@
+from db import db
+
+class CircleMemberStatsModel(db.Model):
+    __tablename__ = "circle_member_stats"
+
+    circle_id = db.Column(db.Integer, db.ForeignKey("circles.id"), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    total_check_ins = db.Column(db.Integer, nullable=False, default=0)
+    active_goals = db.Column(db.Integer, nullable=False, default=0)
+    last_check_in = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index("ix_circle_member_stats_rank", "circle_id", "total_check_ins"),
+    )
@@ -8,3 +8,8 @@ class CircleMembershipModel(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), unique=False, nullable=False)
     joined_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     role = db.Column(db.String(50), nullable=False, default="member")
+
+    __table_args__ = (
+        db.Index("ux_circle_memberships_circle_user", "circle_id", "user_id", unique=True),
+        db.Index("ix_circle_memberships_circle_joined", "circle_id", "joined_at", "id"),
+    )
@@ -9,6 +9,12 @@ class CircleMessageModel(db.Model):
     message = db.Column(db.String(255), nullable=False)
     sent_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index("ix_circle_messages_circle_sent", "circle_id", "sent_at", "id"),
+        # Unread counts: messages in a circle after the reader's last_read_message_id
+        db.Index("ix_circle_messages_circle_id", "circle_id", "id"),
+    )
+
 
     circle = db.relationship("CircleModel", back_populates="circle_messages")
     user = db.relationship("UserModel", back_populates="circle_messages")
\ No newline at end of file
@@ -0,0 +1,10 @@
+from db import db
+from datetime import datetime
+
+class CircleReadMarkerModel(db.Model):
+    __tablename__ = "circle_read_markers"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    circle_id = db.Column(db.Integer, db.ForeignKey("circles.id"), primary_key=True)
+    last_read_message_id = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -0,0 +1,22 @@
+from db import db
+from datetime import datetime
+
+class FeedEntryModel(db.Model):
+    __tablename__ = "feed_entries"
+
+    owner_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    check_in_id = db.Column(db.Integer, db.ForeignKey("check_ins.id"), primary_key=True)
+    author_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    # Why the check-in is in the owner's feed. A row is removed once all three are False.
+    via_self = db.Column(db.Boolean, nullable=False, default=False)
+    via_follow = db.Column(db.Boolean, nullable=False, default=False)
+    via_circle = db.Column(db.Boolean, nullable=False, default=False)
+
+    check_in = db.relationship("CheckInModel")
+
+    __table_args__ = (
+        db.Index("ix_feed_entries_owner_created", "owner_id", "created_at", "check_in_id"),
+        db.Index("ix_feed_entries_author", "author_id"),
+    )
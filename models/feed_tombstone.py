@@ -0,0 +1,18 @@
+from db import db
+from datetime import datetime
+
+class FeedTombstoneModel(db.Model):
+    __tablename__ = "feed_tombstones"
+
+    id = db.Column(db.Integer, primary_key=True)
+    # Either one owner's removed entry, or (owner_id NULL) a deleted check-in of a
+    # high-fanout author that applies to everyone following them
+    owner_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
+    author_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
+    check_in_id = db.Column(db.Integer, nullable=False)
+    removed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index("ix_feed_tombstones_owner_removed", "owner_id", "removed_at"),
+        db.Index("ix_feed_tombstones_author_removed", "author_id", "removed_at"),
+    )
@@ -3,6 +3,10 @@ from db import db
 
 class FollowModel(db.Model):
     __tablename__ = "follows"
+    __table_args__ = (
+        # Follower lookups by author (fan-out, follower counts); the primary key covers follower_id first
+        db.Index("ix_follows_following", "following_id"),
+    )
 
     # Relationship type constants
     TYPE_FOLLOW = 'follow'
@@ -24,6 +24,10 @@ class GoalModel(db.Model):
     end_date = db.Column(db.DateTime, nullable=True)
     is_active = db.Column(db.Boolean, nullable=False)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Streak state, maintained by services/streaks.py
+    current_streak = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    longest_streak = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    last_period = db.Column(db.Integer, nullable=True)
 
     targets = db.relationship("TargetModel", back_populates="goal", lazy="dynamic")
     user = db.relationship("UserModel", back_populates="goals")
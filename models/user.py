@@ -10,6 +10,12 @@ class UserModel(db.Model):
     email = db.Column(db.String(80), unique=True, nullable=False)
     account_created_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     is_staff = db.Column(db.Boolean(), nullable=False)
+    # Bumped whenever the user's feed changes other than by a new check-in (follows, circles, deletions)
+    feed_version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    # Maintained by the follow listeners in services/feed_entries.py; decides push vs pull in the hybrid feed
+    follower_count = db.Column(db.Integer, nullable=False, default=0, server_default="0", index=True)
+    # Set when follower_count reaches FEED_HIGH_FANOUT_THRESHOLD, cleared below FEED_HIGH_FANOUT_EXIT_THRESHOLD
+    high_fanout = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
 
     circles = db.relationship("CircleModel", back_populates="users", secondary="circle_memberships")
     targets = db.relationship("TargetModel", back_populates="user", lazy="dynamic")
@@ -1,16 +1,47 @@
 from flask_smorest import Blueprint, abort
 from flask.views import MethodView
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import desc
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import joinedload
 from datetime import datetime
 
 from db import db
 from models import BuddyRequestModel, FollowModel, UserModel
-from schemas import BuddyRequestSchema, BuddyRequestCreateSchema, BuddyListSchema
+from services.pagination import (
+    encode_cursor, decode_cursor, encode_key_cursor, decode_key_cursor, before_cursor, after_cursor, page_with_cursor
+)
+from schemas import BuddyRequestCreateSchema, BuddyRequestQueryArgsSchema, BuddyRequestPageSchema, BuddyListSchema, BuddyListQueryArgsSchema
 
 blp = Blueprint("buddy", __name__, description="Operations on accountability buddies")
 
 
+def buddy_request_page(query, args, status):
+    """
+    One page of buddy requests, newest first, with both users loaded in the same query.
+
+    ``status`` is a request status or "all".
+    """
+    query = query.options(
+        joinedload(BuddyRequestModel.from_user), joinedload(BuddyRequestModel.to_user)
+    )
+    if status != "all":
+        query = query.filter(BuddyRequestModel.status == status)
+
+    if args.get("cursor"):
+        try:
+            cursor = decode_cursor(args["cursor"])
+        except ValueError:
+            abort(400, message="Invalid buddy request cursor.")
+        query = query.filter(before_cursor(BuddyRequestModel.created_at, BuddyRequestModel.id, cursor))
+
+    rows = query.order_by(
+        desc(BuddyRequestModel.created_at), desc(BuddyRequestModel.id)
+    ).limit(args["limit"] + 1).all()
+    requests, next_cursor = page_with_cursor(rows, args["limit"], key=lambda r: (r.created_at, r.id))
+    return {"requests": requests, "next_cursor": next_cursor}
+
+
 @blp.route("/buddy/request/<int:user_id>")
 class BuddyRequest(MethodView):
     @jwt_required()
@@ -70,36 +101,38 @@ class BuddyRequest(MethodView):
 @blp.route("/buddy/requests/received")
 class BuddyRequestsReceived(MethodView):
     @jwt_required()
-    @blp.response(200, BuddyRequestSchema(many=True))
-    def get(self):
+    @blp.arguments(BuddyRequestQueryArgsSchema, location="query")
+    @blp.response(200, BuddyRequestPageSchema)
+    def get(self, args):
         """
-        Get all pending buddy requests received by the current user.
+        Get buddy requests received by the current user, newest first.
+
+        Only pending requests unless ?status= says otherwise (accepted,
+        declined or all). Page with ?limit= and the returned next_cursor as
+        ?cursor=.
         """
         current_user_id = int(get_jwt_identity())
 
-        requests = BuddyRequestModel.query.filter_by(
-            to_user_id=current_user_id,
-            status=BuddyRequestModel.STATUS_PENDING
-        ).all()
-
-        return requests
+        query = BuddyRequestModel.query.filter(BuddyRequestModel.to_user_id == current_user_id)
+        return buddy_request_page(query, args, args.get("status") or BuddyRequestModel.STATUS_PENDING)
 
 
 @blp.route("/buddy/requests/sent")
 class BuddyRequestsSent(MethodView):
     @jwt_required()
-    @blp.response(200, BuddyRequestSchema(many=True))
-    def get(self):
+    @blp.arguments(BuddyRequestQueryArgsSchema, location="query")
+    @blp.response(200, BuddyRequestPageSchema)
+    def get(self, args):
         """
-        Get all buddy requests sent by the current user.
+        Get buddy requests sent by the current user, newest first.
+
+        Every status unless filtered with ?status=pending, accepted or
+        declined. Page with ?limit= and the returned next_cursor as ?cursor=.
         """
         current_user_id = int(get_jwt_identity())
 
-        requests = BuddyRequestModel.query.filter_by(
-            from_user_id=current_user_id
-        ).all()
-
-        return requests
+        query = BuddyRequestModel.query.filter(BuddyRequestModel.from_user_id == current_user_id)
+        return buddy_request_page(query, args, args.get("status") or "all")
 
 
 @blp.route("/buddy/request/<int:request_id>/accept")
@@ -208,31 +241,66 @@ class BuddyRequestDecline(MethodView):
 @blp.route("/buddy/list")
 class BuddyList(MethodView):
     @jwt_required()
+    @blp.arguments(BuddyListQueryArgsSchema, location="query")
     @blp.response(200, BuddyListSchema)
-    def get(self):
+    def get(self, args):
         """
-        Get all accountability buddies for the current user.
+        Get the current user's accountability buddies in one joined query.
+
+        Sorted by ?sort=buddies_since (default) or username, ?order=desc
+        (default) or asc. Pass ?limit= to page, then the returned next_cursor
+        as ?cursor=; without a limit every buddy is returned.
         """
         current_user_id = int(get_jwt_identity())
 
-        # Get all buddy relationships
-        buddy_relationships = FollowModel.query.filter_by(
-            follower_id=current_user_id,
-            relationship_type=FollowModel.TYPE_BUDDY
-        ).all()
-
-        buddies = []
-        for rel in buddy_relationships:
-            buddy = UserModel.query.get(rel.following_id)
-            if buddy:
-                buddies.append({
-                    "user_id": buddy.id,
-                    "username": buddy.username,
-                    "email": buddy.email,
-                    "buddies_since": rel.created_at
-                })
-
-        return {"buddies": buddies}
+        query = db.session.query(
+            UserModel.id, UserModel.username, UserModel.email, FollowModel.created_at
+        ).join(
+            FollowModel, FollowModel.following_id == UserModel.id
+        ).filter(
+            FollowModel.follower_id == current_user_id,
+            FollowModel.relationship_type == FollowModel.TYPE_BUDDY
+        )
+
+        if args["sort"] == "username":
+            sort_column, encode, decode = UserModel.username, encode_key_cursor, decode_key_cursor
+            key = lambda row: (row.username, row.id)
+        else:
+            sort_column, encode, decode = FollowModel.created_at, encode_cursor, decode_cursor
+            key = lambda row: (row.created_at, row.id)
+        newest_first = args["order"] == "desc"
+
+        if args.get("cursor"):
+            try:
+                cursor = decode(args["cursor"])
+            except ValueError:
+                abort(400, message="Invalid buddy cursor.")
+            position = before_cursor if newest_first else after_cursor
+            query = query.filter(position(sort_column, UserModel.id, cursor))
+
+        ordering = (sort_column, UserModel.id)
+        if newest_first:
+            ordering = tuple(desc(column) for column in ordering)
+        query = query.order_by(*ordering)
+
+        next_cursor = None
+        if args.get("limit"):
+            rows, next_cursor = page_with_cursor(
+                query.limit(args["limit"] + 1).all(), args["limit"], key=key, encode=encode
+            )
+        else:
+            rows = query.all()
+
+        buddies = [
+            {
+                "user_id": row.id,
+                "username": row.username,
+                "email": row.email,
+                "buddies_since": row.created_at,
+            }
+            for row in rows
+        ]
+        return {"buddies": buddies, "next_cursor": next_cursor}
 
 
 @blp.route("/buddy/<int:user_id>/remove")
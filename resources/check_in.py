@@ -7,6 +7,7 @@ from models import(
     CommentModel,
     ReactModel
 )
+from models.check_in import check_in_schema_loads
 from schemas import(
     CheckInSchema,
     CheckInCommentSchema,
@@ -29,7 +30,9 @@ class CheckIn(MethodView):
     @jwt_required()
     @blp.response(201, CheckInSchema)
     def get(self, check_in_id):
-        check_in = CheckInModel.query.get_or_404(check_in_id)
+        check_in = CheckInModel.query.options(
+            *check_in_schema_loads()
+        ).filter_by(id=check_in_id).first_or_404()
         return(check_in)
 
 @blp.route("/check-ins/<int:check_in_id>/comments")
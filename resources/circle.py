@@ -5,30 +5,101 @@ from flask_jwt_extended import (
     jwt_required
 )
 
+from collections import Counter
+
+from flask import current_app, jsonify
 from flask.views import MethodView
+from sqlalchemy import select, func, desc
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from sqlalchemy.orm import selectinload
 
 from db import db
-from models import CircleModel, CircleMembershipModel, UserModel, GoalModel, CheckInModel
-from sqlalchemy import func, desc
+from models import CircleModel, CircleMembershipModel, UserModel
 
-from schemas import CircleSchema, CircleMemberSchema, UserSchema, CircleAndUserSchema, CircleMemberRemoveSchema, CircleLeaderboardSchema
+from services.leaderboard import circle_leaderboard
+from services.read_cache import circle_namespace
+from services.membership import is_circle_member, add_circle_members, remove_circle_members
+from services.pagination import decode_cursor, before_cursor, after_cursor, page_with_cursor
+from schemas import CircleListQueryArgsSchema, CircleDetailSchema, CircleMemberQueryArgsSchema, CircleMemberPageSchema, CircleSchema, CircleMemberSchema, CircleMemberRemoveSchema, CircleBulkMemberSchema, CircleBulkMemberResponseSchema, CircleLeaderboardSchema, CircleLeaderboardQueryArgsSchema
 
 blp = Blueprint("circles", __name__, description="Operations on Circle")
 
+
+def circle_summary(circle, member_count):
+    """Circle fields plus member_count, without the roster."""
+    return {
+        "id": circle.id,
+        "name": circle.name,
+        "description": circle.description,
+        "created_by_id": circle.created_by_id,
+        "created_at": circle.created_at,
+        "member_count": member_count,
+    }
+
+
+def count_members(circle_id):
+    return db.session.execute(
+        select(func.count(CircleMembershipModel.id)).where(CircleMembershipModel.circle_id == circle_id)
+    ).scalar()
+
+
+def bulk_membership_lookup(circle_id, user_ids):
+    """
+    Map each existing user in ``user_ids`` to their membership of the circle (or None), in one query.
+
+    IDs missing from the result are not users.
+    """
+    rows = db.session.query(UserModel.id, CircleMembershipModel).outerjoin(
+        CircleMembershipModel,
+        (CircleMembershipModel.user_id == UserModel.id) & (CircleMembershipModel.circle_id == circle_id),
+    ).filter(UserModel.id.in_(user_ids))
+    return dict(rows.all())
+
+
+def bulk_membership_response(circle_id, statuses):
+    return {
+        "circle_id": circle_id,
+        "results": [{"user_id": user_id, "status": status} for user_id, status in statuses.items()],
+        "counts": dict(Counter(statuses.values())),
+    }
+
+
+def cached_circle_response(circle_id, key, compute):
+    """Serve a serialized circle response through the coalescing read cache."""
+    read_cache = current_app.extensions["read_cache"]
+    return jsonify(read_cache.get_or_compute(circle_namespace(circle_id), key, compute))
+
+
 @blp.route("/circles")
 class CircleList(MethodView):
     @jwt_required()
+    @blp.arguments(CircleListQueryArgsSchema, location="query")
     @blp.response(200, CircleSchema(many=True))
-    def get(self):
-        """Get all circles the current user is a member of"""
+    def get(self, args):
+        """
+        Get all circles the current user is a member of
+
+        Pass ?summary=true to get each circle's member_count instead of its
+        full member list.
+        """
         current_user_id = int(get_jwt_identity())
 
-        # Get all circles where user is a member
-        memberships = CircleMembershipModel.query.filter_by(user_id=current_user_id).all()
-        circles = [CircleModel.query.get(m.circle_id) for m in memberships]
+        # Circles where the user is a member, in one joined query
+        query = CircleModel.query.join(
+            CircleMembershipModel, CircleMembershipModel.circle_id == CircleModel.id
+        ).filter(
+            CircleMembershipModel.user_id == current_user_id
+        ).order_by(CircleMembershipModel.id)
 
-        return circles
+        if args["summary"]:
+            member_count = select(func.count(CircleMembershipModel.id)).where(
+                CircleMembershipModel.circle_id == CircleModel.id
+            ).correlate(CircleModel).scalar_subquery()
+            # Dicts without a "users" key, so CircleSchema leaves the roster out
+            return [circle_summary(circle, count) for circle, count in query.add_columns(member_count)]
+
+        # All rosters in one extra SELECT ... WHERE circle_id IN (...)
+        return query.options(selectinload(CircleModel.users)).all()
 
 @blp.route("/circle")
 class CircleCreate(MethodView):
@@ -46,16 +117,20 @@ class CircleCreate(MethodView):
 
         return {"message": "Circle created successfully"}, 200
 
-@blp.route("/circle/<string:circle_id>")
+@blp.route("/circle/<int:circle_id>")
 class Circle(MethodView):
-    @blp.response(200, CircleSchema)
+    @blp.response(200, CircleDetailSchema)
     def get(self, circle_id):
-        circle = CircleModel.query.get_or_404(circle_id)
-        return(circle)
+        """Get a circle with its member_count; list members through /circle/<id>/users."""
+        def load():
+            circle = CircleModel.query.get_or_404(circle_id)
+            return CircleDetailSchema().dump(circle_summary(circle, count_members(circle.id)))
+
+        return cached_circle_response(circle_id, "detail", load)
 
     @jwt_required()
     @blp.arguments(CircleSchema)
-    @blp.response(200, CircleSchema)
+    @blp.response(200, CircleDetailSchema)
     def put(self, circle_data, circle_id):
         circle = CircleModel.query.get_or_404(circle_id)
         circle.name = circle_data["name"]
@@ -64,11 +139,19 @@ class Circle(MethodView):
         db.session.add(circle)
         db.session.commit()
 
-        return circle
+        return circle_summary(circle, count_members(circle.id))
 
     @jwt_required(fresh=True)
     def delete(self, circle_id):
         circle = CircleModel.query.get_or_404(circle_id)
+
+        # Delete the membership rows themselves first (not through circle.users)
+        # so the feed, cache and stream listeners see every member leave.
+        for membership in CircleMembershipModel.query.filter_by(circle_id=circle.id):
+            db.session.delete(membership)
+        db.session.flush()
+        db.session.expire(circle, ["users"])
+
         db.session.delete(circle)
         db.session.commit()
 
@@ -77,19 +160,53 @@ class Circle(MethodView):
 @blp.route("/circle/<string:circle_id>/users")
 class CircleUsers(MethodView):
     @jwt_required()
-    # @blp.response(200,UserSchema(many=True))
-    @blp.response(200,CircleAndUserSchema)
-    def get(self, circle_id):
+    @blp.arguments(CircleMemberQueryArgsSchema, location="query")
+    @blp.response(200, CircleMemberPageSchema)
+    def get(self, args, circle_id):
+        """
+        List a circle's members with their role, ordered by joined_at.
+
+        Filter with ?role=, choose ?order=asc (oldest members first, default)
+        or desc, and page with ?limit= and the returned next_cursor as ?cursor=.
+        """
         circle = CircleModel.query.get_or_404(circle_id)
 
-        # result = CircleAndUserSchema().dump({
-        #     "circle": circle,
-        #     "user": circle.users
-        # })
-        return {
-                "circle": circle,
-                "user": circle.users
-                }
+        query = db.session.query(
+            UserModel, CircleMembershipModel.role, CircleMembershipModel.joined_at, CircleMembershipModel.id
+        ).join(
+            CircleMembershipModel, CircleMembershipModel.user_id == UserModel.id
+        ).filter(CircleMembershipModel.circle_id == circle.id)
+
+        if args.get("role"):
+            query = query.filter(CircleMembershipModel.role == args["role"])
+
+        newest_first = args["order"] == "desc"
+        if args.get("cursor"):
+            try:
+                cursor = decode_cursor(args["cursor"])
+            except ValueError:
+                abort(400, message="Invalid member cursor.")
+            position = before_cursor if newest_first else after_cursor
+            query = query.filter(position(CircleMembershipModel.joined_at, CircleMembershipModel.id, cursor))
+
+        ordering = (CircleMembershipModel.joined_at, CircleMembershipModel.id)
+        if newest_first:
+            ordering = tuple(desc(column) for column in ordering)
+        rows = query.order_by(*ordering).limit(args["limit"] + 1).all()
+
+        rows, next_cursor = page_with_cursor(rows, args["limit"], key=lambda row: (row.joined_at, row.id))
+        members = [
+            {
+                "id": user.id,
+                "username": user.username,
+                "email": user.email,
+                "is_staff": user.is_staff,
+                "role": role,
+                "joined_at": joined_at,
+            }
+            for user, role, joined_at, _ in rows
+        ]
+        return {"circle": circle, "user": members, "next_cursor": next_cursor}
 
     @jwt_required()
     @blp.arguments(CircleMemberSchema)
@@ -98,12 +215,7 @@ class CircleUsers(MethodView):
         circle = CircleModel.query.get_or_404(circle_id)
         user = UserModel.query.get_or_404(circle_membership_data["user_id"])
 
-        existing_membership = CircleMembershipModel.query.filter_by(
-            user_id = circle_membership_data["user_id"],
-            circle_id = circle_id
-        ).first()
-
-        if existing_membership:
+        if is_circle_member(circle.id, user.id):
             abort(400, message=f"{user.username} is already a member of the circle: {circle.name}")
 
         new_membership = CircleMembershipModel(
@@ -128,13 +240,18 @@ class CircleUsers(MethodView):
         circle = CircleModel.query.get_or_404(circle_id)
         user = UserModel.query.get_or_404(circle_membership_data["user_id"])
 
-        if user not in circle.users:
-            abort(404, message="User is not in the circle.")
+        membership = CircleMembershipModel.query.filter_by(
+            circle_id=circle.id,
+            user_id=user.id
+        ).first()
 
-        circle.users.remove(user)
+        if not membership:
+            abort(404, message="User is not in the circle.")
 
+        # Delete the membership row itself (rather than going through circle.users)
+        # so the feed_entries listeners see the leave.
         try:
-            db.session.add(circle)
+            db.session.delete(membership)
             db.session.commit()
         except SQLAlchemyError:
             abort(500, message="An error has occurred while removing the user from the circle.")
@@ -142,11 +259,98 @@ class CircleUsers(MethodView):
         return {"message": "User removed from the circle.", "user": user.id, "circle":circle.id}
 
 
+@blp.route("/circle/<string:circle_id>/users/bulk")
+class CircleUsersBulk(MethodView):
+    @jwt_required()
+    @blp.arguments(CircleBulkMemberSchema)
+    @blp.response(200, CircleBulkMemberResponseSchema)
+    def post(self, bulk_data, circle_id):
+        """
+        Add many users to a circle in one transaction.
+
+        Only the circle's creator and its members may call this. Every ID
+        gets a status: "added", "already_member" or "not_found".
+        The IDs are checked in one query and the new memberships are written
+        with one multi-row INSERT that skips users another request added in
+        the meantime.
+        """
+        circle = CircleModel.query.get_or_404(circle_id)
+        current_user_id = int(get_jwt_identity())
+        if circle.created_by_id != current_user_id and not is_circle_member(circle.id, current_user_id):
+            abort(403, message="You must be a member of this circle to add members in bulk.")
+        user_ids = list(dict.fromkeys(bulk_data["user_ids"]))
+        existing = bulk_membership_lookup(circle.id, user_ids)
+
+        statuses = {}
+        for user_id in user_ids:
+            if user_id not in existing:
+                statuses[user_id] = "not_found"
+            elif existing[user_id] is not None:
+                statuses[user_id] = "already_member"
+        candidates = [user_id for user_id in user_ids if user_id not in statuses]
+
+        try:
+            added = set(add_circle_members(circle.id, candidates, bulk_data["role"]))
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            abort(500, message="There was an issue adding the members to the circle.")
+
+        for user_id in candidates:
+            # Not inserted: another request added them since the lookup
+            statuses[user_id] = "added" if user_id in added else "already_member"
+        statuses = {user_id: statuses[user_id] for user_id in user_ids}
+
+        return bulk_membership_response(circle.id, statuses)
+
+    @jwt_required()
+    @blp.arguments(CircleBulkMemberSchema)
+    @blp.response(200, CircleBulkMemberResponseSchema)
+    def delete(self, bulk_data, circle_id):
+        """
+        Remove many users from a circle in one transaction.
+
+        Only the circle's creator and its members may call this. Every ID
+        gets a status: "removed", "not_member" or "not_found".
+        The memberships are deleted with one DELETE, and feeds, caches and
+        streams are updated once for the whole batch.
+        """
+        circle = CircleModel.query.get_or_404(circle_id)
+        current_user_id = int(get_jwt_identity())
+        if circle.created_by_id != current_user_id and not is_circle_member(circle.id, current_user_id):
+            abort(403, message="You must be a member of this circle to remove members in bulk.")
+        user_ids = list(dict.fromkeys(bulk_data["user_ids"]))
+        existing = bulk_membership_lookup(circle.id, user_ids)
+
+        statuses = {}
+        for user_id in user_ids:
+            if user_id not in existing:
+                statuses[user_id] = "not_found"
+            elif existing[user_id] is None:
+                statuses[user_id] = "not_member"
+        candidates = [user_id for user_id in user_ids if user_id not in statuses]
+
+        try:
+            removed = set(remove_circle_members(circle.id, candidates))
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            abort(500, message="An error has occurred while removing the members from the circle.")
+
+        for user_id in candidates:
+            # Not deleted: another request removed them since the lookup
+            statuses[user_id] = "removed" if user_id in removed else "not_member"
+        statuses = {user_id: statuses[user_id] for user_id in user_ids}
+
+        return bulk_membership_response(circle.id, statuses)
+
+
 @blp.route("/circle/<int:circle_id>/leaderboard")
 class CircleLeaderboard(MethodView):
     @jwt_required()
+    @blp.arguments(CircleLeaderboardQueryArgsSchema, location="query")
     @blp.response(200, CircleLeaderboardSchema)
-    def get(self, circle_id):
+    def get(self, args, circle_id):
         """
         Get leaderboard for a circle showing member activity and progress.
 
@@ -156,68 +360,27 @@ class CircleLeaderboard(MethodView):
         - Last check-in timestamp
         - Member since date
 
-        Ordered by total check-ins (most active first).
+        Ordered by total check-ins (most active first). Pass ?window=week,
+        month or 30d to rank by check-ins in the current week (from Monday),
+        the current month or the last 30 days instead of all time.
+
+        Results are shared by all members for READ_CACHE_TTL seconds, so new
+        check-ins can take that long to show up.
         """
         current_user_id = int(get_jwt_identity())
 
         # Verify circle exists and user is a member
         circle = CircleModel.query.get_or_404(circle_id)
 
-        # Check if user is a member of the circle
-        membership = CircleMembershipModel.query.filter_by(
-            circle_id=circle_id,
-            user_id=current_user_id
-        ).first()
-
-        if not membership:
+        if not is_circle_member(circle_id, current_user_id):
             abort(403, message="You must be a member of this circle to view the leaderboard")
 
-        # Get all members of the circle
-        members = CircleMembershipModel.query.filter_by(circle_id=circle_id).all()
-
-        leaderboard_data = []
-
-        for member in members:
-            user = UserModel.query.get(member.user_id)
-
-            # Count total check-ins for this user's goals in this circle
-            total_check_ins = db.session.query(func.count(CheckInModel.id)).join(
-                GoalModel
-            ).filter(
-                GoalModel.user_id == user.id,
-                GoalModel.circle_id == circle_id
-            ).scalar() or 0
-
-            # Count active goals in this circle
-            active_goals = GoalModel.query.filter_by(
-                user_id=user.id,
-                circle_id=circle_id,
-                is_active=True
-            ).count()
-
-            # Get last check-in timestamp for this user's circle goals
-            last_check_in = db.session.query(func.max(CheckInModel.created_at)).join(
-                GoalModel
-            ).filter(
-                GoalModel.user_id == user.id,
-                GoalModel.circle_id == circle_id
-            ).scalar()
-
-            leaderboard_data.append({
-                "user_id": user.id,
-                "username": user.username,
-                "total_check_ins": total_check_ins,
-                "active_goals": active_goals,
-                "last_check_in": last_check_in,
-                "member_since": member.joined_at,
-                "role": member.role
+        return cached_circle_response(
+            circle_id, f"leaderboard:{args['window']}",
+            lambda: CircleLeaderboardSchema().dump({
+                "circle_id": circle.id,
+                "circle_name": circle.name,
+                "window": args["window"],
+                "leaderboard": circle_leaderboard(circle_id, args["window"])
             })
-
-        # Sort by total check-ins (descending)
-        leaderboard_data.sort(key=lambda x: x["total_check_ins"], reverse=True)
-
-        return {
-            "circle_id": circle.id,
-            "circle_name": circle.name,
-            "leaderboard": leaderboard_data
-        }
\ No newline at end of file
+        )
\ No newline at end of file
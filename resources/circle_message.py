@@ -1,34 +1,123 @@
+import json
+
+from flask import Response, current_app
 from flask_smorest import Blueprint, abort
 from flask_jwt_extended import(
     jwt_required,
     get_jwt_identity
 )
 
-from models import UserModel, CircleModel, CircleMessageModel
-from schemas import CircleMessageSchema, GetCircleMessagesSchema, SendCircleMessageSchema
+from models import CircleModel, CircleMessageModel, UserModel
+from services.membership import is_circle_member
+from services.broker import sse_event
+from services.circle_stream import circle_channel, MEMBER_LEFT_EVENT
+from services.message_archive import archived_messages_before, find_archived_message
+from services.read_markers import record_read_marker, flush_user_read_markers, unread_counts
+from services.pagination import before_cursor
+from schemas import CircleMessageSchema, CircleMessageQueryArgsSchema, GetCircleMessagesSchema, SendCircleMessageSchema, CircleReadMarkerSchema, CircleUnreadSchema
 
 from flask.views import MethodView
+from sqlalchemy import select, desc
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import joinedload
 
 from db import db
 
 blp = Blueprint("circle_chat_messages", __name__, description="Operations on Circle chat messages")
 
+
+def archived_history(circle_id, before, hot_messages, limit):
+    """
+    Continue a history page from the message archive once the hot table has run out.
+
+    ``hot_messages`` is what the hot table returned for the page. Returns
+    archived messages as dicts shaped like CircleMessageSchema expects.
+    """
+    archive_dir = current_app.config["MESSAGE_ARCHIVE_DIR"]
+    if hot_messages:
+        cursor = (hot_messages[-1].sent_at, hot_messages[-1].id)
+    elif before is not None:
+        sent_at = db.session.execute(
+            select(CircleMessageModel.sent_at).where(
+                CircleMessageModel.id == before, CircleMessageModel.circle_id == circle_id
+            )
+        ).scalar()
+        if sent_at is None:
+            record = find_archived_message(archive_dir, circle_id, before)
+            if record is None:
+                return []
+            sent_at = record["sent_at"]
+        cursor = (sent_at, before)
+    else:
+        cursor = None
+
+    records = archived_messages_before(
+        archive_dir, circle_id, cursor, limit, exclude_ids={message.id for message in hot_messages}
+    )
+    if not records:
+        return []
+    usernames = dict(db.session.execute(
+        select(UserModel.id, UserModel.username).where(UserModel.id.in_({r["user_id"] for r in records}))
+    ).all())
+    return [
+        {
+            "id": record["id"],
+            "message": record["message"],
+            "sent_at": record["sent_at"],
+            "user": {"id": record["user_id"], "username": usernames.get(record["user_id"])},
+        }
+        for record in records
+    ]
+
+
 @blp.route("/circle/<string:circle_id>/message")
 class CircleMessageList(MethodView):
     @jwt_required()
+    @blp.arguments(CircleMessageQueryArgsSchema, location="query")
     @blp.response(200, GetCircleMessagesSchema)
-    def get(self, circle_id):
+    def get(self, args, circle_id):
+        """
+        Get a page of the circle's chat history, newest message first.
+
+        Returns up to ?limit= messages; pass the returned next_cursor as
+        ?before= to load the messages sent before them. Once the page goes
+        past the oldest message still in the database it continues from the
+        message archive (see services/message_archive.py).
+        """
         current_user_id = get_jwt_identity()
-        current_user = UserModel.query.get_or_404(current_user_id)
         circle = CircleModel.query.get_or_404(circle_id)
-        if not current_user in circle.users:
+        if not is_circle_member(circle.id, current_user_id):
             abort(403, message="User not in the circle. Cannot return the messages")
 
-        messages = CircleMessageModel.query.filter_by(circle_id=circle.id).all()
+        query = CircleMessageModel.query.options(
+            joinedload(CircleMessageModel.user)
+        ).filter(CircleMessageModel.circle_id == circle.id)
+
+        if args.get("before") is not None:
+            # Position of the cursor message, resolved inside the same query
+            cursor_sent_at = select(CircleMessageModel.sent_at).where(
+                CircleMessageModel.id == args["before"],
+                CircleMessageModel.circle_id == circle.id,
+            ).scalar_subquery()
+            query = query.filter(before_cursor(
+                CircleMessageModel.sent_at, CircleMessageModel.id, (cursor_sent_at, args["before"])
+            ))
+
+        # Walks ix_circle_messages_circle_sent backwards from the cursor
+        messages = query.order_by(
+            desc(CircleMessageModel.sent_at), desc(CircleMessageModel.id)
+        ).limit(args["limit"] + 1).all()
 
-        # return circle.messages.all()
-        return {"messages": messages}
+        if len(messages) <= args["limit"]:
+            messages += archived_history(circle.id, args.get("before"), messages, args["limit"] + 1 - len(messages))
+
+        next_cursor = None
+        if len(messages) > args["limit"]:
+            messages = messages[:args["limit"]]
+            last = messages[-1]
+            next_cursor = last["id"] if isinstance(last, dict) else last.id
+
+        return {"messages": messages, "next_cursor": next_cursor}
 
 
     @jwt_required()
@@ -36,10 +125,9 @@ class CircleMessageList(MethodView):
     @blp.response(201)
     def post(self, message_data, circle_id):
         current_user_id = get_jwt_identity()
-        current_user = UserModel.query.get_or_404(current_user_id)
         circle = CircleModel.query.get_or_404(circle_id)
 
-        if not current_user in circle.users:
+        if not is_circle_member(circle.id, current_user_id):
             abort(403, message="User not in the circle. Cannot post the message")
 
         circle_message = CircleMessageModel(
@@ -56,3 +144,93 @@ class CircleMessageList(MethodView):
 
         return {"message": "Message successfully sent"}
 
+
+@blp.route("/circle/<string:circle_id>/message/stream")
+class CircleMessageStream(MethodView):
+    @jwt_required()
+    def get(self, circle_id):
+        """
+        Stream the circle's new chat messages as server-sent events.
+
+        Each "message" event carries the whole message (ID, sender, text and
+        sent_at); "member_left" events report members leaving, and the stream
+        ends when the current user is the one who left. Comment lines are sent
+        as keep-alives. Load earlier messages through /circle/<id>/message.
+        """
+        current_user_id = int(get_jwt_identity())
+        circle = CircleModel.query.get_or_404(circle_id)
+        if not is_circle_member(circle.id, current_user_id):
+            abort(403, message="User not in the circle. Cannot stream the messages")
+
+        broker = current_app.extensions["broker"]
+        keepalive = current_app.config["STREAM_KEEPALIVE_SECONDS"]
+        subscription = broker.subscribe(circle_channel(circle.id))
+        # Hand the connection back to the pool before blocking on the subscription
+        db.session.remove()
+
+        def events():
+            try:
+                yield "retry: 5000\n\n"
+                while True:
+                    message = subscription.get(timeout=keepalive)
+                    if message is None:
+                        yield ": keep-alive\n\n"
+                        continue
+                    yield sse_event(message["event"], json.dumps(message["data"]))
+                    if message["event"] == MEMBER_LEFT_EVENT and message["data"]["user_id"] == current_user_id:
+                        return
+            finally:
+                broker.unsubscribe(subscription)
+
+        return Response(
+            events(),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+
+@blp.route("/circle/<string:circle_id>/message/read")
+class CircleReadMarker(MethodView):
+    @jwt_required()
+    @blp.arguments(CircleReadMarkerSchema)
+    @blp.response(200, CircleReadMarkerSchema)
+    def put(self, marker_data, circle_id):
+        """
+        Mark the circle's messages up to last_read_message_id as read.
+
+        Markers only move forward. Updates are coalesced per user and circle
+        and written at most every READ_MARKER_FLUSH_SECONDS, so /circles/unread
+        served by another worker may lag by about that interval.
+        """
+        current_user_id = int(get_jwt_identity())
+        circle = CircleModel.query.get_or_404(circle_id)
+        if not is_circle_member(circle.id, current_user_id):
+            abort(403, message="User not in the circle. Cannot update the read marker")
+
+        try:
+            if record_read_marker(db.session.connection(), current_user_id, circle.id,
+                                  marker_data["last_read_message_id"]):
+                db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            abort(500, message="An error occurred while saving the read marker.")
+
+        return marker_data
+
+
+@blp.route("/circles/unread")
+class CircleUnreadList(MethodView):
+    @jwt_required()
+    @blp.response(200, CircleUnreadSchema(many=True))
+    def get(self):
+        """Unread message counts for every circle the current user is a member of, in one query."""
+        current_user_id = int(get_jwt_identity())
+
+        try:
+            if flush_user_read_markers(db.session.connection(), current_user_id):
+                db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            abort(500, message="An error occurred while saving the read markers.")
+
+        return [row._asdict() for row in db.session.execute(unread_counts(current_user_id))]
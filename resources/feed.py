@@ -1,20 +1,116 @@
+import json
+
+from flask import Response, current_app, jsonify
 from flask_smorest import Blueprint, abort
 from flask.views import MethodView
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from sqlalchemy import desc, or_
+from sqlalchemy import desc
 
+from models.check_in import check_in_schema_loads
 from db import db
-from models import CheckInModel, FollowModel, CircleMembershipModel
-from schemas import FeedSchema
+from schemas import FeedSchema, FeedQueryArgsSchema, FeedDeltaSchema, FeedDeltaQueryArgsSchema
+from services.feed_delta import decode_since_cursor, feed_delta, since_cursor_for
+from services.broker import sse_event
+from services.check_in_counts import current_counts
+from services.feed_hybrid import hybrid_feed_rows
+from services.feed_stream import feed_channel, author_channel
+from services.feed_version import feed_etag_data
+from services.pagination import decode_cursor, before_cursor, page_with_cursor
+from services.feed_query import (
+    VARIANT_ALL,
+    VARIANT_FOLLOWING,
+    VARIANT_CIRCLES,
+    materialized_feed_query,
+    pull_feed_query,
+    hybrid_feed_query,
+    followed_high_fanout_ids,
+)
 
 blp = Blueprint("feed", __name__, description="Operations on user feed/timeline")
 
 
+FEED_QUERIES = {
+    "fanout": materialized_feed_query,
+    "pull": pull_feed_query,
+    "hybrid": hybrid_feed_query,
+}
+
+
+def cached_feed_response(owner_id, args, variant, etag_data):
+    """
+    Serve the feed page from the per-user feed cache, serializing it on a miss.
+
+    Comment and reaction counts change too often to cache with the page, so
+    they are read for the page's check-ins (one primary-key lookup) and laid
+    over the cached items. They are part of the ETag, which answers 304 once
+    the page and its counts are known, without re-serializing anything.
+    """
+    feed_cache = current_app.extensions["feed_cache"]
+    # Keying on the ETag version too means a check-in pulled from a high-fanout
+    # author (which invalidates no follower caches) still yields a fresh page
+    version = (etag_data["version"], etag_data["newest"], etag_data.get("pulled"))
+    data = feed_cache.get_or_compute(
+        owner_id, variant, args,
+        lambda: FeedSchema().dump(feed_page(owner_id, args, variant)),
+        version=version,
+    )
+
+    counts = current_counts(db.session.connection(), [item["id"] for item in data["feed"]])
+    blp.set_etag({**etag_data, "counts": sorted(
+        (check_in_id, c["comment_count"], c["reaction_count"]) for check_in_id, c in counts.items()
+    )})
+    return jsonify({**data, "feed": [{**item, **counts.get(item["id"], {})} for item in data["feed"]]})
+
+
+def feed_page(owner_id, args, variant):
+    """
+    Read a page of the owner's feed.
+
+    The FEED_STRATEGY setting picks the read path: "fanout" is a single range read
+    over the (owner_id, created_at) index on feed_entries, "pull" is one statement
+    over check_ins with the audience as EXISTS subqueries, and "hybrid" merges the
+    feed_entries range read with the check-ins of followed high-fanout authors.
+    Pages are keyed on (created_at, id), so page N costs the same as page 1.
+    """
+    strategy = current_app.config["FEED_STRATEGY"]
+    cursor = None
+    if args.get("before"):
+        try:
+            cursor = decode_cursor(args["before"])
+        except ValueError:
+            abort(400, message="Invalid feed cursor.")
+
+    # Fetch one extra row to know whether another page exists
+    if strategy == "hybrid":
+        check_ins = hybrid_feed_rows(
+            owner_id, variant, cursor, args["limit"] + 1, options=check_in_schema_loads()
+        )
+    else:
+        query, created_at_column, id_column = FEED_QUERIES[strategy](owner_id, variant)
+        query = query.options(*check_in_schema_loads())
+        if cursor is not None:
+            query = query.filter(before_cursor(created_at_column, id_column, cursor))
+        check_ins = query.order_by(
+            desc(created_at_column), desc(id_column)
+        ).limit(args["limit"] + 1).all()
+
+    check_ins, next_cursor = page_with_cursor(
+        check_ins, args["limit"], key=lambda check_in: (check_in.created_at, check_in.id)
+    )
+
+    # The first page also hands out the cursor for polling /feed/since
+    since_cursor = None if args.get("before") else since_cursor_for(check_ins)
+
+    return {"feed": check_ins, "next_cursor": next_cursor, "since_cursor": since_cursor}
+
+
 @blp.route("/feed")
 class Feed(MethodView):
     @jwt_required()
+    @blp.etag
+    @blp.arguments(FeedQueryArgsSchema, location="query")
     @blp.response(200, FeedSchema)
-    def get(self):
+    def get(self, args):
         """
         Get personalized feed for the current user.
 
@@ -23,114 +119,140 @@ class Feed(MethodView):
         2. Users in circles the current user is part of
         3. Current user's own check-ins
 
-        Results are ordered by most recent first.
+        Results are ordered by most recent first. Pass the returned
+        next_cursor as ?before= to fetch the following page.
         """
         current_user_id = int(get_jwt_identity())
 
-        # Get IDs of users the current user follows
-        following_ids_query = db.session.query(FollowModel.following_id).filter(
-            FollowModel.follower_id == current_user_id
-        )
-        following_ids = [row[0] for row in following_ids_query.all()]
-
-        # Get IDs of circles the current user is a member of
-        circle_ids_query = db.session.query(CircleMembershipModel.circle_id).filter(
-            CircleMembershipModel.user_id == current_user_id
-        )
-        circle_ids = [row[0] for row in circle_ids_query.all()]
-
-        # Get IDs of all users in those circles (excluding current user to avoid duplicates)
-        circle_member_ids = []
-        if circle_ids:
-            circle_members_query = db.session.query(CircleMembershipModel.user_id).filter(
-                CircleMembershipModel.circle_id.in_(circle_ids),
-                CircleMembershipModel.user_id != current_user_id
-            ).distinct()
-            circle_member_ids = [row[0] for row in circle_members_query.all()]
-
-        # Combine all user IDs (followers + circle members + self)
-        # Use set to remove duplicates, then convert to list
-        feed_user_ids = list(set(following_ids + circle_member_ids + [current_user_id]))
+        etag_data = feed_etag_data(current_user_id, VARIANT_ALL, args)
 
-        # If no users to show feed from, return empty feed
-        if not feed_user_ids:
-            return {"feed": []}
-
-        # Get check-ins from all these users, ordered by most recent
-        feed_check_ins = CheckInModel.query.filter(
-            CheckInModel.user_id.in_(feed_user_ids)
-        ).order_by(desc(CheckInModel.created_at)).limit(50).all()
-
-        return {"feed": feed_check_ins}
+        return cached_feed_response(current_user_id, args, VARIANT_ALL, etag_data)
 
 
 @blp.route("/feed/following")
 class FollowingFeed(MethodView):
     @jwt_required()
+    @blp.etag
+    @blp.arguments(FeedQueryArgsSchema, location="query")
     @blp.response(200, FeedSchema)
-    def get(self):
+    def get(self, args):
         """
         Get feed containing only check-ins from users the current user follows.
 
         This is a filtered view showing only activity from followed users.
-        Results are ordered by most recent first.
+        Results are ordered by most recent first. Pass the returned
+        next_cursor as ?before= to fetch the following page.
         """
         current_user_id = int(get_jwt_identity())
 
-        # Get IDs of users the current user follows
-        following_ids_query = db.session.query(FollowModel.following_id).filter(
-            FollowModel.follower_id == current_user_id
-        )
-        following_ids = [row[0] for row in following_ids_query.all()]
-
-        # If not following anyone, return empty feed
-        if not following_ids:
-            return {"feed": []}
-
-        # Get check-ins from followed users only
-        feed_check_ins = CheckInModel.query.filter(
-            CheckInModel.user_id.in_(following_ids)
-        ).order_by(desc(CheckInModel.created_at)).limit(50).all()
+        etag_data = feed_etag_data(current_user_id, VARIANT_FOLLOWING, args)
 
-        return {"feed": feed_check_ins}
+        return cached_feed_response(current_user_id, args, VARIANT_FOLLOWING, etag_data)
 
 
 @blp.route("/feed/circles")
 class CirclesFeed(MethodView):
     @jwt_required()
+    @blp.etag
+    @blp.arguments(FeedQueryArgsSchema, location="query")
     @blp.response(200, FeedSchema)
-    def get(self):
+    def get(self, args):
         """
         Get feed containing only check-ins from users in the same circles.
 
         This is a filtered view showing only activity from circle members.
-        Results are ordered by most recent first.
+        Results are ordered by most recent first. Pass the returned
+        next_cursor as ?before= to fetch the following page.
+        """
+        current_user_id = int(get_jwt_identity())
+
+        etag_data = feed_etag_data(current_user_id, VARIANT_CIRCLES, args)
+
+        return cached_feed_response(current_user_id, args, VARIANT_CIRCLES, etag_data)
+
+
+@blp.route("/feed/since/<string:cursor>")
+class FeedSince(MethodView):
+    @jwt_required()
+    @blp.arguments(FeedDeltaQueryArgsSchema, location="query")
+    @blp.response(200, FeedDeltaSchema)
+    def get(self, args, cursor):
+        """
+        Get only what changed in the feed since a since_cursor was issued.
+
+        Returns check-ins added after the cursor (most recent first) and the IDs
+        of check-ins that left the feed, e.g. after an unfollow. Apply the
+        deletions, prepend the new items and poll again with the returned
+        since_cursor; has_more means the delta was capped at ?limit=.
+        Returns 410 when the cursor is too old and the feed must be reloaded.
         """
         current_user_id = int(get_jwt_identity())
 
-        # Get IDs of circles the current user is a member of
-        circle_ids_query = db.session.query(CircleMembershipModel.circle_id).filter(
-            CircleMembershipModel.user_id == current_user_id
+        try:
+            since = decode_since_cursor(cursor)
+        except ValueError:
+            abort(400, message="Invalid feed cursor.")
+
+        build_query = FEED_QUERIES[current_app.config["FEED_STRATEGY"]]
+        query, created_at_column, id_column = build_query(current_user_id, args["variant"])
+
+        delta = feed_delta(
+            current_user_id,
+            query.options(*check_in_schema_loads()),
+            created_at_column,
+            id_column,
+            since,
+            args["limit"],
+            current_app.config["FEED_TOMBSTONE_DAYS"],
         )
-        circle_ids = [row[0] for row in circle_ids_query.all()]
+        if delta is None:
+            abort(410, message="Feed cursor expired, reload the feed.")
+
+        return delta
+
+
+@blp.route("/feed/stream")
+class FeedStream(MethodView):
+    @jwt_required()
+    def get(self):
+        """
+        Stream new check-ins in the current user's feed as server-sent events.
 
-        # If not in any circles, return empty feed
-        if not circle_ids:
-            return {"feed": []}
+        Each "check_in" event carries the check-in ID, author and created_at;
+        clients fetch the items through /feed/since. Comment lines are sent as
+        keep-alives. Every open stream occupies a worker thread or greenlet
+        (run under a threaded or gevent worker) but no database connection.
+        """
+        current_user_id = int(get_jwt_identity())
+        broker = current_app.extensions["broker"]
+        keepalive = current_app.config["STREAM_KEEPALIVE_SECONDS"]
 
-        # Get IDs of all users in those circles
-        circle_members_query = db.session.query(CircleMembershipModel.user_id).filter(
-            CircleMembershipModel.circle_id.in_(circle_ids)
-        ).distinct()
-        circle_member_ids = [row[0] for row in circle_members_query.all()]
+        channels = [feed_channel(current_user_id)]
+        if current_app.config["FEED_STRATEGY"] == "hybrid":
+            # High-fanout authors publish once to their own channel instead of to every follower
+            channels += [
+                author_channel(author_id) for author_id in
+                db.session.execute(followed_high_fanout_ids(current_user_id)).scalars()
+            ]
 
-        # If no members found, return empty feed
-        if not circle_member_ids:
-            return {"feed": []}
+        subscription = broker.subscribe(*channels)
+        # Hand the connection back to the pool before blocking on the subscription
+        db.session.remove()
 
-        # Get check-ins from circle members
-        feed_check_ins = CheckInModel.query.filter(
-            CheckInModel.user_id.in_(circle_member_ids)
-        ).order_by(desc(CheckInModel.created_at)).limit(50).all()
+        def events():
+            try:
+                yield "retry: 5000\n\n"
+                while True:
+                    message = subscription.get(timeout=keepalive)
+                    if message is None:
+                        yield ": keep-alive\n\n"
+                        continue
+                    yield sse_event("check_in", json.dumps(message))
+            finally:
+                broker.unsubscribe(subscription)
 
-        return {"feed": feed_check_ins}
+        return Response(
+            events(),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
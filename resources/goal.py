@@ -1,6 +1,7 @@
 from db import db
 from flask_smorest import Blueprint, abort
 from flask.views import MethodView
+from sqlalchemy import func
 from sqlalchemy.exc import SQLAlchemyError
 
 from schemas import GoalSchema, GoalUpdateSchema, PlainCheckInSchema, CheckInListSchema, CheckInSchema
@@ -123,11 +124,22 @@ class GoalCheckInList(MethodView):
         return {"message": "Check-in successfully created"}
 
     @jwt_required()
+    @blp.etag
     @blp.response(200,CheckInListSchema)
     def get(self, goal_id):
         goal = GoalModel.query.get_or_404(goal_id)
 
-        return {"check_ins": goal.check_ins}
+        # Check-ins are never edited, so the newest ID and the count identify the list.
+        # A matching If-None-Match gets a 304 before the rows are loaded.
+        latest_id, total = db.session.query(
+            func.max(CheckInModel.id), func.count(CheckInModel.id)
+        ).filter(CheckInModel.goal_id == goal.id).one()
+        blp.set_etag({"goal": goal.id, "latest": latest_id, "count": total})
+
+        # CheckInListSchema only dumps plain columns, so no relations are loaded
+        check_ins = CheckInModel.query.filter_by(goal_id=goal.id).order_by(CheckInModel.id).all()
+
+        return {"check_ins": check_ins}
 
 # @blp.route("/goal/<int:goal_id>/check-ins/<int:check_in_id>")
 # class GoalCheckIn(MethodView):
@@ -0,0 +1,23 @@
+from flask_smorest import Blueprint, abort
+from flask.views import MethodView
+from flask_jwt_extended import jwt_required, get_jwt
+
+from services import metrics
+
+blp = Blueprint("metrics", __name__, description="Operational metrics")
+
+
+@blp.route("/metrics")
+class Metrics(MethodView):
+    @jwt_required()
+    @blp.response(200)
+    def get(self):
+        """
+        Get the counters collected by this worker process.
+
+        Admin only.
+        """
+        if not get_jwt().get("is_admin"):
+            abort(401, message="Admin priviledge required.")
+
+        return {"counters": metrics.snapshot()}
@@ -2,6 +2,7 @@ from db import db
 from flask_smorest import Blueprint, abort
 from sqlalchemy.exc import SQLAlchemyError
 from flask.views import MethodView
+from sqlalchemy import func
 
 from models import TargetModel, CheckInModel
 
@@ -83,11 +84,22 @@ class TargetCheckInList(MethodView):
         return {"message": "Check in successfully created"}
 
     @jwt_required()
+    @blp.etag
     @blp.response(200, CheckInListSchema)
     def get(self, target_id):
         target = TargetModel.query.get_or_404(target_id)
 
-        return({"check_ins":target.check_ins})
+        # Check-ins are never edited, so the newest ID and the count identify the list.
+        # A matching If-None-Match gets a 304 before the rows are loaded.
+        latest_id, total = db.session.query(
+            func.max(CheckInModel.id), func.count(CheckInModel.id)
+        ).filter(CheckInModel.target_id == target.id).one()
+        blp.set_etag({"target": target.id, "latest": latest_id, "count": total})
+
+        # CheckInListSchema only dumps plain columns, so no relations are loaded
+        check_ins = CheckInModel.query.filter_by(target_id=target.id).order_by(CheckInModel.id).all()
+
+        return({"check_ins": check_ins})
 
 
 # @blp.route("/target/<int:target_id>/check-ins/<int:check_in_id>")
@@ -1,4 +1,4 @@
-from marshmallow import Schema, fields, validates, ValidationError
+from marshmallow import Schema, fields, validate, validates, ValidationError
 
 
 class PlainUserSchema(Schema):
@@ -25,6 +25,29 @@ class UserSchema(PlainUserSchema):
 
 class CircleSchema(PlainCircleSchema):
     users = fields.List(fields.Nested(PlainUserSchema()), dump_only=True)
+    member_count = fields.Int(dump_only=True)
+
+class CircleDetailSchema(PlainCircleSchema):
+    member_count = fields.Int(dump_only=True)
+
+class CircleMemberQueryArgsSchema(Schema):
+    role = fields.Str(required=False)
+    order = fields.Str(load_default="asc", validate=validate.OneOf(["asc", "desc"]))
+    cursor = fields.Str(required=False)
+    limit = fields.Int(load_default=50, validate=validate.Range(min=1, max=200))
+
+class CircleMemberListingSchema(PlainUserSchema):
+    role = fields.Str()
+    joined_at = fields.DateTime()
+
+class CircleMemberPageSchema(Schema):
+    circle = fields.Nested(PlainCircleSchema)
+    user = fields.List(fields.Nested(CircleMemberListingSchema))
+    next_cursor = fields.Str(allow_none=True)
+
+class CircleListQueryArgsSchema(Schema):
+    # Summary mode returns member_count instead of each circle's roster
+    summary = fields.Bool(load_default=False)
 
 #CircleAndUserSchema is used to return information about both the Item and Tag that have been modified in an endpoint, together with an informative message.
 class CircleAndUserSchema(Schema):
@@ -45,6 +68,25 @@ class CircleMemberSchema(Schema):
     user_id = fields.Int(required=True)
     role = fields.Str(required=False, load_default="member")
 
+# Upper bound on user IDs per bulk membership request
+BULK_MEMBERSHIP_MAX = 5000
+
+class CircleBulkMemberSchema(Schema):
+    user_ids = fields.List(
+        fields.Int(), required=True, validate=validate.Length(min=1, max=BULK_MEMBERSHIP_MAX)
+    )
+    # Role given to every added member; ignored when removing
+    role = fields.Str(required=False, load_default="member")
+
+class CircleBulkMemberResultSchema(Schema):
+    user_id = fields.Int()
+    status = fields.Str()
+
+class CircleBulkMemberResponseSchema(Schema):
+    circle_id = fields.Int()
+    results = fields.List(fields.Nested(CircleBulkMemberResultSchema))
+    counts = fields.Dict(keys=fields.Str(), values=fields.Int())
+
 class SendCircleMessageSchema(Schema):
     message = fields.Str()
 
@@ -52,10 +94,26 @@ class CircleMessageSchema(Schema):
     id = fields.Int(dump_only=True)
     message = fields.Str(required=True)
     created_at = fields.DateTime(dump_only=True)
+    sent_at = fields.DateTime(dump_only=True)
     user = fields.Nested(PlainUserSchema, only=("id", "username"), dump_only=True)
 
+class CircleMessageQueryArgsSchema(Schema):
+    # ID of the oldest message the client already has
+    before = fields.Int(required=False)
+    limit = fields.Int(load_default=50, validate=validate.Range(min=1, max=200))
+
 class GetCircleMessagesSchema(Schema):
     messages = fields.List(fields.Nested(CircleMessageSchema))
+    # Pass as ?before= for the next (older) page; null on the last page
+    next_cursor = fields.Int(allow_none=True)
+
+class CircleReadMarkerSchema(Schema):
+    last_read_message_id = fields.Int(required=True, validate=validate.Range(min=0))
+
+class CircleUnreadSchema(Schema):
+    circle_id = fields.Int()
+    last_read_message_id = fields.Int()
+    unread_count = fields.Int()
 
 class GoalUpdateSchema(Schema):
     circle_id = fields.Str(required=False)
@@ -110,6 +168,12 @@ class GoalSchema(PlainGoalSchema):
     user = fields.Nested(PlainUserSchema, dump_only=True)
     circle = fields.Nested(PlainCircleSchema, dump_only=True)
     targets = fields.List(fields.Nested(TargetSchema))
+    current_streak = fields.Method("get_current_streak", dump_only=True)
+    longest_streak = fields.Int(dump_only=True)
+
+    def get_current_streak(self, goal):
+        from services.streaks import live_current_streak
+        return live_current_streak(goal)
 
 class PlainCheckInSchema(Schema):
     id = fields.Int(dump_only=True)
@@ -135,6 +199,8 @@ class CheckInSchema(PlainCheckInSchema):
     goal = fields.Nested(PlainGoalSchema, dump_only=True, required=False)
     target = fields.Nested(TargetSchema, dump_only=True, required=False)
     reacts = fields.List(fields.Nested(PlainReactSchema))
+    comment_count = fields.Int(dump_only=True)
+    reaction_count = fields.Int(dump_only=True)
 
 class CheckInListSchema(Schema):
     check_ins = fields.List(fields.Nested(PlainCheckInSchema))
@@ -149,6 +215,22 @@ class CheckInCommentListSchema(Schema):
 
 class FeedSchema(Schema):
     feed = fields.List(fields.Nested(CheckInSchema))
+    next_cursor = fields.Str(allow_none=True)
+    since_cursor = fields.Str(allow_none=True)
+
+class FeedQueryArgsSchema(Schema):
+    before = fields.Str(required=False)
+    limit = fields.Int(load_default=50, validate=validate.Range(min=1, max=100))
+
+class FeedDeltaQueryArgsSchema(Schema):
+    variant = fields.Str(load_default="all", validate=validate.OneOf(["all", "following", "circles"]))
+    limit = fields.Int(load_default=50, validate=validate.Range(min=1, max=100))
+
+class FeedDeltaSchema(Schema):
+    feed = fields.List(fields.Nested(CheckInSchema))
+    deleted = fields.List(fields.Int())
+    has_more = fields.Bool()
+    since_cursor = fields.Str()
 
 class LeaderboardEntrySchema(Schema):
     user_id = fields.Int()
@@ -158,10 +240,16 @@ class LeaderboardEntrySchema(Schema):
     last_check_in = fields.DateTime(allow_none=True)
     member_since = fields.DateTime()
     role = fields.Str()
+    current_streak = fields.Int()
+    longest_streak = fields.Int()
+
+class CircleLeaderboardQueryArgsSchema(Schema):
+    window = fields.Str(load_default="all", validate=validate.OneOf(["all", "week", "month", "30d"]))
 
 class CircleLeaderboardSchema(Schema):
     circle_id = fields.Int()
     circle_name = fields.Str()
+    window = fields.Str()
     leaderboard = fields.List(fields.Nested(LeaderboardEntrySchema))
 
 class BuddyRequestCreateSchema(Schema):
@@ -196,14 +284,32 @@ class BuddyRequestSchema(Schema):
     def get_receiver_username(self, obj):
         return obj.to_user.username if obj.to_user else None
 
+class BuddyRequestQueryArgsSchema(Schema):
+    # "all" lists every status; received requests default to pending, sent ones to all
+    status = fields.Str(required=False, validate=validate.OneOf(["pending", "accepted", "declined", "all"]))
+    cursor = fields.Str(required=False)
+    limit = fields.Int(load_default=50, validate=validate.Range(min=1, max=200))
+
+class BuddyRequestPageSchema(Schema):
+    requests = fields.List(fields.Nested(BuddyRequestSchema))
+    next_cursor = fields.Str(allow_none=True)
+
 class BuddyInfoSchema(Schema):
     user_id = fields.Int()
     username = fields.Str()
     email = fields.Str()
     buddies_since = fields.DateTime()
 
+class BuddyListQueryArgsSchema(Schema):
+    sort = fields.Str(load_default="buddies_since", validate=validate.OneOf(["buddies_since", "username"]))
+    order = fields.Str(load_default="desc", validate=validate.OneOf(["asc", "desc"]))
+    cursor = fields.Str(required=False)
+    # Without a limit every buddy is returned
+    limit = fields.Int(required=False, validate=validate.Range(min=1, max=200))
+
 class BuddyListSchema(Schema):
     buddies = fields.List(fields.Nested(BuddyInfoSchema))
+    next_cursor = fields.Str(allow_none=True)
 
 
 
@@ -0,0 +1,42 @@
+"""
+Side effects that have to wait for the current transaction to commit.
+
+Cache invalidations and broker publishes must not happen before the rows they
+describe are visible, or a concurrent request could re-cache (or a subscriber
+re-read) the pre-commit state, and they must not happen at all if the
+transaction rolls back. Mapper listeners therefore queue them on the session
+with ``defer`` while the flush runs, and the handler registered for their key
+with ``on_commit`` receives everything queued under it once the session
+commits. A rollback drops the queue.
+"""
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_PENDING_KEY = "after_commit"
+_handlers = {}
+
+
+def on_commit(key):
+    """Register ``handler(items)`` for the items deferred under ``key``; used as a decorator."""
+    def register(handler):
+        _handlers[key] = handler
+        return handler
+    return register
+
+
+def defer(session, key, *items):
+    """Queue ``items`` under ``key`` until ``session`` commits; a missing session is ignored."""
+    if session is not None and items:
+        session.info.setdefault(_PENDING_KEY, {}).setdefault(key, []).extend(items)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    for key, items in (pending or {}).items():
+        _handlers[key](items)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session):
+    session.info.pop(_PENDING_KEY, None)
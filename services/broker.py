@@ -0,0 +1,116 @@
+"""
+In-process publish/subscribe broker for server-sent event streams.
+
+Subscribers get a bounded queue each; when a slow client falls behind, the
+oldest undelivered message is dropped rather than letting the queue grow.
+Messages travel through a BrokerBackend: the default LocalBackend delivers
+within this process only, while a shared backend (e.g. Redis pub/sub) can
+fan messages out to every worker's broker.
+
+Waiting subscribers block on a Condition, not on the database, so a stream
+needs a thread (or greenlet) but never holds a DB connection.
+"""
+import threading
+from abc import ABC, abstractmethod
+from collections import defaultdict, deque
+
+from services import metrics
+
+
+class Subscription:
+    def __init__(self, channels, maxsize):
+        self.channels = tuple(channels)
+        self._messages = deque(maxlen=maxsize)
+        self._ready = threading.Condition()
+
+    def put(self, message):
+        with self._ready:
+            if len(self._messages) == self._messages.maxlen:
+                # deque(maxlen=...) discards the oldest entry on append
+                metrics.incr("broker.dropped")
+            self._messages.append(message)
+            self._ready.notify()
+
+    def get(self, timeout=None):
+        """Next message, or None if nothing arrived within ``timeout`` seconds."""
+        with self._ready:
+            if not self._messages:
+                self._ready.wait(timeout)
+            return self._messages.popleft() if self._messages else None
+
+
+class BrokerBackend(ABC):
+    """
+    Transport between brokers.
+
+    ``attach`` is called once with the broker's deliver callback; ``publish``
+    must eventually call it with (channel, message) in every worker, this
+    one included.
+    """
+
+    @abstractmethod
+    def attach(self, deliver):
+        ...
+
+    @abstractmethod
+    def publish(self, channel, message):
+        ...
+
+
+class LocalBackend(BrokerBackend):
+    def attach(self, deliver):
+        self._deliver = deliver
+
+    def publish(self, channel, message):
+        self._deliver(channel, message)
+
+
+class Broker:
+    def __init__(self, backend=None, queue_size=100):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self.backend = backend or LocalBackend()
+        self.backend.attach(self._deliver)
+
+    def subscribe(self, *channels):
+        """One queue receiving the messages of every given channel."""
+        subscription = Subscription(channels, self.queue_size)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers[channel].add(subscription)
+        metrics.incr("broker.subscribed")
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+    def subscriber_count(self, channel):
+        with self._lock:
+            return len(self._subscribers.get(channel, ()))
+
+    def publish(self, channel, message):
+        metrics.incr("broker.published")
+        self.backend.publish(channel, message)
+
+    def _deliver(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put(message)
+        metrics.incr("broker.delivered", len(subscribers))
+
+
+def init_broker(app, backend=None):
+    app.extensions["broker"] = Broker(backend, queue_size=app.config["STREAM_QUEUE_SIZE"])
+
+
+def sse_event(event, data):
+    """Format one server-sent event; ``data`` must already be a JSON string."""
+    return f"event: {event}\ndata: {data}\n\n"
@@ -0,0 +1,68 @@
+"""
+Denormalized comment and reaction counts on check-ins.
+
+``check_ins.comment_count`` and ``check_ins.reaction_count`` let feed cards show
+engagement without a request per card. They are adjusted with an atomic
+``UPDATE ... SET n = n + 1`` in the same flush as the comment or reaction
+insert/delete (via mapper events, so every code path is covered), and can be
+recomputed from scratch with ``flask check-ins recount``.
+
+The counts are not part of cached feed pages: ``current_counts`` reads them for
+a page's check-ins by primary key on every feed request, so an engagement
+change never has to touch the feeds (or versions) of the author's audience.
+"""
+from sqlalchemy import event, func, select, update
+
+from models import CheckInModel, CommentModel, ReactModel
+
+check_ins = CheckInModel.__table__
+comments = CommentModel.__table__
+reacts = ReactModel.__table__
+
+
+def adjust_count(connection, check_in_id, column, delta):
+    if check_in_id is not None:
+        connection.execute(
+            update(check_ins).where(check_ins.c.id == check_in_id)
+            .values({column: check_ins.c[column] + delta})
+        )
+
+
+def current_counts(connection, check_in_ids):
+    """``{check_in_id: {"comment_count": n, "reaction_count": n}}`` for the given check-ins."""
+    if not check_in_ids:
+        return {}
+    rows = connection.execute(
+        select(check_ins.c.id, check_ins.c.comment_count, check_ins.c.reaction_count)
+        .where(check_ins.c.id.in_(check_in_ids))
+    )
+    return {row.id: {"comment_count": row.comment_count, "reaction_count": row.reaction_count} for row in rows}
+
+
+def recount_check_in_counters(connection):
+    """Recompute both counters for every check-in."""
+    comment_count = select(func.count()).where(comments.c.check_in_id == check_ins.c.id).scalar_subquery()
+    reaction_count = select(func.count()).where(reacts.c.check_in_id == check_ins.c.id).scalar_subquery()
+    return connection.execute(
+        update(check_ins).values(comment_count=comment_count, reaction_count=reaction_count)
+    ).rowcount
+
+
+@event.listens_for(CommentModel, "after_insert")
+def _comment_created(mapper, connection, target):
+    adjust_count(connection, target.check_in_id, "comment_count", 1)
+
+
+@event.listens_for(CommentModel, "after_delete")
+def _comment_deleted(mapper, connection, target):
+    adjust_count(connection, target.check_in_id, "comment_count", -1)
+
+
+@event.listens_for(ReactModel, "after_insert")
+def _reaction_created(mapper, connection, target):
+    adjust_count(connection, target.check_in_id, "reaction_count", 1)
+
+
+@event.listens_for(ReactModel, "after_delete")
+def _reaction_deleted(mapper, connection, target):
+    adjust_count(connection, target.check_in_id, "reaction_count", -1)
@@ -0,0 +1,221 @@
+"""
+Incrementally maintained per-member circle statistics.
+
+``circle_member_stats`` holds, per (circle, user), the check-in count, active
+goal count and last check-in time over the user's goals in that circle, which
+is what the leaderboard shows. A check-in on a circle goal is an O(1) counter
+update and an ``is_active`` flip is a +/-1, both in the triggering flush. Rarer
+changes (goal created, deleted or moved to another circle, check-in deleted)
+recompute the affected row from check_ins and goals. ``flask circles
+rebuild-stats`` recomputes the whole table.
+
+For windowed leaderboards the same events keep per-day buckets in
+``circle_member_daily_stats``; a window total is a sum over at most 31 buckets
+per member. Buckets older than BUCKET_RETENTION_DAYS are never read and are
+compacted away by the first check-in of each day (all-time totals live in
+circle_member_stats).
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, select, insert, update, delete, exists, func, case, literal, true, inspect
+
+from models import CheckInModel, GoalModel, CircleMemberStatsModel, CircleMemberDailyStatsModel
+
+# Longer than the longest leaderboard window (a month)
+BUCKET_RETENTION_DAYS = 35
+
+stats = CircleMemberStatsModel.__table__
+daily = CircleMemberDailyStatsModel.__table__
+goals = GoalModel.__table__
+check_ins = CheckInModel.__table__
+
+
+def _member_stats_select():
+    """(circle_id, user_id, total_check_ins, active_goals, last_check_in) grouped from goals and check_ins."""
+    return select(
+        goals.c.circle_id,
+        goals.c.user_id,
+        func.count(check_ins.c.id).label("total_check_ins"),
+        func.count(func.distinct(case((goals.c.is_active == true(), goals.c.id)))).label("active_goals"),
+        func.max(check_ins.c.created_at).label("last_check_in"),
+    ).select_from(
+        goals.outerjoin(check_ins, check_ins.c.goal_id == goals.c.id)
+    ).where(
+        goals.c.circle_id.is_not(None)
+    ).group_by(goals.c.circle_id, goals.c.user_id)
+
+
+def _daily_stats_select(since):
+    """(circle_id, user_id, day, check_ins) grouped from check-ins on or after ``since``."""
+    day = func.date(check_ins.c.created_at)
+    return select(
+        goals.c.circle_id,
+        goals.c.user_id,
+        day.label("day"),
+        func.count(check_ins.c.id).label("check_ins"),
+    ).join_from(
+        goals, check_ins, check_ins.c.goal_id == goals.c.id
+    ).where(
+        goals.c.circle_id.is_not(None),
+        check_ins.c.created_at >= datetime.combine(since, datetime.min.time()),
+    ).group_by(goals.c.circle_id, goals.c.user_id, day)
+
+
+def bucket_cutoff(today=None):
+    """Oldest day that still has a bucket."""
+    return (today or datetime.utcnow().date()) - timedelta(days=BUCKET_RETENTION_DAYS)
+
+
+_last_compacted = None
+
+
+def compact_daily_stats(connection, today=None):
+    """Drop buckets older than the retention window."""
+    global _last_compacted
+    cutoff = bucket_cutoff(today)
+    connection.execute(delete(daily).where(daily.c.day < cutoff))
+    _last_compacted = today or datetime.utcnow().date()
+
+
+def _as_int(value):
+    return int(value) if value is not None else None
+
+
+def _row_criteria(circle_id, user_id):
+    return (stats.c.circle_id == circle_id, stats.c.user_id == user_id)
+
+
+def refresh_member_stats(connection, circle_id, user_id):
+    """Recompute one (circle, user) row; the row is dropped when the user has no goals left there."""
+    if circle_id is None:
+        return
+    connection.execute(delete(stats).where(*_row_criteria(circle_id, user_id)))
+    connection.execute(
+        insert(stats).from_select(
+            ["circle_id", "user_id", "total_check_ins", "active_goals", "last_check_in"],
+            _member_stats_select().where(goals.c.circle_id == circle_id, goals.c.user_id == user_id),
+        )
+    )
+
+    connection.execute(delete(daily).where(daily.c.circle_id == circle_id, daily.c.user_id == user_id))
+    connection.execute(
+        insert(daily).from_select(
+            ["circle_id", "user_id", "day", "check_ins"],
+            _daily_stats_select(bucket_cutoff()).where(
+                goals.c.circle_id == circle_id, goals.c.user_id == user_id
+            ),
+        )
+    )
+
+
+def record_check_in(connection, goal_id, created_at):
+    """Count a new check-in towards its goal's circle, if the goal belongs to one."""
+    goal = connection.execute(
+        select(goals.c.circle_id, goals.c.user_id).where(goals.c.id == goal_id)
+    ).first()
+    if goal is None or goal.circle_id is None:
+        return
+    circle_id, user_id = int(goal.circle_id), int(goal.user_id)
+
+    connection.execute(
+        insert(stats).from_select(
+            ["circle_id", "user_id", "total_check_ins", "active_goals"],
+            select(literal(circle_id), literal(user_id), literal(0), literal(0))
+            .where(~exists().where(*_row_criteria(circle_id, user_id))),
+        )
+    )
+    connection.execute(
+        update(stats).where(*_row_criteria(circle_id, user_id)).values(
+            total_check_ins=stats.c.total_check_ins + 1,
+            last_check_in=case(
+                (stats.c.last_check_in.is_(None), created_at),
+                (stats.c.last_check_in < created_at, created_at),
+                else_=stats.c.last_check_in,
+            ),
+        )
+    )
+
+    day = created_at.date()
+    if day < bucket_cutoff():
+        return
+    bucket = (daily.c.circle_id == circle_id, daily.c.user_id == user_id, daily.c.day == day)
+    connection.execute(
+        insert(daily).from_select(
+            ["circle_id", "user_id", "day", "check_ins"],
+            select(literal(circle_id), literal(user_id), literal(day), literal(0))
+            .where(~exists().where(*bucket)),
+        )
+    )
+    connection.execute(update(daily).where(*bucket).values(check_ins=daily.c.check_ins + 1))
+
+    if _last_compacted != datetime.utcnow().date():
+        compact_daily_stats(connection)
+
+
+def rebuild_circle_member_stats(connection):
+    connection.execute(delete(stats))
+    connection.execute(
+        insert(stats).from_select(
+            ["circle_id", "user_id", "total_check_ins", "active_goals", "last_check_in"],
+            _member_stats_select(),
+        )
+    )
+    connection.execute(delete(daily))
+    connection.execute(
+        insert(daily).from_select(
+            ["circle_id", "user_id", "day", "check_ins"],
+            _daily_stats_select(bucket_cutoff()),
+        )
+    )
+
+
+def _goal_owner(connection, goal_id):
+    return connection.execute(
+        select(goals.c.circle_id, goals.c.user_id).where(goals.c.id == goal_id)
+    ).first()
+
+
+@event.listens_for(CheckInModel, "after_insert")
+def _check_in_created(mapper, connection, target):
+    if target.goal_id is not None:
+        record_check_in(connection, int(target.goal_id), target.created_at)
+
+
+@event.listens_for(CheckInModel, "after_delete")
+def _check_in_deleted(mapper, connection, target):
+    if target.goal_id is None:
+        return
+    goal = _goal_owner(connection, int(target.goal_id))
+    if goal is not None:
+        refresh_member_stats(connection, _as_int(goal.circle_id), int(goal.user_id))
+
+
+@event.listens_for(GoalModel, "after_insert")
+@event.listens_for(GoalModel, "after_delete")
+def _goal_added_or_removed(mapper, connection, target):
+    refresh_member_stats(connection, _as_int(target.circle_id), int(target.user_id))
+
+
+@event.listens_for(GoalModel, "after_update")
+def _goal_updated(mapper, connection, target):
+    state = inspect(target)
+    circle = state.attrs.circle_id.history
+    owner = state.attrs.user_id.history
+    if circle.has_changes() or owner.has_changes():
+        old_circle = circle.deleted[0] if circle.deleted else target.circle_id
+        old_user = owner.deleted[0] if owner.deleted else target.user_id
+        refresh_member_stats(connection, _as_int(old_circle), int(old_user))
+        refresh_member_stats(connection, _as_int(target.circle_id), int(target.user_id))
+        return
+
+    active = state.attrs.is_active.history
+    if not active.has_changes() or target.circle_id is None:
+        return
+    if not active.deleted:
+        # Previous value was never loaded, so the direction of the flip is unknown
+        refresh_member_stats(connection, _as_int(target.circle_id), int(target.user_id))
+    elif bool(active.deleted[0]) != bool(target.is_active):
+        connection.execute(
+            update(stats).where(*_row_criteria(int(target.circle_id), int(target.user_id)))
+            .values(active_goals=stats.c.active_goals + (1 if target.is_active else -1))
+        )
@@ -0,0 +1,65 @@
+"""
+Publishes new circle chat messages to the live streams of the circle's members.
+
+Every circle has one broker channel that all of its members' streams subscribe
+to, so a message costs one publish however large the circle is. Messages are
+collected during the flush and published after the transaction commits, the
+same way as the feed stream, and carry the full message so clients never have
+to re-read the history to show it.
+
+When a membership is deleted a "member_left" event goes to the circle's
+channel as well; the departing member's own stream ends on it, so nobody keeps
+receiving a circle's chat after leaving it.
+"""
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+
+from models import CircleMessageModel, CircleMembershipModel
+from services.after_commit import defer, on_commit
+from services.membership_events import on_members_removed
+
+MESSAGE_EVENT = "message"
+MEMBER_LEFT_EVENT = "member_left"
+
+
+def circle_channel(circle_id):
+    return f"circle:{int(circle_id)}"
+
+
+def _queue(session, circle_id, event_name, data):
+    defer(session, "circle_stream", (circle_channel(circle_id), {"event": event_name, "data": data}))
+
+
+@event.listens_for(CircleMessageModel, "after_insert")
+def _message_created(mapper, connection, target):
+    _queue(object_session(target), target.circle_id, MESSAGE_EVENT, {
+        "id": target.id,
+        "circle_id": int(target.circle_id),
+        "user_id": int(target.user_id),
+        "message": target.message,
+        "sent_at": target.sent_at.isoformat() if target.sent_at else None,
+    })
+
+
+@event.listens_for(CircleMembershipModel, "after_delete")
+def _membership_deleted(mapper, connection, target):
+    _queue(object_session(target), target.circle_id, MEMBER_LEFT_EVENT, {
+        "circle_id": int(target.circle_id),
+        "user_id": int(target.user_id),
+    })
+
+
+@on_members_removed
+def _members_removed(session, connection, circle_id, user_ids):
+    for user_id in user_ids:
+        _queue(session, circle_id, MEMBER_LEFT_EVENT, {"circle_id": int(circle_id), "user_id": int(user_id)})
+
+
+@on_commit("circle_stream")
+def _publish(pending):
+    if not has_app_context() or "broker" not in current_app.extensions:
+        return
+    broker = current_app.extensions["broker"]
+    for channel, message in pending:
+        broker.publish(channel, message)
@@ -0,0 +1,189 @@
+"""
+Per-user cache of serialized feed pages.
+
+Entries are keyed by user, feed variant and page arguments, plus a per-user
+generation number. Invalidating a user bumps their generation, so every cached
+page for them becomes unreachable at once without having to enumerate keys,
+which keeps the backend interface small enough to put on a shared store.
+
+Invalidation is driven by mapper events on CheckInModel, FollowModel and
+CircleMembershipModel. The affected user IDs are collected during the flush
+and applied after the transaction commits, so a concurrent request cannot
+re-cache the pre-commit state.
+"""
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+
+from models import CheckInModel, FollowModel, CircleMembershipModel
+from services import metrics
+from services.after_commit import defer, on_commit
+from services.single_flight import SingleFlight
+from services.membership_events import on_members_added, on_members_removed
+from services.feed_query import check_in_audience_ids, circle_member_ids, high_fanout_threshold, is_high_fanout
+
+
+class CacheBackend(ABC):
+    """
+    Storage used by FeedCache.
+
+    The default is the in-process LRUCacheBackend; implement this interface
+    (e.g. on top of Redis GET/SETEX/INCR) to share the cache between workers.
+    """
+
+    @abstractmethod
+    def get(self, key):
+        ...
+
+    @abstractmethod
+    def set(self, key, value, ttl=None):
+        ...
+
+    @abstractmethod
+    def incr(self, key):
+        """Atomically increment an integer counter and return the new value."""
+
+    @abstractmethod
+    def clear(self):
+        ...
+
+
+class LRUCacheBackend(CacheBackend):
+    """Thread-safe in-process LRU. Generation counters are kept apart so they are never evicted."""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._counters = {}
+
+    def get(self, key):
+        with self._lock:
+            if key in self._counters:
+                return self._counters[key]
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._counters.clear()
+
+
+class FeedCache:
+    def __init__(self, backend, ttl=None):
+        self.backend = backend
+        self.ttl = ttl
+        self.flight = SingleFlight()
+
+    def _key(self, user_id, variant, args, version=None):
+        generation = self.backend.get(f"feed:gen:{user_id}") or 0
+        version = ":".join(str(part) for part in version) if version else ""
+        return f"feed:{user_id}:{generation}:{version}:{variant}:{args.get('before') or ''}:{args['limit']}"
+
+    def get_or_compute(self, user_id, variant, args, compute, version=None):
+        """
+        Return the cached page, or compute, store and return it.
+
+        ``version`` is optional extra key material (e.g. the feed's ETag data).
+        Concurrent misses for the same page share one computation.
+        """
+        key = self._key(user_id, variant, args, version)
+        value = self.backend.get(key)
+        if value is not None:
+            metrics.incr("feed_cache.hits")
+            return value
+
+        def load():
+            metrics.incr("feed_cache.misses")
+            value = compute()
+            self.backend.set(key, value, ttl=self.ttl)
+            return value
+
+        return self.flight.do(key, load)
+
+    def invalidate(self, user_ids):
+        for user_id in user_ids:
+            self.backend.incr(f"feed:gen:{user_id}")
+        metrics.incr("feed_cache.invalidations", len(user_ids))
+
+    def clear(self):
+        self.backend.clear()
+
+
+def init_feed_cache(app, backend=None):
+    backend = backend or LRUCacheBackend(app.config["FEED_CACHE_SIZE"])
+    app.extensions["feed_cache"] = FeedCache(backend, ttl=app.config["FEED_CACHE_TTL"])
+
+
+def _mark_stale(target, user_ids):
+    defer(object_session(target), "feed_cache", *user_ids)
+
+
+@event.listens_for(CheckInModel, "after_insert")
+def _check_in_created(mapper, connection, target):
+    author_id = int(target.user_id)
+    # Followers of a high-fanout author see the new check-in through the ETag version in the key
+    pulled = is_high_fanout(connection, author_id, high_fanout_threshold())
+    _mark_stale(target, check_in_audience_ids(connection, author_id, include_followers=not pulled))
+
+
+@event.listens_for(CheckInModel, "after_delete")
+def _check_in_deleted(mapper, connection, target):
+    author_id = int(target.user_id)
+    pulled = is_high_fanout(connection, author_id, high_fanout_threshold())
+    _mark_stale(target, check_in_audience_ids(connection, author_id, include_followers=not pulled))
+
+
+@event.listens_for(FollowModel, "after_insert")
+@event.listens_for(FollowModel, "after_delete")
+def _follow_changed(mapper, connection, target):
+    _mark_stale(target, {int(target.follower_id)})
+
+
+@event.listens_for(CircleMembershipModel, "after_insert")
+@event.listens_for(CircleMembershipModel, "after_delete")
+def _membership_changed(mapper, connection, target):
+    user_ids = circle_member_ids(connection, int(target.circle_id)) | {int(target.user_id)}
+    _mark_stale(target, user_ids)
+
+
+@on_members_added
+def _members_added(session, connection, circle_id, user_ids):
+    defer(session, "feed_cache", *circle_member_ids(connection, circle_id))
+
+
+@on_members_removed
+def _members_removed(session, connection, circle_id, user_ids):
+    defer(session, "feed_cache", *circle_member_ids(connection, circle_id), *user_ids)
+
+
+@on_commit("feed_cache")
+def _apply_invalidations(user_ids):
+    if has_app_context() and "feed_cache" in current_app.extensions:
+        current_app.extensions["feed_cache"].invalidate(set(user_ids))
@@ -0,0 +1,95 @@
+"""
+Incremental feed updates for clients that already hold the top of their feed.
+
+A "since" cursor records the newest item the client has (created_at, id) and
+the server time the cursor was issued. The delta is then a range read of items
+after that position plus the feed_tombstones recorded after the issue time
+(the owner's own, and the author-level ones of the authors they follow), so a
+poll costs O(new items) no matter how long the feed is.
+"""
+import base64
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, and_, select
+
+from db import db
+from models import CheckInModel, FeedTombstoneModel, FollowModel
+from services.pagination import after_cursor
+
+# Position used when the feed is empty: everything is newer than this
+EMPTY_FEED_POSITION = (datetime(1970, 1, 1), 0)
+
+
+def encode_since_cursor(created_at, row_id, issued_at):
+    raw = f"{created_at.isoformat()}|{row_id}|{issued_at.isoformat()}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_since_cursor(cursor):
+    """Return ``(created_at, id, issued_at)``, raising ValueError if the cursor is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, row_id, issued_at = raw.split("|")
+        return datetime.fromisoformat(created_at), int(row_id), datetime.fromisoformat(issued_at)
+    except (ValueError, UnicodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def since_cursor_for(check_ins):
+    """The since cursor for a client that now holds ``check_ins`` (newest first)."""
+    position = (check_ins[0].created_at, check_ins[0].id) if check_ins else EMPTY_FEED_POSITION
+    return encode_since_cursor(*position, datetime.utcnow())
+
+
+def feed_delta(owner_id, query, created_at_column, id_column, cursor, limit, retention_days):
+    """
+    Items added to ``query`` after the cursor and IDs removed from it since it was issued.
+
+    ``query`` is one of the feed queries from services/feed_query.py. Returns None
+    if the cursor is older than the tombstone retention window, in which case
+    removals may have been pruned and the client has to reload the feed.
+    """
+    created_at, row_id, issued_at = cursor
+    now = datetime.utcnow()
+    if issued_at < now - timedelta(days=retention_days):
+        return None
+
+    # Oldest-first so a capped delta can be continued from its last item
+    new_check_ins = query.filter(
+        after_cursor(created_at_column, id_column, (created_at, row_id))
+    ).order_by(created_at_column, id_column).limit(limit + 1).all()
+    has_more = len(new_check_ins) > limit
+    new_check_ins = new_check_ins[:limit]
+
+    removed_ids = {
+        row[0] for row in db.session.query(FeedTombstoneModel.check_in_id).filter(
+            or_(
+                FeedTombstoneModel.owner_id == owner_id,
+                and_(
+                    FeedTombstoneModel.owner_id.is_(None),
+                    FeedTombstoneModel.author_id.in_(
+                        select(FollowModel.following_id).where(FollowModel.follower_id == owner_id)
+                    ),
+                ),
+            ),
+            FeedTombstoneModel.removed_at >= issued_at,
+        ).distinct()
+    }
+    if removed_ids:
+        # An entry can come back (e.g. re-follow); only report what is still gone
+        still_visible = {
+            row[0] for row in query.filter(CheckInModel.id.in_(removed_ids)).with_entities(CheckInModel.id)
+        }
+        removed_ids -= still_visible
+
+    if new_check_ins:
+        position = (new_check_ins[-1].created_at, new_check_ins[-1].id)
+    else:
+        position = (created_at, row_id)
+
+    return {
+        "feed": list(reversed(new_check_ins)),
+        "deleted": sorted(removed_ids),
+        "has_more": has_more,
+        "since_cursor": encode_since_cursor(*position, now),
+    }
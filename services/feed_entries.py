@@ -0,0 +1,342 @@
+"""
+Fan-out-on-write maintenance of the materialized ``feed_entries`` table.
+
+Every check-in is copied into the feed of each user who should see it, so the
+feed endpoints only have to read one owner's rows in ``created_at`` order. The
+table is kept current by mapper events, which means check-ins, follows and
+circle memberships created through any code path are picked up, and the rows
+are written on the same connection (and transaction) as the triggering flush.
+
+With FEED_STRATEGY "hybrid", an author whose ``follower_count`` reaches
+FEED_HIGH_FANOUT_THRESHOLD is flagged ``users.high_fanout`` and no longer
+fanned out to their followers (their own and circle entries still are);
+followers pull their check-ins at read time. The flag is only cleared, and the
+followers' entries backfilled in the same flush, once the author drops below
+the lower FEED_HIGH_FANOUT_EXIT_THRESHOLD, so an author hovering around the
+threshold does not backfill every follower on each unfollow.
+"""
+from datetime import datetime
+
+from sqlalchemy import event, select, insert, update, delete, exists, literal, tuple_, and_, or_, true, false, func
+
+from models import CheckInModel, FollowModel, CircleMembershipModel, FeedEntryModel, FeedTombstoneModel, UserModel
+from services import metrics
+from services.feed_query import high_fanout_threshold, high_fanout_exit_threshold, is_high_fanout
+from services.membership_events import on_members_added, on_members_removed
+
+feed_entries = FeedEntryModel.__table__
+tombstones = FeedTombstoneModel.__table__
+check_ins = CheckInModel.__table__
+follows = FollowModel.__table__
+memberships = CircleMembershipModel.__table__
+users = UserModel.__table__
+
+VIA_SELF = "via_self"
+VIA_FOLLOW = "via_follow"
+VIA_CIRCLE = "via_circle"
+VIA_FLAGS = (VIA_SELF, VIA_FOLLOW, VIA_CIRCLE)
+
+
+def _co_member_pairs():
+    """(owner_id, author_id) for every pair of users sharing a circle, self-pairs included."""
+    owner_m = memberships.alias("owner_m")
+    author_m = memberships.alias("author_m")
+    return owner_m, author_m, select(
+        owner_m.c.user_id.label("owner_id"),
+        author_m.c.user_id.label("author_id"),
+    ).join_from(owner_m, author_m, owner_m.c.circle_id == author_m.c.circle_id)
+
+
+def _grant(connection, audience, flag, check_in_id=None):
+    """
+    Mark the check-ins described by ``audience`` as visible through ``flag``.
+
+    ``audience`` is a select of ``(owner_id, author_id)`` pairs; every check-in by
+    the author is added to the owner's feed (or only ``check_in_id`` when given).
+    Existing rows get the flag switched on, missing rows are inserted.
+    """
+    audience = audience.subquery()
+    source = select(
+        audience.c.owner_id,
+        check_ins.c.id.label("check_in_id"),
+        check_ins.c.user_id.label("author_id"),
+        check_ins.c.created_at,
+    ).join_from(
+        audience, check_ins, check_ins.c.user_id == audience.c.author_id
+    ).distinct()
+    if check_in_id is not None:
+        source = source.where(check_ins.c.id == check_in_id)
+    source = source.subquery()
+
+    connection.execute(
+        update(feed_entries)
+        .where(tuple_(feed_entries.c.owner_id, feed_entries.c.check_in_id).in_(
+            select(source.c.owner_id, source.c.check_in_id)
+        ))
+        .values({flag: True})
+    )
+
+    already_present = exists().where(
+        feed_entries.c.owner_id == source.c.owner_id,
+        feed_entries.c.check_in_id == source.c.check_in_id,
+    )
+    connection.execute(
+        insert(feed_entries).from_select(
+            ["owner_id", "check_in_id", "author_id", "created_at", *VIA_FLAGS],
+            select(
+                source.c.owner_id,
+                source.c.check_in_id,
+                source.c.author_id,
+                source.c.created_at,
+                *[(true() if name == flag else false()) for name in VIA_FLAGS],
+            ).where(~already_present),
+        )
+    )
+
+
+def _record_tombstones(connection, criteria):
+    """Remember removed entries so /feed/since can tell clients to drop them."""
+    connection.execute(
+        insert(tombstones).from_select(
+            ["owner_id", "check_in_id", "removed_at"],
+            select(feed_entries.c.owner_id, feed_entries.c.check_in_id, literal(datetime.utcnow()))
+            .where(criteria),
+        )
+    )
+
+
+def _revoke(connection, criteria, flag):
+    """Clear ``flag`` on the matching rows and drop rows no longer visible through anything."""
+    _record_tombstones(connection, and_(criteria, feed_entries.c[flag] == true()))
+    connection.execute(
+        update(feed_entries).where(criteria, feed_entries.c[flag] == true()).values({flag: False})
+    )
+    connection.execute(
+        delete(feed_entries).where(
+            criteria,
+            *[feed_entries.c[name] == false() for name in VIA_FLAGS],
+        )
+    )
+
+
+def _followers_of(author_id):
+    return select(
+        follows.c.follower_id.label("owner_id"),
+        follows.c.following_id.label("author_id"),
+    ).where(follows.c.following_id == author_id)
+
+
+def fan_out_check_in(connection, check_in_id, author_id, threshold=None):
+    """
+    Copy a new check-in into its author's feed and the feeds of their audience.
+
+    Followers are skipped when the author has at least ``threshold`` of them.
+    """
+    connection.execute(
+        insert(feed_entries).from_select(
+            ["owner_id", "check_in_id", "author_id", "created_at", *VIA_FLAGS],
+            select(
+                check_ins.c.user_id, check_ins.c.id, check_ins.c.user_id, check_ins.c.created_at,
+                true(), false(), false(),
+            ).where(check_ins.c.id == check_in_id),
+        )
+    )
+
+    if is_high_fanout(connection, author_id, threshold):
+        metrics.incr("feed.fanout.skipped")
+    else:
+        metrics.incr("feed.fanout.pushed")
+        _grant(connection, _followers_of(author_id), VIA_FOLLOW, check_in_id=check_in_id)
+
+    _, author_m, co_members = _co_member_pairs()
+    _grant(connection, co_members.where(author_m.c.user_id == author_id), VIA_CIRCLE,
+           check_in_id=check_in_id)
+
+
+def backfill_follow(connection, follower_id, following_id):
+    """Add the followed user's existing check-ins to the follower's feed."""
+    pair = select(literal(follower_id).label("owner_id"), literal(following_id).label("author_id"))
+    _grant(connection, pair, VIA_FOLLOW)
+
+
+def backfill_followers(connection, author_id):
+    """Add the author's check-ins to every follower's feed (the author stopped being high-fanout)."""
+    _grant(connection, _followers_of(author_id), VIA_FOLLOW)
+
+
+def adjust_follower_count(connection, author_id, delta):
+    """Apply ``delta`` to the author's follower_count and return the new count."""
+    connection.execute(
+        update(users).where(users.c.id == author_id)
+        .values(follower_count=users.c.follower_count + delta)
+    )
+    return connection.execute(
+        select(users.c.follower_count).where(users.c.id == author_id)
+    ).scalar()
+
+
+def set_high_fanout(connection, author_id, high_fanout):
+    connection.execute(update(users).where(users.c.id == author_id).values(high_fanout=high_fanout))
+
+
+def prune_follow(connection, follower_id, following_id):
+    """Remove the unfollowed user's check-ins from the follower's feed."""
+    _revoke(connection, and_(
+        feed_entries.c.owner_id == follower_id,
+        feed_entries.c.author_id == following_id,
+    ), VIA_FOLLOW)
+
+
+def backfill_circle_join(connection, circle_id, user_ids):
+    """Share check-ins between new circle members and the rest of the circle."""
+    owner_m, author_m, co_members = _co_member_pairs()
+    _grant(connection, co_members.where(
+        or_(
+            and_(owner_m.c.user_id.in_(user_ids), author_m.c.circle_id == circle_id),
+            and_(author_m.c.user_id.in_(user_ids), owner_m.c.circle_id == circle_id),
+        )
+    ), VIA_CIRCLE)
+
+
+def prune_circle_leave(connection, user_ids):
+    """
+    Drop circle visibility between departing members and users they no longer share a circle with.
+
+    Runs after the membership row is gone, so any circle still shared keeps the entry.
+    """
+    owner_m = memberships.alias("owner_m")
+    author_m = memberships.alias("author_m")
+    still_shared = exists().where(
+        owner_m.c.user_id == feed_entries.c.owner_id,
+        author_m.c.user_id == feed_entries.c.author_id,
+        owner_m.c.circle_id == author_m.c.circle_id,
+    )
+    _revoke(connection, and_(
+        or_(feed_entries.c.owner_id.in_(user_ids), feed_entries.c.author_id.in_(user_ids)),
+        ~still_shared,
+    ), VIA_CIRCLE)
+
+
+def remove_check_in(connection, check_in_id):
+    """Take a deleted check-in out of every feed it was fanned out to."""
+    criteria = feed_entries.c.check_in_id == check_in_id
+    _record_tombstones(connection, criteria)
+    connection.execute(delete(feed_entries).where(criteria))
+
+
+def record_pulled_removal(connection, check_in_id, author_id):
+    """
+    Tombstone a deleted check-in for followers who were pulling it rather than holding an entry.
+
+    One author-level row covers every follower (/feed/since joins it through
+    follows), so the write does not grow with the follower count.
+    """
+    connection.execute(
+        insert(tombstones).values(
+            owner_id=None, author_id=author_id, check_in_id=check_in_id, removed_at=datetime.utcnow()
+        )
+    )
+
+
+def prune_tombstones(connection, older_than):
+    connection.execute(delete(tombstones).where(tombstones.c.removed_at < older_than))
+
+
+def rebuild_feed_entries(connection, threshold=None):
+    """
+    Recompute the whole table (and users.follower_count) from check_ins, follows and circle_memberships.
+
+    With a ``threshold``, authors with that many followers or more are flagged
+    high-fanout and left to the hybrid read path; without one every flag is cleared.
+    """
+    follower_count = select(func.count()).where(
+        follows.c.following_id == users.c.id
+    ).scalar_subquery()
+    connection.execute(update(users).values(follower_count=follower_count))
+    connection.execute(update(users).values(
+        high_fanout=users.c.follower_count >= threshold if threshold is not None else false()
+    ))
+
+    connection.execute(delete(feed_entries))
+
+    connection.execute(
+        insert(feed_entries).from_select(
+            ["owner_id", "check_in_id", "author_id", "created_at", *VIA_FLAGS],
+            select(
+                check_ins.c.user_id, check_ins.c.id, check_ins.c.user_id, check_ins.c.created_at,
+                true(), false(), false(),
+            ),
+        )
+    )
+
+    followers = select(
+        follows.c.follower_id.label("owner_id"),
+        follows.c.following_id.label("author_id"),
+    )
+    if threshold is not None:
+        followers = followers.join_from(
+            follows, users, users.c.id == follows.c.following_id
+        ).where(users.c.high_fanout.is_(False))
+    _grant(connection, followers, VIA_FOLLOW)
+
+    _, _, co_members = _co_member_pairs()
+    _grant(connection, co_members, VIA_CIRCLE)
+
+
+@event.listens_for(CheckInModel, "after_insert")
+def _check_in_created(mapper, connection, target):
+    fan_out_check_in(connection, target.id, int(target.user_id), high_fanout_threshold())
+
+
+@event.listens_for(CheckInModel, "before_delete")
+def _check_in_deleted(mapper, connection, target):
+    # before_delete, so the feed_entries rows referencing it are gone before the check-in row
+    remove_check_in(connection, target.id)
+    if is_high_fanout(connection, int(target.user_id), high_fanout_threshold()):
+        record_pulled_removal(connection, target.id, int(target.user_id))
+
+
+@event.listens_for(FollowModel, "after_insert")
+def _follow_created(mapper, connection, target):
+    author_id = int(target.following_id)
+    follower_count = adjust_follower_count(connection, author_id, 1)
+    threshold = high_fanout_threshold()
+    if is_high_fanout(connection, author_id, threshold):
+        return
+    if threshold is not None and follower_count >= threshold:
+        # Just reached the threshold: followers pull this author from now on
+        set_high_fanout(connection, author_id, True)
+    else:
+        backfill_follow(connection, int(target.follower_id), author_id)
+
+
+@event.listens_for(FollowModel, "after_delete")
+def _follow_deleted(mapper, connection, target):
+    author_id = int(target.following_id)
+    follower_count = adjust_follower_count(connection, author_id, -1)
+    prune_follow(connection, int(target.follower_id), author_id)
+    if (is_high_fanout(connection, author_id, high_fanout_threshold())
+            and follower_count < high_fanout_exit_threshold()):
+        # Dropped below the exit threshold: followers no longer pull this author
+        set_high_fanout(connection, author_id, False)
+        backfill_followers(connection, author_id)
+
+
+@event.listens_for(CircleMembershipModel, "after_insert")
+def _membership_created(mapper, connection, target):
+    backfill_circle_join(connection, int(target.circle_id), [int(target.user_id)])
+
+
+@on_members_added
+def _members_added(session, connection, circle_id, user_ids):
+    backfill_circle_join(connection, circle_id, user_ids)
+
+
+@event.listens_for(CircleMembershipModel, "after_delete")
+def _membership_deleted(mapper, connection, target):
+    prune_circle_leave(connection, [int(target.user_id)])
+
+
+@on_members_removed
+def _members_removed(session, connection, circle_id, user_ids):
+    prune_circle_leave(connection, user_ids)
@@ -0,0 +1,55 @@
+"""
+Read path of the "hybrid" feed strategy.
+
+A hybrid page merges two newest-first streams: the owner's rows in
+feed_entries (everything that was fanned out on write) and the check-ins of the
+high-fanout authors they follow, read from check_ins at request time. Each
+stream is a range read on a (created_at, id) ordered index capped at the page
+size, and the streams are combined with a k-way heap merge. A check-in present
+in both (fanned out before its author crossed the threshold) is kept once.
+"""
+import heapq
+
+from sqlalchemy import desc
+
+from models import CheckInModel
+from services import metrics
+from services.feed_query import VARIANT_CIRCLES, materialized_feed_query, followed_high_fanout_ids
+from services.pagination import before_cursor
+
+
+def merge_newest_first(streams, limit):
+    """Merge check-in lists sorted newest first into one list of at most ``limit``, dropping duplicates."""
+    merged = []
+    seen = set()
+    for check_in in heapq.merge(*streams, key=lambda c: (c.created_at, c.id), reverse=True):
+        if check_in.id in seen:
+            continue
+        seen.add(check_in.id)
+        merged.append(check_in)
+        if len(merged) == limit:
+            break
+    return merged
+
+
+def _newest_first(query, created_at_column, id_column, cursor, limit):
+    if cursor is not None:
+        query = query.filter(before_cursor(created_at_column, id_column, cursor))
+    return query.order_by(desc(created_at_column), desc(id_column)).limit(limit).all()
+
+
+def hybrid_feed_rows(owner_id, variant, cursor, limit, options=()):
+    """Up to ``limit`` check-ins of the owner's feed older than ``cursor`` (None for the first page)."""
+    query, created_at_column, id_column = materialized_feed_query(owner_id, variant)
+    streams = [_newest_first(query.options(*options), created_at_column, id_column, cursor, limit)]
+
+    if variant != VARIANT_CIRCLES:
+        # All followed high-fanout authors in one statement; there are few by definition
+        pulled = CheckInModel.query.options(*options).filter(
+            CheckInModel.user_id.in_(followed_high_fanout_ids(owner_id))
+        )
+        streams.append(_newest_first(pulled, CheckInModel.created_at, CheckInModel.id, cursor, limit))
+        metrics.incr("feed.hybrid.pulled", len(streams[-1]))
+
+    metrics.incr("feed.hybrid.reads")
+    return merge_newest_first(streams, limit)
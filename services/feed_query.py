@@ -0,0 +1,156 @@
+"""
+Read paths for the three feed variants.
+
+``materialized_feed_query`` reads the owner's rows from feed_entries (see
+services/feed_entries.py). ``pull_feed_query`` computes the same feed straight
+from check_ins, with the audience expressed as EXISTS subqueries over follows
+and circle_memberships, so the database plans the whole feed as one statement
+instead of shipping ID lists back and forth.
+
+In the "hybrid" strategy feed_entries holds everything except the follow
+entries of high-fanout authors (``users.high_fanout``, see
+services/feed_entries.py); those are pulled per request, see
+services/feed_hybrid.py.
+"""
+from flask import current_app, has_app_context
+from sqlalchemy import exists, or_, select, union
+
+from models import CheckInModel, FollowModel, CircleMembershipModel, FeedEntryModel, UserModel
+
+VARIANT_ALL = "all"
+VARIANT_FOLLOWING = "following"
+VARIANT_CIRCLES = "circles"
+
+memberships = CircleMembershipModel.__table__
+users = UserModel.__table__
+
+
+def high_fanout_threshold():
+    """Follower count from which authors are pulled instead of fanned out, or None when not in hybrid mode."""
+    if not has_app_context() or current_app.config.get("FEED_STRATEGY") != "hybrid":
+        return None
+    return current_app.config["FEED_HIGH_FANOUT_THRESHOLD"]
+
+
+def high_fanout_exit_threshold():
+    """Follower count below which a high-fanout author is fanned out again, or None when not in hybrid mode."""
+    if high_fanout_threshold() is None:
+        return None
+    return current_app.config["FEED_HIGH_FANOUT_EXIT_THRESHOLD"]
+
+
+def is_high_fanout(connection, author_id, threshold):
+    if threshold is None:
+        return False
+    return bool(connection.execute(
+        select(users.c.high_fanout).where(users.c.id == author_id)
+    ).scalar())
+
+
+def followed_high_fanout_ids(user_id):
+    """Select of the high-fanout authors ``user_id`` follows."""
+    return select(FollowModel.following_id).join(
+        UserModel, UserModel.id == FollowModel.following_id
+    ).where(
+        FollowModel.follower_id == user_id,
+        UserModel.high_fanout.is_(True),
+    )
+
+
+def follows_author(user_id, author_column):
+    """True when ``user_id`` follows the author."""
+    return exists().where(
+        FollowModel.follower_id == user_id,
+        FollowModel.following_id == author_column,
+    )
+
+
+def shares_circle_with_author(user_id, author_column):
+    """True when ``user_id`` and the author are members of at least one common circle."""
+    own = memberships.alias("own_m")
+    other = memberships.alias("other_m")
+    return exists().where(
+        own.c.user_id == user_id,
+        other.c.circle_id == own.c.circle_id,
+        other.c.user_id == author_column,
+    )
+
+
+def audience_filter(user_id, variant, author_column=CheckInModel.user_id):
+    """Criterion selecting the check-in authors that belong in ``user_id``'s feed variant."""
+    if variant == VARIANT_FOLLOWING:
+        return follows_author(user_id, author_column)
+    if variant == VARIANT_CIRCLES:
+        return shares_circle_with_author(user_id, author_column)
+    return or_(
+        author_column == user_id,
+        follows_author(user_id, author_column),
+        shares_circle_with_author(user_id, author_column),
+    )
+
+
+def pull_feed_query(user_id, variant):
+    """Feed computed at read time; returns the query and its (created_at, id) sort columns."""
+    query = CheckInModel.query.filter(audience_filter(user_id, variant))
+    return query, CheckInModel.created_at, CheckInModel.id
+
+
+def materialized_feed_query(user_id, variant):
+    """Feed read from feed_entries; returns the query and its (created_at, id) sort columns."""
+    query = CheckInModel.query.join(
+        FeedEntryModel, FeedEntryModel.check_in_id == CheckInModel.id
+    ).filter(FeedEntryModel.owner_id == user_id)
+
+    if variant == VARIANT_FOLLOWING:
+        query = query.filter(FeedEntryModel.via_follow.is_(True))
+    elif variant == VARIANT_CIRCLES:
+        query = query.filter(FeedEntryModel.via_circle.is_(True))
+
+    return query, FeedEntryModel.created_at, FeedEntryModel.check_in_id
+
+
+def hybrid_feed_query(user_id, variant):
+    """
+    Materialized entries plus check-ins of followed high-fanout authors, as one query.
+
+    Used where a single query is needed (/feed/since); pages are read as a merge of
+    separate range reads instead, see services/feed_hybrid.py.
+    """
+    entries = select(FeedEntryModel.check_in_id).where(FeedEntryModel.owner_id == user_id)
+    if variant == VARIANT_FOLLOWING:
+        entries = entries.where(FeedEntryModel.via_follow.is_(True))
+    elif variant == VARIANT_CIRCLES:
+        entries = entries.where(FeedEntryModel.via_circle.is_(True))
+
+    visible = CheckInModel.id.in_(entries)
+    if variant != VARIANT_CIRCLES:
+        pulled_authors = followed_high_fanout_ids(user_id)
+        visible = or_(visible, CheckInModel.user_id.in_(pulled_authors))
+
+    return CheckInModel.query.filter(visible), CheckInModel.created_at, CheckInModel.id
+
+
+def check_in_audience_ids(connection, author_id, include_followers=True):
+    """
+    IDs of everyone whose feed shows the author's check-ins: the author, followers and co-members.
+
+    Pass ``include_followers=False`` for high-fanout authors in the hybrid feed,
+    whose followers pick their check-ins up at read time.
+    """
+    own = memberships.alias("own_m")
+    other = memberships.alias("other_m")
+    co_members = select(other.c.user_id).join_from(
+        own, other, own.c.circle_id == other.c.circle_id
+    ).where(own.c.user_id == author_id)
+    if include_followers:
+        followers = select(FollowModel.follower_id).where(FollowModel.following_id == author_id)
+        audience = union(followers, co_members)
+    else:
+        audience = co_members
+    return {author_id, *connection.execute(audience).scalars()}
+
+
+def circle_member_ids(connection, circle_id):
+    return set(connection.execute(
+        select(memberships.c.user_id).where(memberships.c.circle_id == circle_id)
+    ).scalars())
@@ -0,0 +1,52 @@
+"""
+Publishes new check-ins to the live feed streams of everyone in their audience.
+
+The audience is computed during the flush that inserts the check-in (the same
+query the feed cache uses) and the messages are published only after the
+transaction commits, so a subscriber never hears about a check-in it cannot
+read yet.
+
+In the hybrid feed a high-fanout author's check-ins are published once, to the
+author's own channel, which their followers' streams subscribe to.
+"""
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+
+from models import CheckInModel
+from services.after_commit import defer, on_commit
+from services.feed_query import check_in_audience_ids, high_fanout_threshold, is_high_fanout
+
+
+def feed_channel(user_id):
+    return f"feed:{user_id}"
+
+
+def author_channel(user_id):
+    return f"author:{user_id}"
+
+
+@event.listens_for(CheckInModel, "after_insert")
+def _check_in_created(mapper, connection, target):
+    message = {
+        "check_in_id": target.id,
+        "user_id": int(target.user_id),
+        "created_at": target.created_at.isoformat() if target.created_at else None,
+    }
+    author_id = int(target.user_id)
+    pulled = is_high_fanout(connection, author_id, high_fanout_threshold())
+    channels = [feed_channel(user_id) for user_id in
+                check_in_audience_ids(connection, author_id, include_followers=not pulled)]
+    if pulled:
+        channels.append(author_channel(author_id))
+    defer(object_session(target), "feed_stream", (message, channels))
+
+
+@on_commit("feed_stream")
+def _publish(pending):
+    if not has_app_context() or "broker" not in current_app.extensions:
+        return
+    broker = current_app.extensions["broker"]
+    for message, channels in pending:
+        for channel in channels:
+            broker.publish(channel, message)
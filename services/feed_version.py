@@ -0,0 +1,108 @@
+"""
+Cheap version tags for the feed endpoints.
+
+A feed page can only change when a new check-in reaches the user's feed or when
+the user's audience graph changes. The first is visible as the newest row in
+feed_entries; the second is tracked by ``users.feed_version``, which is bumped
+in the same flush as the follow, membership or check-in deletion that causes it.
+Together they make an ETag that costs one indexed lookup and needs no
+serialization of the feed itself. In the hybrid strategy a third component
+covers followed high-fanout authors: their newest check-in, plus the sum of
+their own feed versions, which a deletion bumps instead of every follower's.
+
+Comment and reaction counts are not versioned per feed (that would mean
+touching every reader's row on each reaction). The feed endpoints read them
+for the page's check-ins on each request and add them to the tag, see
+services/check_in_counts.py.
+"""
+from sqlalchemy import event, select, update, desc, func
+
+from db import db
+from models import UserModel, CheckInModel, FollowModel, CircleMembershipModel, FeedEntryModel
+from services.feed_query import (
+    VARIANT_CIRCLES,
+    check_in_audience_ids,
+    circle_member_ids,
+    high_fanout_threshold,
+    followed_high_fanout_ids,
+    is_high_fanout,
+)
+from services.membership_events import on_members_added, on_members_removed
+
+users = UserModel.__table__
+
+
+def bump_feed_version(connection, user_ids):
+    if user_ids:
+        connection.execute(
+            update(users)
+            .where(users.c.id.in_(user_ids))
+            .values(feed_version=users.c.feed_version + 1)
+        )
+
+
+def feed_etag_data(user_id, variant, args):
+    """Version data for a feed page; equal data means an identical response."""
+    newest = select(FeedEntryModel.check_in_id).where(
+        FeedEntryModel.owner_id == user_id
+    ).order_by(
+        desc(FeedEntryModel.created_at), desc(FeedEntryModel.check_in_id)
+    ).limit(1).scalar_subquery()
+
+    row = db.session.execute(
+        select(UserModel.feed_version, newest).where(UserModel.id == user_id)
+    ).first()
+    feed_version, newest_check_in_id = row if row else (None, None)
+
+    data = {
+        "user": user_id,
+        "version": feed_version,
+        "newest": newest_check_in_id,
+        "variant": variant,
+        "before": args.get("before"),
+        "limit": args["limit"],
+    }
+
+    threshold = high_fanout_threshold()
+    if threshold is not None and variant != VARIANT_CIRCLES:
+        pulled_authors = followed_high_fanout_ids(user_id)
+        data["pulled"] = list(db.session.execute(select(
+            select(func.max(CheckInModel.id)).where(CheckInModel.user_id.in_(pulled_authors)).scalar_subquery(),
+            select(func.sum(UserModel.feed_version)).where(UserModel.id.in_(pulled_authors)).scalar_subquery(),
+        )).one())
+
+    return data
+
+
+@event.listens_for(CheckInModel, "after_delete")
+def _check_in_deleted(mapper, connection, target):
+    author_id = int(target.user_id)
+    # Followers of a high-fanout author see the deletion through the author's own version
+    pulled = is_high_fanout(connection, author_id, high_fanout_threshold())
+    bump_feed_version(connection, check_in_audience_ids(connection, author_id, include_followers=not pulled))
+
+
+@event.listens_for(FollowModel, "after_insert")
+@event.listens_for(FollowModel, "after_delete")
+def _follow_changed(mapper, connection, target):
+    bump_feed_version(connection, {int(target.follower_id)})
+
+
+@event.listens_for(CircleMembershipModel, "after_insert")
+@event.listens_for(CircleMembershipModel, "after_delete")
+def _membership_changed(mapper, connection, target):
+    bump_feed_version(
+        connection,
+        circle_member_ids(connection, int(target.circle_id)) | {int(target.user_id)}
+    )
+
+
+@on_members_added
+def _members_added(session, connection, circle_id, user_ids):
+    # The new members are already in the circle, so this covers them too
+    bump_feed_version(connection, circle_member_ids(connection, circle_id))
+
+
+@on_members_removed
+def _members_removed(session, connection, circle_id, user_ids):
+    bump_feed_version(connection, circle_member_ids(connection, circle_id) | set(user_ids))
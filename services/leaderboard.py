@@ -0,0 +1,90 @@
+"""
+Circle leaderboard queries.
+
+Per-member totals are kept in circle_member_stats (see services/circle_stats.py),
+so the leaderboard is one indexed read of the circle's memberships outer-joined
+to their stats rows, ranked by the database. Windowed leaderboards sum the
+per-day buckets in circle_member_daily_stats instead of the all-time total.
+Streaks are the best current and longest streak over the member's circle goals.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, func, desc, and_
+
+from db import db
+from models import CircleMembershipModel, UserModel, CircleMemberStatsModel, CircleMemberDailyStatsModel, GoalModel
+from services.streaks import live_streak_case
+
+WINDOW_ALL = "all"
+WINDOW_WEEK = "week"
+WINDOW_MONTH = "month"
+WINDOW_30_DAYS = "30d"
+WINDOWS = (WINDOW_ALL, WINDOW_WEEK, WINDOW_MONTH, WINDOW_30_DAYS)
+
+
+def window_start(window, today=None):
+    """First day counted by ``window`` (weeks start on Monday, UTC), or None for all time."""
+    today = today or datetime.utcnow().date()
+    if window == WINDOW_WEEK:
+        return today - timedelta(days=today.weekday())
+    if window == WINDOW_MONTH:
+        return today.replace(day=1)
+    if window == WINDOW_30_DAYS:
+        return today - timedelta(days=29)
+    return None
+
+
+def circle_leaderboard(circle_id, window=WINDOW_ALL):
+    """Leaderboard rows for ``circle_id``, most check-ins within ``window`` first."""
+    start = window_start(window)
+    if start is None:
+        total_check_ins = func.coalesce(CircleMemberStatsModel.total_check_ins, 0)
+    else:
+        window_totals = select(
+            CircleMemberDailyStatsModel.user_id,
+            func.sum(CircleMemberDailyStatsModel.check_ins).label("check_ins"),
+        ).where(
+            CircleMemberDailyStatsModel.circle_id == circle_id,
+            CircleMemberDailyStatsModel.day >= start,
+        ).group_by(CircleMemberDailyStatsModel.user_id).subquery()
+        total_check_ins = func.coalesce(window_totals.c.check_ins, 0)
+
+    streaks = select(
+        GoalModel.user_id,
+        func.max(live_streak_case()).label("current_streak"),
+        func.max(GoalModel.longest_streak).label("longest_streak"),
+    ).where(
+        GoalModel.circle_id == circle_id
+    ).group_by(GoalModel.user_id).subquery()
+
+    query = select(
+        CircleMembershipModel.user_id,
+        UserModel.username,
+        total_check_ins.label("total_check_ins"),
+        func.coalesce(CircleMemberStatsModel.active_goals, 0).label("active_goals"),
+        CircleMemberStatsModel.last_check_in,
+        CircleMembershipModel.joined_at.label("member_since"),
+        CircleMembershipModel.role,
+        func.coalesce(streaks.c.current_streak, 0).label("current_streak"),
+        func.coalesce(streaks.c.longest_streak, 0).label("longest_streak"),
+    ).join(
+        UserModel, UserModel.id == CircleMembershipModel.user_id
+    ).outerjoin(
+        CircleMemberStatsModel, and_(
+            CircleMemberStatsModel.circle_id == CircleMembershipModel.circle_id,
+            CircleMemberStatsModel.user_id == CircleMembershipModel.user_id,
+        )
+    ).outerjoin(
+        streaks, streaks.c.user_id == CircleMembershipModel.user_id
+    )
+    if start is not None:
+        query = query.outerjoin(window_totals, window_totals.c.user_id == CircleMembershipModel.user_id)
+
+    rows = db.session.execute(
+        query.where(
+            CircleMembershipModel.circle_id == circle_id
+        ).order_by(
+            desc(total_check_ins), CircleMembershipModel.id
+        )
+    )
+    return [dict(row._mapping) for row in rows]
@@ -0,0 +1,145 @@
+"""
+Circle membership checks for circle-scoped authorization.
+
+``is_circle_member`` is a single EXISTS lookup on the unique
+(circle_id, user_id) index, so no roster is ever loaded to answer it. With
+MEMBERSHIP_CACHE_TTL set, answers are also kept per worker for that many
+seconds; membership changes drop this worker's cached answer after commit,
+other workers see them once the TTL runs out.
+
+``add_circle_members`` inserts a whole batch with one multi-row INSERT that
+skips users who are already members (ON CONFLICT DO NOTHING), so concurrent
+adds of the same user cannot fail the batch. ``remove_circle_members`` is
+its counterpart, one DELETE for the whole batch.
+"""
+from flask import current_app, has_app_context
+from sqlalchemy import event, exists, insert, select, delete
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import object_session
+
+from db import db
+from models import CircleMembershipModel
+from services import metrics
+from services.after_commit import defer, on_commit
+from services.feed_cache import LRUCacheBackend
+from services.membership_events import members_added, members_removed, on_members_added, on_members_removed
+
+
+class MembershipCache:
+    def __init__(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+
+    def get(self, circle_id, user_id):
+        return self.backend.get(f"member:{circle_id}:{user_id}")
+
+    def set(self, circle_id, user_id, is_member):
+        self.backend.set(f"member:{circle_id}:{user_id}", is_member, ttl=self.ttl)
+
+    def forget(self, circle_id, user_id):
+        # No delete in the backend interface; an explicit None reads as a miss
+        self.backend.set(f"member:{circle_id}:{user_id}", None, ttl=self.ttl)
+
+    def clear(self):
+        self.backend.clear()
+
+
+def init_membership_cache(app, backend=None):
+    ttl = app.config["MEMBERSHIP_CACHE_TTL"]
+    if ttl:
+        backend = backend or LRUCacheBackend(app.config["MEMBERSHIP_CACHE_SIZE"])
+        app.extensions["membership_cache"] = MembershipCache(backend, ttl)
+
+
+def _cache():
+    return current_app.extensions.get("membership_cache") if has_app_context() else None
+
+
+def is_circle_member(circle_id, user_id):
+    circle_id, user_id = int(circle_id), int(user_id)
+    cache = _cache()
+    if cache is not None:
+        cached = cache.get(circle_id, user_id)
+        if cached is not None:
+            metrics.incr("membership_cache.hits")
+            return cached
+
+    is_member = db.session.execute(
+        select(exists().where(
+            CircleMembershipModel.circle_id == circle_id,
+            CircleMembershipModel.user_id == user_id,
+        ))
+    ).scalar()
+
+    if cache is not None:
+        metrics.incr("membership_cache.misses")
+        cache.set(circle_id, user_id, is_member)
+    return is_member
+
+
+def _insert_ignoring_duplicates(table, dialect_name):
+    if dialect_name == "postgresql":
+        return postgresql.insert(table).on_conflict_do_nothing(index_elements=["circle_id", "user_id"])
+    if dialect_name == "sqlite":
+        return sqlite.insert(table).on_conflict_do_nothing(index_elements=["circle_id", "user_id"])
+    # Elsewhere a concurrent duplicate fails the transaction on the unique index
+    return insert(table)
+
+
+def add_circle_members(circle_id, user_ids, role="member"):
+    """
+    Add ``user_ids`` to the circle with one INSERT and return the IDs that were actually added.
+
+    Users who are (or concurrently became) members are skipped. The rows are
+    only flushed into the current transaction; the caller commits.
+    """
+    if not user_ids:
+        return []
+    table = CircleMembershipModel.__table__
+    connection = db.session.connection()
+    statement = _insert_ignoring_duplicates(table, connection.dialect.name).values([
+        {"circle_id": circle_id, "user_id": user_id, "role": role} for user_id in user_ids
+    ]).returning(table.c.user_id)
+    added = [row.user_id for row in connection.execute(statement)]
+    members_added(db.session, connection, circle_id, added)
+    return added
+
+
+def remove_circle_members(circle_id, user_ids):
+    """
+    Remove ``user_ids`` from the circle with one DELETE and return the IDs that were actually removed.
+
+    Runs in the current transaction; the caller commits.
+    """
+    if not user_ids:
+        return []
+    table = CircleMembershipModel.__table__
+    connection = db.session.connection()
+    criteria = (table.c.circle_id == circle_id, table.c.user_id.in_(user_ids))
+    if connection.dialect.delete_returning:
+        removed = list(connection.execute(delete(table).where(*criteria).returning(table.c.user_id)).scalars())
+    else:
+        removed = list(connection.execute(select(table.c.user_id).where(*criteria)).scalars())
+        connection.execute(delete(table).where(*criteria))
+    members_removed(db.session, connection, circle_id, removed)
+    return removed
+
+
+@event.listens_for(CircleMembershipModel, "after_insert")
+@event.listens_for(CircleMembershipModel, "after_delete")
+def _membership_changed(mapper, connection, target):
+    defer(object_session(target), "membership_cache", (int(target.circle_id), int(target.user_id)))
+
+
+@on_members_added
+@on_members_removed
+def _members_changed(session, connection, circle_id, user_ids):
+    defer(session, "membership_cache", *((circle_id, user_id) for user_id in user_ids))
+
+
+@on_commit("membership_cache")
+def _apply_invalidations(pairs):
+    cache = _cache()
+    if cache is not None:
+        for circle_id, user_id in set(pairs):
+            cache.forget(circle_id, user_id)
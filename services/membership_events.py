@@ -0,0 +1,39 @@
+"""
+Notification for circle memberships inserted or deleted in bulk.
+
+Derived state (feed entries, feed versions, the circle streams and the feed,
+read and membership caches) follows circle membership through mapper events on
+CircleMembershipModel. A bulk add or removal writes its rows with one Core
+INSERT or DELETE, which fires no mapper events, so it reports the batch through
+``members_added`` or ``members_removed`` instead, and every module with an
+``after_insert`` or ``after_delete`` listener on memberships registers the
+set-based equivalent here.
+"""
+_added_handlers = []
+_removed_handlers = []
+
+
+def on_members_added(handler):
+    """Register ``handler(session, connection, circle_id, user_ids)``; usable as a decorator."""
+    _added_handlers.append(handler)
+    return handler
+
+
+def members_added(session, connection, circle_id, user_ids):
+    """Call every handler for ``user_ids`` that just joined the circle in this transaction."""
+    if user_ids:
+        for handler in _added_handlers:
+            handler(session, connection, circle_id, user_ids)
+
+
+def on_members_removed(handler):
+    """Register ``handler(session, connection, circle_id, user_ids)``; usable as a decorator."""
+    _removed_handlers.append(handler)
+    return handler
+
+
+def members_removed(session, connection, circle_id, user_ids):
+    """Call every handler for ``user_ids`` that just left the circle in this transaction."""
+    if user_ids:
+        for handler in _removed_handlers:
+            handler(session, connection, circle_id, user_ids)
@@ -0,0 +1,151 @@
+"""
+Cold storage for old circle chat messages.
+
+``archive_messages`` moves messages sent before a cutoff out of
+``circle_messages`` into append-only gzip NDJSON files, one per circle per
+month (``<MESSAGE_ARCHIVE_DIR>/circle_<id>/<YYYY-MM>.ndjson.gz``), so the hot
+table and its indexes only hold recent chat. Each run appends one gzip member
+per file; readers see the concatenated members as one stream.
+
+Each batch is written and synced to its files before its rows are deleted,
+and the delete is committed before the next batch starts, so a job that dies
+part way keeps everything already moved and leaves at most one batch both
+archived and hot (readers drop the duplicate by ID), never lost. The history endpoint calls ``archived_messages_before``
+once a page runs past the oldest hot message, which reads the month files
+newest first and stops as soon as the page is full.
+"""
+import gzip
+import json
+import os
+import zlib
+from collections import defaultdict
+from datetime import datetime
+from functools import lru_cache
+
+from sqlalchemy import select, delete
+
+from models import CircleMessageModel
+
+messages = CircleMessageModel.__table__
+
+FILE_SUFFIX = ".ndjson.gz"
+
+
+def circle_archive_dir(archive_dir, circle_id):
+    return os.path.join(archive_dir, f"circle_{int(circle_id)}")
+
+
+def month_key(sent_at):
+    return f"{sent_at.year:04d}-{sent_at.month:02d}"
+
+
+def _record(row):
+    return {
+        "id": row.id,
+        "circle_id": row.circle_id,
+        "user_id": row.user_id,
+        "message": row.message,
+        "sent_at": row.sent_at.isoformat(),
+    }
+
+
+def _append(path, records):
+    """Append ``records`` to ``path`` as one gzip member and flush it to disk."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    payload = "".join(json.dumps(record) + "\n" for record in records).encode()
+    with open(path, "ab") as archive:
+        archive.write(gzip.compress(payload))
+        archive.flush()
+        os.fsync(archive.fileno())
+
+
+def archive_messages(engine, archive_dir, older_than, batch_size=1000):
+    """
+    Move messages sent before ``older_than`` into the archive and return how many moved.
+
+    Works in batches of ``batch_size`` rows, each in its own transaction on
+    ``engine``: the batch is written to its month files, then deleted and committed.
+    """
+    moved = 0
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(
+                select(messages)
+                .where(messages.c.sent_at < older_than)
+                .order_by(messages.c.circle_id, messages.c.sent_at, messages.c.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                return moved
+
+            files = defaultdict(list)
+            for row in rows:
+                files[(row.circle_id, month_key(row.sent_at))].append(_record(row))
+            for (circle_id, month), records in files.items():
+                _append(os.path.join(circle_archive_dir(archive_dir, circle_id), month + FILE_SUFFIX), records)
+
+            connection.execute(delete(messages).where(messages.c.id.in_([row.id for row in rows])))
+        moved += len(rows)
+
+
+@lru_cache(maxsize=64)
+def _read_month(path, size):
+    # Keyed on size too: an append makes the file bigger, which is a new cache entry
+    records = {}
+    try:
+        with gzip.open(path, "rt") as archive:
+            for line in archive:
+                record = json.loads(line)
+                record["sent_at"] = datetime.fromisoformat(record["sent_at"])
+                records[record["id"]] = record
+    except (EOFError, ValueError, zlib.error, gzip.BadGzipFile):
+        # A member still being appended by a running job; what came before it is complete
+        pass
+    return tuple(sorted(records.values(), key=lambda r: (r["sent_at"], r["id"]), reverse=True))
+
+
+def _months(archive_dir, circle_id):
+    """(month, path) of the circle's archive files, newest month first."""
+    directory = circle_archive_dir(archive_dir, circle_id)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        ((name[:-len(FILE_SUFFIX)], os.path.join(directory, name))
+         for name in os.listdir(directory) if name.endswith(FILE_SUFFIX)),
+        reverse=True,
+    )
+
+
+def _month_records(path):
+    return _read_month(path, os.path.getsize(path))
+
+
+def find_archived_message(archive_dir, circle_id, message_id):
+    """The archived record for ``message_id`` in the circle, or None."""
+    for _, path in _months(archive_dir, circle_id):
+        for record in _month_records(path):
+            if record["id"] == message_id:
+                return record
+    return None
+
+
+def archived_messages_before(archive_dir, circle_id, cursor, limit, exclude_ids=()):
+    """
+    Up to ``limit`` archived messages older than ``cursor``, newest first.
+
+    ``cursor`` is a ``(sent_at, id)`` position or None for the newest archived
+    message. IDs in ``exclude_ids`` (still in the hot table) are skipped.
+    """
+    found = []
+    for month, path in _months(archive_dir, circle_id):
+        if cursor is not None and month > month_key(cursor[0]):
+            continue
+        for record in _month_records(path):
+            if cursor is not None and (record["sent_at"], record["id"]) >= tuple(cursor):
+                continue
+            if record["id"] in exclude_ids:
+                continue
+            found.append(record)
+            if len(found) == limit:
+                return found
+    return found
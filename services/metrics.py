@@ -0,0 +1,30 @@
+"""
+In-process counters for cache, coalescing and feed strategy metrics.
+
+Counters are per worker process; GET /metrics exposes a snapshot to admins.
+"""
+import threading
+from collections import defaultdict
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+
+
+def incr(name, amount=1):
+    with _lock:
+        _counters[name] += amount
+
+
+def get(name):
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def snapshot():
+    with _lock:
+        return dict(_counters)
+
+
+def reset():
+    with _lock:
+        _counters.clear()
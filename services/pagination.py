@@ -0,0 +1,74 @@
+"""
+Opaque keyset cursors.
+
+A cursor encodes the ``(created_at, id)`` of the last row a client has seen, so
+the next page is a range read that starts right after it instead of an OFFSET
+scan that gets slower the deeper the client pages. Listings ordered by some
+other column (e.g. a username) use ``encode_key_cursor``, which stores that
+column's value instead.
+"""
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(created_at, row_id):
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return ``(created_at, id)`` for a cursor, raising ValueError if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, row_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def encode_key_cursor(value, row_id):
+    raw = json.dumps([value, row_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_key_cursor(cursor):
+    """Return ``(value, id)`` for a key cursor, raising ValueError if it is malformed."""
+    try:
+        value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        return value, int(row_id)
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def before_cursor(created_at_column, id_column, cursor):
+    """Filter for rows strictly older than the cursor in (created_at DESC, id DESC) order."""
+    created_at, row_id = cursor
+    return or_(
+        created_at_column < created_at,
+        and_(created_at_column == created_at, id_column < row_id),
+    )
+
+
+def after_cursor(created_at_column, id_column, cursor):
+    """Filter for rows strictly newer than the cursor in (created_at, id) order."""
+    created_at, row_id = cursor
+    return or_(
+        created_at_column > created_at,
+        and_(created_at_column == created_at, id_column > row_id),
+    )
+
+
+def page_with_cursor(rows, limit, key, encode=encode_cursor):
+    """
+    Trim a ``limit + 1`` result to ``limit`` rows and build the cursor for the next page.
+
+    ``key`` maps a row to its ``(created_at, id)`` (or whatever ``encode``
+    takes); the cursor is None on the last page.
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode(*key(rows[-1]))
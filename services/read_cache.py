@@ -0,0 +1,91 @@
+"""
+Short-lived cache of serialized responses for expensive shared read endpoints
+(circle detail and leaderboard).
+
+Concurrent misses for the same key are coalesced through SingleFlight, and the
+result is kept for READ_CACHE_TTL seconds so a burst of members opening the
+same page costs one computation. Keys live in a namespace (e.g. one circle)
+whose generation counter can be bumped to drop everything in it at once, the
+same scheme as the feed cache. Circle edits and membership changes bump their
+circle's namespace after commit; check-ins only age out with the TTL.
+"""
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+
+from models import CircleModel, CircleMembershipModel
+from services import metrics
+from services.after_commit import defer, on_commit
+from services.feed_cache import LRUCacheBackend
+from services.single_flight import SingleFlight
+from services.membership_events import on_members_added, on_members_removed
+
+
+class ReadCache:
+    def __init__(self, backend, ttl=None):
+        self.backend = backend
+        self.ttl = ttl
+        self.flight = SingleFlight()
+
+    def get_or_compute(self, namespace, key, compute):
+        """Return the cached value, or compute it once for all concurrent callers and store it."""
+        generation = self.backend.get(f"read:gen:{namespace}") or 0
+        full_key = f"read:{namespace}:{generation}:{key}"
+        value = self.backend.get(full_key)
+        if value is not None:
+            metrics.incr("read_cache.hits")
+            return value
+
+        def load():
+            metrics.incr("read_cache.misses")
+            value = compute()
+            self.backend.set(full_key, value, ttl=self.ttl)
+            return value
+
+        return self.flight.do(full_key, load)
+
+    def invalidate(self, namespace):
+        self.backend.incr(f"read:gen:{namespace}")
+
+    def clear(self):
+        self.backend.clear()
+
+
+def init_read_cache(app, backend=None):
+    backend = backend or LRUCacheBackend(app.config["READ_CACHE_SIZE"])
+    app.extensions["read_cache"] = ReadCache(backend, ttl=app.config["READ_CACHE_TTL"])
+
+
+def circle_namespace(circle_id):
+    return f"circle:{int(circle_id)}"
+
+
+def _mark_stale(target, circle_id):
+    if circle_id is not None:
+        defer(object_session(target), "read_cache", circle_namespace(circle_id))
+
+
+@event.listens_for(CircleModel, "after_update")
+@event.listens_for(CircleModel, "after_delete")
+def _circle_changed(mapper, connection, target):
+    _mark_stale(target, target.id)
+
+
+@event.listens_for(CircleMembershipModel, "after_insert")
+@event.listens_for(CircleMembershipModel, "after_update")
+@event.listens_for(CircleMembershipModel, "after_delete")
+def _membership_changed(mapper, connection, target):
+    _mark_stale(target, target.circle_id)
+
+
+@on_members_added
+@on_members_removed
+def _members_changed(session, connection, circle_id, user_ids):
+    defer(session, "read_cache", circle_namespace(circle_id))
+
+
+@on_commit("read_cache")
+def _apply_invalidations(namespaces):
+    if has_app_context() and "read_cache" in current_app.extensions:
+        for namespace in set(namespaces):
+            current_app.extensions["read_cache"].invalidate(namespace)
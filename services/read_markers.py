@@ -0,0 +1,200 @@
+"""
+Per-circle chat read markers and unread counts.
+
+A marker is the ID of the newest message a user has read in a circle; every
+message after it, except the user's own, is unread. ``unread_counts`` computes
+all of a user's badges with one aggregate over their memberships that walks
+ix_circle_messages_circle_id from each marker.
+
+Clients report markers while scrolling, often several times a second. Markers
+only move forward, so each worker keeps the highest reported value per
+(user, circle) in a ReadMarkerBuffer and writes a key at most once every
+READ_MARKER_FLUSH_SECONDS. Keys that become due are written at the teardown of
+whatever request that worker handles next, and a user's buffered markers are
+written before their unread counts are read on the same worker. A count served
+by another worker can therefore lag by one interval (longer if the buffering
+worker sits idle), and a crashed worker loses at most that much marker
+progress, which only makes a few messages look unread again.
+
+Markers are written with one upsert per flush that keeps the higher message
+ID, so two workers writing a user's first marker at once cannot collide on
+the primary key.
+"""
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import select, insert, update, exists, literal, func, and_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+
+from db import db
+from models import CircleMembershipModel, CircleMessageModel, CircleReadMarkerModel
+from services import metrics
+
+markers = CircleReadMarkerModel.__table__
+memberships = CircleMembershipModel.__table__
+messages = CircleMessageModel.__table__
+
+
+class ReadMarkerBuffer:
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._written_at = {}
+
+    def record(self, user_id, circle_id, message_id):
+        key = (user_id, circle_id)
+        with self._lock:
+            if key in self._pending:
+                metrics.incr("read_markers.coalesced")
+            self._pending[key] = max(self._pending.get(key, 0), message_id)
+
+    def take_due(self):
+        """Remove and return ``{(user_id, circle_id): message_id}`` for keys not written within the interval."""
+        now = time.monotonic()
+        with self._lock:
+            # A write time older than the interval no longer holds anything back
+            for key in [key for key, written_at in self._written_at.items()
+                        if now - written_at >= self.interval and key not in self._pending]:
+                del self._written_at[key]
+            due = {
+                key: message_id for key, message_id in self._pending.items()
+                if now - self._written_at.get(key, float("-inf")) >= self.interval
+            }
+            for key in due:
+                del self._pending[key]
+                self._written_at[key] = now
+            return due
+
+    def restore(self, pending):
+        """Put markers taken by a failed write back, keeping any newer value recorded meanwhile."""
+        with self._lock:
+            for key, message_id in pending.items():
+                self._pending[key] = max(self._pending.get(key, 0), message_id)
+
+    def take_user(self, user_id):
+        """Remove and return every buffered marker of ``user_id``, due or not."""
+        now = time.monotonic()
+        with self._lock:
+            taken = {key: message_id for key, message_id in self._pending.items() if key[0] == user_id}
+            for key in taken:
+                del self._pending[key]
+                self._written_at[key] = now
+            return taken
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+            self._written_at.clear()
+
+
+def init_read_markers(app):
+    app.extensions["read_markers"] = ReadMarkerBuffer(app.config["READ_MARKER_FLUSH_SECONDS"])
+    app.teardown_request(flush_due_read_markers)
+
+
+def _upsert_markers(dialect_name, rows):
+    module = {"postgresql": postgresql, "sqlite": sqlite}.get(dialect_name)
+    if module is None:
+        return None
+    statement = module.insert(markers).values(rows)
+    return statement.on_conflict_do_update(
+        index_elements=["user_id", "circle_id"],
+        set_={
+            "last_read_message_id": statement.excluded.last_read_message_id,
+            "updated_at": statement.excluded.updated_at,
+        },
+        # Keep the higher of the stored and the new message ID
+        where=markers.c.last_read_message_id < statement.excluded.last_read_message_id,
+    )
+
+
+def write_read_markers(connection, pending):
+    """Advance the given markers in the database; a marker never moves backwards."""
+    now = datetime.utcnow()
+    statement = _upsert_markers(connection.dialect.name, [
+        {"user_id": user_id, "circle_id": circle_id, "last_read_message_id": message_id, "updated_at": now}
+        for (user_id, circle_id), message_id in pending.items()
+    ])
+    if statement is not None:
+        connection.execute(statement)
+        metrics.incr("read_markers.written", len(pending))
+        return
+
+    # Elsewhere a concurrent first write fails the transaction on the primary key
+    for (user_id, circle_id), message_id in pending.items():
+        row = (markers.c.user_id == user_id, markers.c.circle_id == circle_id)
+        connection.execute(
+            insert(markers).from_select(
+                ["user_id", "circle_id", "last_read_message_id", "updated_at"],
+                select(literal(user_id), literal(circle_id), literal(message_id), literal(now))
+                .where(~exists().where(*row)),
+            )
+        )
+        connection.execute(
+            update(markers).where(*row, markers.c.last_read_message_id < message_id)
+            .values(last_read_message_id=message_id, updated_at=now)
+        )
+    metrics.incr("read_markers.written", len(pending))
+
+
+def record_read_marker(connection, user_id, circle_id, message_id):
+    """
+    Buffer a reported marker and write whatever is due on ``connection``.
+
+    Returns True if anything was written (the caller commits).
+    """
+    buffer = current_app.extensions["read_markers"]
+    buffer.record(user_id, circle_id, message_id)
+    due = buffer.take_due()
+    if due:
+        write_read_markers(connection, due)
+    return bool(due)
+
+
+def flush_due_read_markers(exception=None):
+    """Teardown hook: write every marker whose interval has passed, in its own transaction."""
+    buffer = current_app.extensions["read_markers"]
+    due = buffer.take_due()
+    if not due:
+        return
+    try:
+        with db.engine.begin() as connection:
+            write_read_markers(connection, due)
+    except SQLAlchemyError:
+        metrics.incr("read_markers.flush_failed")
+        buffer.restore(due)
+
+
+def flush_user_read_markers(connection, user_id):
+    """Write the user's buffered markers so their own unread counts include them."""
+    pending = current_app.extensions["read_markers"].take_user(user_id)
+    if pending:
+        write_read_markers(connection, pending)
+    return bool(pending)
+
+
+def unread_counts(user_id):
+    """Select of (circle_id, last_read_message_id, unread_count) for every circle the user belongs to."""
+    last_read = func.coalesce(markers.c.last_read_message_id, 0)
+    return select(
+        memberships.c.circle_id,
+        last_read.label("last_read_message_id"),
+        func.count(messages.c.id).label("unread_count"),
+    ).select_from(
+        memberships.outerjoin(markers, and_(
+            markers.c.user_id == memberships.c.user_id,
+            markers.c.circle_id == memberships.c.circle_id,
+        )).outerjoin(messages, and_(
+            messages.c.circle_id == memberships.c.circle_id,
+            messages.c.id > last_read,
+            messages.c.user_id != user_id,
+        ))
+    ).where(
+        memberships.c.user_id == user_id
+    ).group_by(
+        memberships.c.circle_id, markers.c.last_read_message_id
+    ).order_by(memberships.c.circle_id)
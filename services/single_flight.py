@@ -0,0 +1,49 @@
+"""
+Request coalescing within a worker.
+
+When several threads ask for the same key at once, only the first (the leader)
+runs the computation; the others wait for it and share its result or its
+exception. Nothing is remembered once the call finishes, so pair this with a
+cache to also absorb requests that arrive just after.
+"""
+import threading
+
+from services import metrics
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, compute):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            metrics.incr("single_flight.coalesced")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = compute()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
@@ -0,0 +1,148 @@
+"""
+Goal streaks kept as incremental state on the goal row.
+
+Each goal type has a period (a day for daily, habit and the remaining types, an
+ISO week for weekly goals, a calendar month for monthly goals), numbered so
+that consecutive periods differ by one. ``goals.last_period`` is the latest
+period with a check-in, ``current_streak`` the run of consecutive periods
+ending there and ``longest_streak`` the best run so far. A new check-in updates
+all three with a single UPDATE whose CASE expressions read the stored state,
+so concurrent check-ins cannot lose an increment. Deleting a check-in,
+back-dating one before ``last_period`` or changing the goal's type recomputes
+the goal from its history; ``flask goals recompute-streaks`` does that for
+every goal.
+"""
+from datetime import datetime
+from itertools import groupby
+
+from sqlalchemy import event, inspect, select, update, case, or_, bindparam
+
+from models import CheckInModel, GoalModel
+
+goals = GoalModel.__table__
+check_ins = CheckInModel.__table__
+
+
+def period_index(goal_type, moment):
+    """Number of the period containing ``moment`` (a date or datetime) for the goal type."""
+    day = moment.date() if isinstance(moment, datetime) else moment
+    if goal_type == GoalModel.TYPE_WEEKLY:
+        # date.toordinal() is 1 on Monday 0001-01-01, so weeks start on Monday
+        return (day.toordinal() - 1) // 7
+    if goal_type == GoalModel.TYPE_MONTHLY:
+        return day.year * 12 + day.month - 1
+    return day.toordinal()
+
+
+def _period_case(moment):
+    """SQL expression for the period of ``moment`` according to each goal's own type."""
+    return case(
+        (goals.c.goal_type == GoalModel.TYPE_WEEKLY, period_index(GoalModel.TYPE_WEEKLY, moment)),
+        (goals.c.goal_type == GoalModel.TYPE_MONTHLY, period_index(GoalModel.TYPE_MONTHLY, moment)),
+        else_=period_index(GoalModel.TYPE_DAILY, moment),
+    )
+
+
+def live_streak_case(today=None):
+    """SQL expression for the current streak, which is 0 once a whole period has been missed."""
+    today = today or datetime.utcnow().date()
+    return case(
+        (goals.c.last_period >= _period_case(today) - 1, goals.c.current_streak),
+        else_=0,
+    )
+
+
+def live_current_streak(goal, today=None):
+    """Python counterpart of live_streak_case for a loaded goal."""
+    if goal.last_period is None:
+        return 0
+    current = period_index(goal.goal_type, today or datetime.utcnow().date())
+    return goal.current_streak if goal.last_period >= current - 1 else 0
+
+
+def record_check_in(connection, goal_id, created_at):
+    """Advance the goal's streak for a check-in made at ``created_at`` (O(1))."""
+    period = _period_case(created_at)
+    last = goals.c.last_period
+    new_current = case(
+        (last.is_(None), 1),
+        (last == period, goals.c.current_streak),
+        (last == period - 1, goals.c.current_streak + 1),
+        else_=1,
+    )
+    result = connection.execute(
+        update(goals).where(
+            goals.c.id == goal_id,
+            or_(last.is_(None), last <= period),
+        ).values(
+            current_streak=new_current,
+            longest_streak=case(
+                (new_current > goals.c.longest_streak, new_current),
+                else_=goals.c.longest_streak,
+            ),
+            last_period=period,
+        )
+    )
+    if result.rowcount == 0:
+        # Back-dated before the latest period: the runs in between may have changed
+        recompute_goal_streaks(connection, goal_id)
+
+
+def streak_state(periods):
+    """(current_streak, longest_streak, last_period) for a sorted iterable of distinct periods."""
+    current = longest = 0
+    last = None
+    for period in periods:
+        current = current + 1 if last is not None and period == last + 1 else 1
+        longest = max(longest, current)
+        last = period
+    return current, longest, last
+
+
+def recompute_goal_streaks(connection, goal_id=None):
+    """Rebuild streak state from check-in history, for one goal or (by default) every goal."""
+    query = select(goals.c.id, goals.c.goal_type, check_ins.c.created_at).select_from(
+        goals.outerjoin(check_ins, check_ins.c.goal_id == goals.c.id)
+    ).order_by(goals.c.id)
+    if goal_id is not None:
+        query = query.where(goals.c.id == goal_id)
+
+    # One pass over the rows, goal by goal; the periods of each goal are few enough to sort in memory
+    updates = []
+    for current_goal, rows in groupby(connection.execute(query), key=lambda row: row.id):
+        periods = set()
+        for row in rows:
+            if row.created_at is not None:
+                periods.add(period_index(row.goal_type, row.created_at))
+        current, longest, last = streak_state(sorted(periods))
+        updates.append({"goal": current_goal, "current": current, "longest": longest, "last": last})
+
+    if updates:
+        connection.execute(
+            update(goals).where(goals.c.id == bindparam("goal")).values(
+                current_streak=bindparam("current"),
+                longest_streak=bindparam("longest"),
+                last_period=bindparam("last"),
+            ),
+            updates,
+        )
+    return len(updates)
+
+
+@event.listens_for(CheckInModel, "after_insert")
+def _check_in_created(mapper, connection, target):
+    if target.goal_id is not None:
+        record_check_in(connection, int(target.goal_id), target.created_at)
+
+
+@event.listens_for(CheckInModel, "after_delete")
+def _check_in_deleted(mapper, connection, target):
+    if target.goal_id is not None:
+        recompute_goal_streaks(connection, int(target.goal_id))
+
+
+@event.listens_for(GoalModel, "after_update")
+def _goal_updated(mapper, connection, target):
+    # The goal type decides the period length, so the stored state no longer applies
+    if inspect(target).attrs.goal_type.history.has_changes():
+        recompute_goal_streaks(connection, target.id)
@@ -7,6 +7,7 @@ from app import create_app
 from db import db as _db
 from models import UserModel, CircleModel, GoalModel
 from flask_jwt_extended import create_access_token
+from sqlalchemy import event
 
 
 @pytest.fixture(scope="session")
@@ -26,6 +27,10 @@ def app():
 def db(app):
     """Create a fresh database for each test function."""
     with app.app_context():
+        # IDs are reused across tests, so cached feeds must not outlive the database
+        app.extensions["feed_cache"].clear()
+        app.extensions["read_cache"].clear()
+        app.extensions["read_markers"].clear()
         _db.create_all()
         yield _db
         _db.session.remove()
@@ -109,3 +114,28 @@ def test_goal(db, test_user):
     db.session.add(goal)
     db.session.commit()
     return goal
+
+
+class QueryCounter:
+    """Context manager counting the SQL statements sent to the database."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _count(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(self.engine, "before_cursor_execute", self._count)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._count)
+
+
+@pytest.fixture(scope="function")
+def query_counter(db):
+    """Factory for QueryCounter instances bound to the test database engine."""
+    return lambda: QueryCounter(db.engine)
@@ -0,0 +1,184 @@
+import pytest
+from datetime import datetime, timedelta
+from models import UserModel, FollowModel, BuddyRequestModel
+
+
+def _add_buddies(db, user, count):
+    """Create ``count`` users who are buddies of ``user``, one minute apart (buddy0 oldest)."""
+    start = datetime(2026, 1, 1)
+    buddies = [
+        UserModel(username=f"buddy{i:04d}", email=f"buddy{i}@example.com", password_hash="hash", is_staff=False)
+        for i in range(count)
+    ]
+    db.session.add_all(buddies)
+    db.session.flush()
+    db.session.add_all([
+        FollowModel(follower_id=user.id, following_id=buddy.id,
+                    relationship_type=FollowModel.TYPE_BUDDY, created_at=start + timedelta(minutes=i))
+        for i, buddy in enumerate(buddies)
+    ])
+    db.session.commit()
+    return [buddy.id for buddy in buddies]
+
+
+@pytest.fixture(scope="function")
+def thousand_buddies(db, test_user):
+    """Benchmark fixture: test_user with 1,000 accountability buddies."""
+    return _add_buddies(db, test_user, 1000)
+
+
+class TestBuddyList:
+    def test_get_buddy_list_in_one_query(self, client, auth_token, thousand_buddies, query_counter):
+        """Test that 1,000 buddies load in a single joined query."""
+        with query_counter() as counter:
+            response = client.get("/buddy/list", headers={"Authorization": f"Bearer {auth_token}"})
+
+        assert response.status_code == 200
+        buddies = response.json["buddies"]
+        assert len(buddies) == 1000
+        assert buddies[0]["user_id"] == thousand_buddies[-1]
+        assert buddies[0]["buddies_since"] is not None
+        assert response.json["next_cursor"] is None
+        assert counter.count == 1
+
+    def test_get_buddy_list_excludes_plain_follows(self, client, auth_token, test_user, db):
+        """Test that followed users who are not buddies are left out."""
+        _add_buddies(db, test_user, 1)
+        other = UserModel(username="followed", email="followed@example.com", password_hash="hash", is_staff=False)
+        db.session.add(other)
+        db.session.flush()
+        db.session.add(FollowModel(follower_id=test_user.id, following_id=other.id))
+        db.session.commit()
+
+        response = client.get("/buddy/list", headers={"Authorization": f"Bearer {auth_token}"})
+
+        assert [buddy["username"] for buddy in response.json["buddies"]] == ["buddy0000"]
+
+    def test_get_buddy_list_pages_by_username(self, client, auth_token, test_user, db):
+        """Test that ?sort=username pages alphabetically through next_cursor."""
+        _add_buddies(db, test_user, 5)
+        headers = {"Authorization": f"Bearer {auth_token}"}
+
+        seen = []
+        url = "/buddy/list?sort=username&order=asc&limit=2"
+        while True:
+            response = client.get(url, headers=headers)
+            assert response.status_code == 200
+            seen += [buddy["username"] for buddy in response.json["buddies"]]
+            if response.json["next_cursor"] is None:
+                break
+            url = f"/buddy/list?sort=username&order=asc&limit=2&cursor={response.json['next_cursor']}"
+
+        assert seen == [f"buddy{i:04d}" for i in range(5)]
+
+    def test_get_buddy_list_pages_newest_first(self, client, auth_token, test_user, db):
+        """Test the default buddies_since ordering across pages."""
+        ids = _add_buddies(db, test_user, 3)
+        headers = {"Authorization": f"Bearer {auth_token}"}
+
+        first = client.get("/buddy/list?limit=2", headers=headers)
+        second = client.get(f"/buddy/list?limit=2&cursor={first.json['next_cursor']}", headers=headers)
+
+        assert [b["user_id"] for b in first.json["buddies"]] == [ids[2], ids[1]]
+        assert [b["user_id"] for b in second.json["buddies"]] == [ids[0]]
+        assert second.json["next_cursor"] is None
+
+    def test_get_buddy_list_rejects_mismatched_cursor(self, client, auth_token, test_user, db):
+        """Test that a buddies_since cursor is not accepted for the username sort."""
+        _add_buddies(db, test_user, 3)
+        headers = {"Authorization": f"Bearer {auth_token}"}
+        cursor = client.get("/buddy/list?limit=1", headers=headers).json["next_cursor"]
+
+        response = client.get(f"/buddy/list?sort=username&cursor={cursor}", headers=headers)
+
+        assert response.status_code == 400
+
+
+def _add_requests(db, to_user, count, status=BuddyRequestModel.STATUS_PENDING, prefix="requester"):
+    """Create ``count`` buddy requests to ``to_user`` from new users, one minute apart (oldest first)."""
+    start = datetime(2026, 1, 1)
+    senders = [
+        UserModel(username=f"{prefix}{i}", email=f"{prefix}{i}@example.com", password_hash="hash", is_staff=False)
+        for i in range(count)
+    ]
+    db.session.add_all(senders)
+    db.session.flush()
+    requests = [
+        BuddyRequestModel(from_user_id=sender.id, to_user_id=to_user.id, status=status,
+                          created_at=start + timedelta(minutes=i))
+        for i, sender in enumerate(senders)
+    ]
+    db.session.add_all(requests)
+    db.session.commit()
+    return [request.id for request in requests]
+
+
+class TestBuddyRequests:
+    def test_received_requests_load_users_in_one_query(self, client, auth_token, test_user, db, query_counter):
+        """Test that requester and receiver are loaded with the requests instead of per row."""
+        _add_requests(db, test_user, 20)
+        db.session.expunge_all()
+
+        with query_counter() as counter:
+            response = client.get("/buddy/requests/received", headers={"Authorization": f"Bearer {auth_token}"})
+
+        assert response.status_code == 200
+        requests = response.json["requests"]
+        assert len(requests) == 20
+        assert requests[0]["requester_username"] == "requester19"
+        assert requests[0]["receiver_username"] == "testuser"
+        assert requests[0]["from_user"]["username"] == "requester19"
+        assert counter.count == 1
+
+    def test_received_requests_filter_by_status(self, client, auth_token, test_user, db):
+        """Test that received requests default to pending and accept ?status=."""
+        pending = _add_requests(db, test_user, 2)
+        declined = _add_requests(db, test_user, 1, status=BuddyRequestModel.STATUS_DECLINED, prefix="declined")
+        headers = {"Authorization": f"Bearer {auth_token}"}
+
+        default = client.get("/buddy/requests/received", headers=headers)
+        only_declined = client.get("/buddy/requests/received?status=declined", headers=headers)
+        everything = client.get("/buddy/requests/received?status=all", headers=headers)
+
+        assert sorted(r["id"] for r in default.json["requests"]) == pending
+        assert [r["id"] for r in only_declined.json["requests"]] == declined
+        assert len(everything.json["requests"]) == 3
+
+    def test_sent_requests_page_newest_first(self, client, auth_token, test_user, db):
+        """Test that sent requests are paged through next_cursor instead of returning the whole history."""
+        receivers = [
+            UserModel(username=f"receiver{i}", email=f"receiver{i}@example.com", password_hash="hash", is_staff=False)
+            for i in range(5)
+        ]
+        db.session.add_all(receivers)
+        db.session.flush()
+        statuses = [BuddyRequestModel.STATUS_DECLINED, BuddyRequestModel.STATUS_ACCEPTED] + \
+            [BuddyRequestModel.STATUS_PENDING] * 3
+        requests = [
+            BuddyRequestModel(from_user_id=test_user.id, to_user_id=receiver.id, status=status,
+                              created_at=datetime(2026, 1, 1) + timedelta(minutes=i))
+            for i, (receiver, status) in enumerate(zip(receivers, statuses))
+        ]
+        db.session.add_all(requests)
+        db.session.commit()
+        ids = [request.id for request in requests]
+        headers = {"Authorization": f"Bearer {auth_token}"}
+
+        seen = []
+        url = "/buddy/requests/sent?limit=2"
+        while url:
+            response = client.get(url, headers=headers)
+            assert response.status_code == 200
+            seen += [r["id"] for r in response.json["requests"]]
+            cursor = response.json["next_cursor"]
+            url = f"/buddy/requests/sent?limit=2&cursor={cursor}" if cursor else None
+
+        assert seen == list(reversed(ids))
+        accepted = client.get("/buddy/requests/sent?status=accepted", headers=headers)
+        assert [r["id"] for r in accepted.json["requests"]] == [ids[1]]
+
+    def test_requests_reject_invalid_cursor(self, client, auth_token):
+        """Test that a malformed cursor is a 400."""
+        response = client.get("/buddy/requests/sent?cursor=garbage", headers={"Authorization": f"Bearer {auth_token}"})
+
+        assert response.status_code == 400
@@ -46,6 +46,48 @@ class TestCheckIn:
 
         assert response.status_code == 401
 
+    def test_get_check_in_loads_relations_in_one_query(self, client, test_check_in, auth_token, query_counter):
+        """Test that user, goal and target are loaded together with the check-in."""
+        check_in_id = test_check_in.id
+
+        with query_counter() as counter:
+            response = client.get(
+                f"/check-ins/{check_in_id}",
+                headers={"Authorization": f"Bearer {auth_token}"}
+            )
+
+        assert response.status_code == 201
+        assert response.json["user"]["username"] == "testuser"
+        assert response.json["goal"]["title"] == "Test Goal"
+        assert counter.count == 1
+
+    def test_get_check_in_includes_comment_and_reaction_counts(self, client, test_check_in, auth_token):
+        """Test that comments and reactions posted through the API are counted on the check-in."""
+        headers = {"Authorization": f"Bearer {auth_token}"}
+        check_in_id = test_check_in.id
+        for content in ("First", "Second"):
+            client.post(f"/check-ins/{check_in_id}/comments", json={"content": content}, headers=headers)
+        client.post(f"/check-ins/{check_in_id}/reactions", json={"react_type": "Like"}, headers=headers)
+
+        response = client.get(f"/check-ins/{check_in_id}", headers=headers)
+
+        assert response.json["comment_count"] == 2
+        assert response.json["reaction_count"] == 1
+
+    def test_recount_command_repairs_counts(self, app, db, test_check_in, test_user):
+        """Test that the recount command rebuilds counts that drifted."""
+        db.session.add(CommentModel(user_id=test_user.id, check_in_id=test_check_in.id, content="Hi"))
+        db.session.commit()
+        check_in_id = test_check_in.id
+        db.session.execute(CheckInModel.__table__.update().values(comment_count=7, reaction_count=3))
+        db.session.commit()
+
+        result = app.test_cli_runner().invoke(args=["check-ins", "recount"])
+
+        assert result.exit_code == 0
+        check_in = db.session.get(CheckInModel, check_in_id)
+        assert (check_in.comment_count, check_in.reaction_count) == (1, 0)
+
 
 class TestCheckInCommentsList:
     def test_post_create_comment_successfully(self, client, test_check_in, auth_token):
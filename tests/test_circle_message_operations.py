@@ -1,10 +1,19 @@
+import gzip
+import json
 import pytest
+from datetime import datetime, timedelta
 from unittest.mock import patch
 from flask_jwt_extended import create_access_token
-from models import CircleModel, CircleMessageModel, CircleMembershipModel, UserModel
+from models import CircleModel, CircleMessageModel, CircleMembershipModel, CircleReadMarkerModel, UserModel
 from db import db
+from sqlalchemy import delete
 from sqlalchemy.exc import SQLAlchemyError
 from passlib.hash import pbkdf2_sha256
+from sqlalchemy.exc import IntegrityError
+from services import metrics, message_archive
+from services.read_markers import ReadMarkerBuffer, write_read_markers
+from services.feed_cache import LRUCacheBackend
+from services.membership import MembershipCache, is_circle_member
 
 
 @pytest.fixture(scope="function")
@@ -193,3 +202,370 @@ class TestCircleMessageList:
         assert response.status_code == 200
         assert "messages" in response.json
         assert len(response.json["messages"]) >= 3
+
+    def test_get_messages_pages_history_with_before(self, client, circle_with_membership, auth_token, db, test_user):
+        """Test that history pages newest-first by sent_at and next_cursor continues before the last message."""
+        start = datetime(2026, 1, 1, 12, 0)
+        # IDs deliberately out of sent_at order
+        for i in (3, 0, 4, 1, 2):
+            db.session.add(CircleMessageModel(
+                message=f"Message {i}", circle_id=circle_with_membership.id,
+                user_id=test_user.id, sent_at=start + timedelta(minutes=i)
+            ))
+        db.session.commit()
+        url = f"/circle/{circle_with_membership.id}/message"
+        headers = {"Authorization": f"Bearer {auth_token}"}
+
+        first = client.get(f"{url}?limit=2", headers=headers)
+        assert [m["message"] for m in first.json["messages"]] == ["Message 4", "Message 3"]
+        assert first.json["messages"][0]["user"]["username"] == "testuser"
+
+        second = client.get(f"{url}?limit=2&before={first.json['next_cursor']}", headers=headers)
+        assert [m["message"] for m in second.json["messages"]] == ["Message 2", "Message 1"]
+
+        last = client.get(f"{url}?limit=2&before={second.json['next_cursor']}", headers=headers)
+        assert [m["message"] for m in last.json["messages"]] == ["Message 0"]
+        assert last.json["next_cursor"] is None
+
+    def test_get_messages_ignores_cursor_from_another_circle(self, client, circle_with_membership, auth_token,
+                                                            db, test_user):
+        """Test that a ?before= message from another circle matches nothing."""
+        other = CircleModel(name="Other", description="Other circle", created_by_id=test_user.id)
+        db.session.add(other)
+        db.session.flush()
+        foreign = CircleMessageModel(message="Elsewhere", circle_id=other.id, user_id=test_user.id)
+        db.session.add_all([foreign, CircleMessageModel(
+            message="Here", circle_id=circle_with_membership.id, user_id=test_user.id
+        )])
+        db.session.commit()
+
+        response = client.get(
+            f"/circle/{circle_with_membership.id}/message?before={foreign.id}",
+            headers={"Authorization": f"Bearer {auth_token}"}
+        )
+
+        assert response.status_code == 200
+        assert response.json["messages"] == []
+
+
+class TestCircleMessageStream:
+    def _open(self, client, circle_id, token):
+        response = client.get(
+            f"/circle/{circle_id}/message/stream",
+            headers={"Authorization": f"Bearer {token}"},
+            buffered=False
+        )
+        assert response.status_code == 200
+        assert response.mimetype == "text/event-stream"
+        events = (chunk.decode() for chunk in response.response)
+        assert next(events).startswith("retry:")
+        return response, events
+
+    def test_stream_pushes_committed_messages(self, client, app, circle_with_membership, auth_token, test_user):
+        """Test that a message posted to the circle reaches a member's open stream."""
+        # The stream hands its session back before blocking, which detaches test objects
+        circle_id, user_id = circle_with_membership.id, test_user.id
+        response, events = self._open(client, circle_id, auth_token)
+
+        client.post(
+            f"/circle/{circle_id}/message",
+            json={"message": "Hello circle"},
+            headers={"Authorization": f"Bearer {auth_token}"}
+        )
+
+        event = next(events)
+        assert event.startswith("event: message\n")
+        payload = json.loads(event.split("data: ", 1)[1])
+        assert payload["message"] == "Hello circle"
+        assert payload["user_id"] == user_id
+        assert payload["id"] == CircleMessageModel.query.one().id
+
+        response.close()
+        assert app.extensions["broker"].subscriber_count(f"circle:{circle_id}") == 0
+
+    def test_stream_ends_when_member_leaves(self, client, app, circle_with_membership, auth_token, test_user, db):
+        """Test that leaving the circle closes the member's stream."""
+        circle_id, user_id = circle_with_membership.id, test_user.id
+        response, events = self._open(client, circle_id, auth_token)
+
+        db.session.delete(CircleMembershipModel.query.filter_by(circle_id=circle_id, user_id=user_id).one())
+        db.session.commit()
+
+        event = next(events)
+        assert event.startswith("event: member_left\n")
+        with pytest.raises(StopIteration):
+            next(events)
+        assert app.extensions["broker"].subscriber_count(f"circle:{circle_id}") == 0
+
+    def test_stream_requires_membership(self, client, test_circle, auth_token):
+        """Test that non-members cannot open the circle's stream."""
+        response = client.get(
+            f"/circle/{test_circle.id}/message/stream",
+            headers={"Authorization": f"Bearer {auth_token}"}
+        )
+
+        assert response.status_code == 403
+
+
+class TestCircleMessageArchive:
+    def _add_messages(self, db, circle_id, user_id, sent_ats):
+        messages = [
+            CircleMessageModel(message=f"Message {i}", circle_id=circle_id, user_id=user_id, sent_at=sent_at)
+            for i, sent_at in enumerate(sent_ats)
+        ]
+        db.session.add_all(messages)
+        db.session.commit()
+        return [message.id for message in messages]
+
+    def test_archive_command_moves_old_messages_to_monthly_files(self, app, db, circle_with_membership, test_user,
+                                                                tmp_path, monkeypatch):
+        """Test that messages past retention leave the table for per-circle, per-month gzip NDJSON files."""
+        monkeypatch.setitem(app.config, "MESSAGE_ARCHIVE_DIR", str(tmp_path))
+        now = datetime.utcnow()
+        ids = self._add_messages(db, circle_with_membership.id, test_user.id, [
+            datetime(2025, 1, 10), datetime(2025, 1, 20), datetime(2025, 2, 5), now,
+        ])
+
+        result = app.test_cli_runner().invoke(args=["circles", "archive-messages", "--days", "30"])
+
+        assert result.exit_code == 0
+        assert "Archived 3" in result.output
+        assert [m.id for m in CircleMessageModel.query.all()] == [ids[3]]
+        circle_dir = tmp_path / f"circle_{circle_with_membership.id}"
+        assert sorted(p.name for p in circle_dir.iterdir()) == ["2025-01.ndjson.gz", "2025-02.ndjson.gz"]
+        with gzip.open(circle_dir / "2025-01.ndjson.gz", "rt") as archive:
+            assert [json.loads(line)["id"] for line in archive] == ids[:2]
+
+    def test_history_continues_into_archive(self, app, client, db, circle_with_membership, test_user, auth_token,
+                                            tmp_path, monkeypatch):
+        """Test that paging past the oldest hot message reads archived messages transparently."""
+        monkeypatch.setitem(app.config, "MESSAGE_ARCHIVE_DIR", str(tmp_path))
+        now = datetime.utcnow()
+        ids = self._add_messages(db, circle_with_membership.id, test_user.id, [
+            datetime(2025, 1, 10), datetime(2025, 2, 5), datetime(2025, 3, 1),
+            now - timedelta(minutes=2), now - timedelta(minutes=1),
+        ])
+        app.test_cli_runner().invoke(args=["circles", "archive-messages", "--days", "30"])
+        url = f"/circle/{circle_with_membership.id}/message"
+        headers = {"Authorization": f"Bearer {auth_token}"}
+
+        first = client.get(f"{url}?limit=3", headers=headers)
+        assert [m["id"] for m in first.json["messages"]] == [ids[4], ids[3], ids[2]]
+        assert first.json["messages"][2]["user"]["username"] == "testuser"
+        assert first.json["messages"][2]["sent_at"].startswith("2025-03-01")
+
+        # The cursor is now an archived message
+        second = client.get(f"{url}?limit=3&before={first.json['next_cursor']}", headers=headers)
+        assert [m["id"] for m in second.json["messages"]] == [ids[1], ids[0]]
+        assert second.json["next_cursor"] is None
+
+    def test_rerun_after_interrupted_archive_keeps_one_copy(self, app, client, db, circle_with_membership,
+                                                           test_user, auth_token, tmp_path, monkeypatch):
+        """Test that messages archived but not yet deleted are neither lost nor shown twice."""
+        monkeypatch.setitem(app.config, "MESSAGE_ARCHIVE_DIR", str(tmp_path))
+        ids = self._add_messages(db, circle_with_membership.id, test_user.id, [
+            datetime(2025, 1, 10), datetime(2025, 1, 11),
+        ])
+        # The first batch commits; the second is written to its file, then the job dies before its delete
+        deletes = []
+
+        def failing_delete(table):
+            deletes.append(table)
+            if len(deletes) == 2:
+                raise RuntimeError("killed")
+            return delete(table)
+
+        with patch.object(message_archive, "delete", failing_delete), pytest.raises(RuntimeError):
+            message_archive.archive_messages(db.engine, str(tmp_path), datetime(2025, 2, 1), batch_size=1)
+        db.session.expire_all()
+        assert [m.id for m in CircleMessageModel.query.all()] == [ids[1]]
+
+        app.test_cli_runner().invoke(args=["circles", "archive-messages", "--days", "30"])
+
+        response = client.get(f"/circle/{circle_with_membership.id}/message",
+                              headers={"Authorization": f"Bearer {auth_token}"})
+        assert [m["id"] for m in response.json["messages"]] == [ids[1], ids[0]]
+
+
+class TestCircleUnread:
+    def _setup(self, db, circle, test_user):
+        other = UserModel(username="chatty", email="chatty@example.com", password_hash="hash", is_staff=False)
+        second = CircleModel(name="Second", description="Second circle", created_by_id=test_user.id)
+        db.session.add_all([other, second])
+        db.session.flush()
+        db.session.add_all([
+            CircleMembershipModel(circle_id=circle.id, user_id=other.id),
+            CircleMembershipModel(circle_id=second.id, user_id=test_user.id),
+        ])
+        ids = []
+        for i in range(3):
+            message = CircleMessageModel(message=f"From other {i}", circle_id=circle.id, user_id=other.id)
+            db.session.add(message)
+            db.session.flush()
+            ids.append(message.id)
+        # The reader's own messages never count as unread
+        db.session.add(CircleMessageModel(message="Mine", circle_id=circle.id, user_id=test_user.id))
+        db.session.commit()
+        return second.id, ids
+
+    def test_unread_counts_in_one_query(self, client, circle_with_membership, test_user, auth_token, db,
+                                        query_counter):
+        """Test that every circle's unread count comes from a single aggregate."""
+        second_id, _ = self._setup(db, circle_with_membership, test_user)
+        circle_id = circle_with_membership.id
+
+        with query_counter() as counter:
+            response = client.get("/circles/unread", headers={"Authorization": f"Bearer {auth_token}"})
+
+        assert response.status_code == 200
+        counts = {row["circle_id"]: row["unread_count"] for row in response.json}
+        assert counts == {circle_id: 3, second_id: 0}
+        assert counter.count == 1
+
+    def test_read_marker_updates_are_coalesced(self, client, circle_with_membership, test_user, auth_token, db,
+                                               query_counter):
+        """Test that rapid marker updates write once and the latest still shows in the caller's counts."""
+        _, ids = self._setup(db, circle_with_membership, test_user)
+        url = f"/circle/{circle_with_membership.id}/message/read"
+        headers = {"Authorization": f"Bearer {auth_token}"}
+
+        client.put(url, json={"last_read_message_id": ids[0]}, headers=headers)
+        with query_counter() as counter:
+            for message_id in ids[1:]:
+                response = client.put(url, json={"last_read_message_id": message_id}, headers=headers)
+                assert response.status_code == 200
+
+        marker = db.session.get(CircleReadMarkerModel, (test_user.id, circle_with_membership.id))
+        assert marker.last_read_message_id == ids[0]
+        # Only the membership checks, no marker writes
+        assert counter.count == 2 * 2
+
+        response = client.get("/circles/unread", headers=headers)
+        row = next(r for r in response.json if r["circle_id"] == circle_with_membership.id)
+        assert row == {"circle_id": circle_with_membership.id, "last_read_message_id": ids[2], "unread_count": 0}
+
+    def test_read_marker_never_moves_backwards(self, client, circle_with_membership, test_user, auth_token, db):
+        """Test that reporting an older message keeps the newer marker."""
+        _, ids = self._setup(db, circle_with_membership, test_user)
+        url = f"/circle/{circle_with_membership.id}/message/read"
+        headers = {"Authorization": f"Bearer {auth_token}"}
+
+        client.put(url, json={"last_read_message_id": ids[1]}, headers=headers)
+        client.get("/circles/unread", headers=headers)
+        client.put(url, json={"last_read_message_id": ids[0]}, headers=headers)
+        response = client.get("/circles/unread", headers=headers)
+
+        row = next(r for r in response.json if r["circle_id"] == circle_with_membership.id)
+        assert row["last_read_message_id"] == ids[1]
+        assert row["unread_count"] == 1
+
+    def test_due_markers_are_written_at_request_teardown(self, app, client, circle_with_membership, test_user,
+                                                         auth_token, db, monkeypatch):
+        """Test that a buffered marker reaches the database on the worker's next request of any kind."""
+        _, ids = self._setup(db, circle_with_membership, test_user)
+        circle_id = circle_with_membership.id
+        headers = {"Authorization": f"Bearer {auth_token}"}
+        client.put(f"/circle/{circle_id}/message/read", json={"last_read_message_id": ids[0]}, headers=headers)
+        client.put(f"/circle/{circle_id}/message/read", json={"last_read_message_id": ids[2]}, headers=headers)
+
+        monkeypatch.setattr(app.extensions["read_markers"], "interval", 0)
+        client.get(f"/circle/{circle_id}/message", headers=headers)
+
+        db.session.expire_all()
+        marker = db.session.get(CircleReadMarkerModel, (test_user.id, circle_id))
+        assert marker.last_read_message_id == ids[2]
+
+    def test_read_markers_are_upserted_in_one_statement(self, db, circle_with_membership, test_user, query_counter):
+        """Test that new and existing markers are written together and only ever move forward."""
+        second_id, ids = self._setup(db, circle_with_membership, test_user)
+        first, second = (test_user.id, circle_with_membership.id), (test_user.id, second_id)
+        write_read_markers(db.session.connection(), {first: ids[2]})
+
+        with query_counter() as counter:
+            write_read_markers(db.session.connection(), {first: ids[0], second: ids[1]})
+        db.session.commit()
+
+        assert counter.count == 1
+        assert db.session.get(CircleReadMarkerModel, first).last_read_message_id == ids[2]
+        assert db.session.get(CircleReadMarkerModel, second).last_read_message_id == ids[1]
+
+    def test_read_marker_buffer_forgets_expired_write_times(self):
+        """Test that keys written more than an interval ago and idle since are dropped from the buffer."""
+        buffer = ReadMarkerBuffer(10)
+        with patch("services.read_markers.time.monotonic", return_value=100):
+            buffer.record(1, 1, 5)
+            buffer.record(2, 1, 5)
+            assert buffer.take_due() == {(1, 1): 5, (2, 1): 5}
+        with patch("services.read_markers.time.monotonic", return_value=105):
+            buffer.record(2, 1, 6)
+            assert buffer.take_due() == {}
+        with patch("services.read_markers.time.monotonic", return_value=111):
+            assert buffer.take_due() == {(2, 1): 6}
+
+        assert buffer._written_at == {(2, 1): 111}
+
+    def test_read_marker_requires_membership(self, client, test_circle, auth_token):
+        """Test that non-members cannot set a read marker."""
+        response = client.put(
+            f"/circle/{test_circle.id}/message/read",
+            json={"last_read_message_id": 1},
+            headers={"Authorization": f"Bearer {auth_token}"}
+        )
+
+        assert response.status_code == 403
+
+
+def _add_members(db, circle, count):
+    for i in range(count):
+        user = UserModel(username=f"member{i}", email=f"member{i}@example.com",
+                         password_hash="hash", is_staff=False)
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(CircleMembershipModel(circle_id=circle.id, user_id=user.id))
+    db.session.commit()
+
+
+class TestCircleMembershipCheck:
+    def test_message_access_check_does_not_load_roster(self, client, circle_with_membership, auth_token,
+                                                       db, query_counter):
+        """Test that posting to a large circle costs the same queries as to a small one."""
+        circle_id = circle_with_membership.id
+        url = f"/circle/{circle_id}/message"
+        headers = {"Authorization": f"Bearer {auth_token}"}
+
+        with query_counter() as small:
+            client.post(url, json={"message": "Hi"}, headers=headers)
+
+        _add_members(db, db.session.get(CircleModel, circle_id), 50)
+        with query_counter() as large:
+            response = client.post(url, json={"message": "Hi all"}, headers=headers)
+
+        assert response.status_code == 201
+        assert large.count == small.count
+
+    def test_duplicate_membership_is_rejected_by_index(self, db, circle_with_membership, test_user):
+        """Test the unique (circle_id, user_id) index."""
+        db.session.add(CircleMembershipModel(circle_id=circle_with_membership.id, user_id=test_user.id))
+
+        with pytest.raises(IntegrityError):
+            db.session.commit()
+        db.session.rollback()
+
+    def test_membership_cache_is_dropped_on_leave(self, app, db, circle_with_membership, test_user, query_counter):
+        """Test that cached answers skip the database until the membership changes."""
+        app.extensions["membership_cache"] = MembershipCache(LRUCacheBackend(), ttl=60)
+        try:
+            circle_id, user_id = circle_with_membership.id, test_user.id
+            assert is_circle_member(circle_id, user_id) is True
+
+            hits = metrics.get("membership_cache.hits")
+            with query_counter() as counter:
+                assert is_circle_member(circle_id, user_id) is True
+            assert counter.count == 0
+            assert metrics.get("membership_cache.hits") == hits + 1
+
+            db.session.delete(CircleMembershipModel.query.filter_by(circle_id=circle_id, user_id=user_id).one())
+            db.session.commit()
+            assert is_circle_member(circle_id, user_id) is False
+        finally:
+            del app.extensions["membership_cache"]
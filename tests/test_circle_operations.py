@@ -1,8 +1,18 @@
 import pytest
 from unittest.mock import patch, MagicMock
 from flask_jwt_extended import create_access_token
-from models import CircleModel, UserModel, CircleMembershipModel
+from models import (
+    CircleModel, UserModel, CircleMembershipModel, GoalModel, CheckInModel,
+    CircleMemberStatsModel, CircleMemberDailyStatsModel, FeedEntryModel
+)
+from services import circle_stats, metrics
+from services.circle_stream import circle_channel
+from services.single_flight import SingleFlight
+import threading
+import time
+from datetime import datetime, timedelta
 from db import db
+from sqlalchemy import event
 from sqlalchemy.exc import SQLAlchemyError
 
 
@@ -51,6 +61,54 @@ class TestCircleCreate:
             assert "issue while creating the Circle" in response.json["message"]
 
 
+class TestCircleList:
+    def _join_circles(self, db, test_user, circles=5, members=4):
+        for i in range(circles):
+            circle = CircleModel(name=f"Circle {i}", description="Circle", created_by_id=test_user.id)
+            db.session.add(circle)
+            db.session.flush()
+            db.session.add(CircleMembershipModel(circle_id=circle.id, user_id=test_user.id))
+            for j in range(members - 1):
+                user = UserModel(username=f"user{i}_{j}", email=f"user{i}_{j}@example.com",
+                                 password_hash="hash", is_staff=False)
+                db.session.add(user)
+                db.session.flush()
+                db.session.add(CircleMembershipModel(circle_id=circle.id, user_id=user.id))
+        db.session.commit()
+
+    def test_get_circles_with_rosters_in_bounded_queries(self, client, test_user, auth_token, db, query_counter):
+        """Test that circles and their rosters load in two queries however many circles there are."""
+        self._join_circles(db, test_user)
+
+        with query_counter() as counter:
+            response = client.get("/circles", headers={"Authorization": f"Bearer {auth_token}"})
+
+        assert response.status_code == 200
+        assert [circle["name"] for circle in response.json] == [f"Circle {i}" for i in range(5)]
+        assert all(len(circle["users"]) == 4 for circle in response.json)
+        assert counter.count == 2
+
+    def test_get_circles_summary(self, client, test_user, auth_token, db, query_counter):
+        """Test that summary mode returns member counts and no rosters in one query."""
+        self._join_circles(db, test_user, circles=3, members=3)
+
+        with query_counter() as counter:
+            response = client.get("/circles?summary=true", headers={"Authorization": f"Bearer {auth_token}"})
+
+        assert response.status_code == 200
+        assert [circle["member_count"] for circle in response.json] == [3, 3, 3]
+        assert all("users" not in circle for circle in response.json)
+        assert response.json[0]["created_at"]
+        assert counter.count == 1
+
+    def test_get_circles_only_lists_own_circles(self, client, test_circle, auth_token):
+        """Test that circles the user is not a member of are left out."""
+        response = client.get("/circles", headers={"Authorization": f"Bearer {auth_token}"})
+
+        assert response.status_code == 200
+        assert response.json == []
+
+
 class TestCircle:
     def test_get_circle_successfully(self, client, test_circle):
         """Test retrieving a circle by ID."""
@@ -60,12 +118,28 @@ class TestCircle:
         assert response.json["name"] == test_circle.name
         assert response.json["description"] == test_circle.description
 
+    def test_get_circle_returns_member_count_not_roster(self, client, test_circle, test_user, db):
+        """Test that circle detail reports member_count instead of embedding users."""
+        db.session.add(CircleMembershipModel(circle_id=test_circle.id, user_id=test_user.id))
+        db.session.commit()
+
+        response = client.get(f"/circle/{test_circle.id}")
+
+        assert response.json["member_count"] == 1
+        assert "users" not in response.json
+
     def test_get_circle_not_found(self, client):
         """Test retrieving a non-existent circle."""
         response = client.get("/circle/9999")
 
         assert response.status_code == 404
 
+    def test_get_circle_non_numeric_id(self, client):
+        """Test that a non-numeric circle ID is a 404, not a server error."""
+        response = client.get("/circle/abc")
+
+        assert response.status_code == 404
+
     def test_put_update_circle_successfully(self, client, test_circle, auth_token):
         """Test successfully updating a circle."""
         response = client.put(
@@ -141,6 +215,41 @@ class TestCircleUsers:
         assert "circle" in response.json
         assert "user" in response.json
 
+    def test_get_circle_users_pages_by_joined_at(self, client, test_circle, auth_token, db):
+        """Test cursor pagination, role filtering and ordering of the member listing."""
+        now = datetime.utcnow()
+        for i in range(5):
+            user = UserModel(username=f"member{i}", email=f"member{i}@example.com",
+                             password_hash="hash", is_staff=False)
+            db.session.add(user)
+            db.session.flush()
+            db.session.add(CircleMembershipModel(
+                circle_id=test_circle.id, user_id=user.id,
+                role="admin" if i % 2 == 0 else "member",
+                joined_at=now - timedelta(days=5 - i),
+            ))
+        db.session.commit()
+        headers = {"Authorization": f"Bearer {auth_token}"}
+        url = f"/circle/{test_circle.id}/users"
+
+        seen = []
+        response = client.get(f"{url}?limit=2", headers=headers)
+        while True:
+            assert response.status_code == 200
+            seen += [member["username"] for member in response.json["user"]]
+            if not response.json["next_cursor"]:
+                break
+            response = client.get(f"{url}?limit=2&cursor={response.json['next_cursor']}", headers=headers)
+        assert seen == [f"member{i}" for i in range(5)]
+
+        response = client.get(f"{url}?role=admin&order=desc", headers=headers)
+        assert [(m["username"], m["role"]) for m in response.json["user"]] == [
+            ("member4", "admin"), ("member2", "admin"), ("member0", "admin"),
+        ]
+        assert response.json["user"][0]["joined_at"]
+
+        assert client.get(f"{url}?cursor=bogus", headers=headers).status_code == 400
+
     def test_get_circle_users_circle_not_found(self, client, auth_token):
         """Test retrieving users from non-existent circle."""
         response = client.get(
@@ -262,3 +371,437 @@ class TestCircleUsers:
 
         assert response.status_code == 404
         assert "not in the circle" in response.json["message"]
+
+
+class TestCircleUsersBulk:
+    def _create_users(self, db, count):
+        users = [
+            UserModel(username=f"cohort{i}", email=f"cohort{i}@example.com", password_hash="hash", is_staff=False)
+            for i in range(count)
+        ]
+        db.session.add_all(users)
+        db.session.commit()
+        return [user.id for user in users]
+
+    def test_bulk_add_reports_each_id(self, client, test_circle, test_user, auth_token, db):
+        """Test that a bulk add inserts new members and reports existing and unknown IDs."""
+        db.session.add(CircleMembershipModel(circle_id=test_circle.id, user_id=test_user.id))
+        db.session.commit()
+        new_ids = self._create_users(db, 3)
+        assert client.get(f"/circle/{test_circle.id}").json["member_count"] == 1
+
+        response = client.post(
+            f"/circle/{test_circle.id}/users/bulk",
+            json={"user_ids": [*new_ids, test_user.id, 9999, new_ids[0]], "role": "admin"},
+            headers={"Authorization": f"Bearer {auth_token}"}
+        )
+
+        assert response.status_code == 200
+        statuses = {result["user_id"]: result["status"] for result in response.json["results"]}
+        assert statuses == {
+            new_ids[0]: "added", new_ids[1]: "added", new_ids[2]: "added",
+            test_user.id: "already_member", 9999: "not_found",
+        }
+        assert response.json["counts"] == {"added": 3, "already_member": 1, "not_found": 1}
+        roles = {m.user_id: m.role for m in CircleMembershipModel.query.filter_by(circle_id=test_circle.id)}
+        assert roles == {test_user.id: "member", new_ids[0]: "admin", new_ids[1]: "admin", new_ids[2]: "admin"}
+        # The cached circle detail was dropped with the batch
+        assert client.get(f"/circle/{test_circle.id}").json["member_count"] == 4
+
+    def test_bulk_add_uses_one_insert_and_keeps_feeds_current(self, client, test_circle, test_user, auth_token, db):
+        """Test that new memberships go out in one INSERT and still reach the feed listeners."""
+        db.session.add(CircleMembershipModel(circle_id=test_circle.id, user_id=test_user.id))
+        db.session.add(CheckInModel(user_id=test_user.id))
+        db.session.commit()
+        new_ids = self._create_users(db, 20)
+
+        statements = []
+        record = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.engine, "before_cursor_execute", record)
+        try:
+            response = client.post(
+                f"/circle/{test_circle.id}/users/bulk",
+                json={"user_ids": new_ids},
+                headers={"Authorization": f"Bearer {auth_token}"}
+            )
+        finally:
+            event.remove(db.engine, "before_cursor_execute", record)
+
+        assert response.status_code == 200
+        assert sum(s.startswith("INSERT INTO circle_memberships") for s in statements) == 1
+        # Every new member sees the existing member's check-in
+        assert FeedEntryModel.query.filter(FeedEntryModel.owner_id.in_(new_ids)).count() == 20
+
+    def test_bulk_remove_reports_each_id(self, client, test_circle, test_user, auth_token, db):
+        """Test that a bulk remove deletes memberships and reports IDs that were not members."""
+        member_ids = self._create_users(db, 2)
+        for user_id in member_ids:
+            db.session.add(CircleMembershipModel(circle_id=test_circle.id, user_id=user_id))
+        db.session.commit()
+
+        response = client.delete(
+            f"/circle/{test_circle.id}/users/bulk",
+            json={"user_ids": [*member_ids, test_user.id, 9999]},
+            headers={"Authorization": f"Bearer {auth_token}"}
+        )
+
+        assert response.status_code == 200
+        assert response.json["counts"] == {"removed": 2, "not_member": 1, "not_found": 1}
+        assert CircleMembershipModel.query.filter_by(circle_id=test_circle.id).count() == 0
+
+    def test_bulk_remove_uses_one_delete_and_prunes_feeds(self, app, client, test_circle, test_user, auth_token, db):
+        """Test that removals go out in one DELETE, cost the same for any batch size and still prune feeds."""
+        db.session.add(CircleMembershipModel(circle_id=test_circle.id, user_id=test_user.id))
+        db.session.add(CheckInModel(user_id=test_user.id))
+        db.session.commit()
+        member_ids = self._create_users(db, 25)
+        client.post(f"/circle/{test_circle.id}/users/bulk", json={"user_ids": member_ids},
+                    headers={"Authorization": f"Bearer {auth_token}"})
+        assert FeedEntryModel.query.filter(FeedEntryModel.owner_id.in_(member_ids)).count() == 25
+        broker = app.extensions["broker"]
+        subscription = broker.subscribe(circle_channel(test_circle.id))
+
+        batches = []
+        for user_ids in (member_ids[:5], member_ids[5:]):
+            statements = []
+            record = lambda conn, cursor, statement, *args: statements.append(statement)
+            event.listen(db.engine, "before_cursor_execute", record)
+            try:
+                response = client.delete(
+                    f"/circle/{test_circle.id}/users/bulk",
+                    json={"user_ids": user_ids},
+                    headers={"Authorization": f"Bearer {auth_token}"}
+                )
+            finally:
+                event.remove(db.engine, "before_cursor_execute", record)
+            assert response.status_code == 200
+            assert response.json["counts"] == {"removed": len(user_ids)}
+            batches.append(statements)
+
+        assert [sum(s.startswith("DELETE FROM circle_memberships") for s in b) for b in batches] == [1, 1]
+        assert len(batches[0]) == len(batches[1])
+        assert FeedEntryModel.query.filter(FeedEntryModel.owner_id.in_(member_ids)).count() == 0
+        assert CircleMembershipModel.query.filter_by(circle_id=test_circle.id).count() == 1
+        # Every removed member's stream is told to end
+        left = []
+        while (message := subscription.get(timeout=0)) is not None:
+            left.append(message["data"]["user_id"])
+        broker.unsubscribe(subscription)
+        assert sorted(left) == sorted(member_ids)
+
+    def test_bulk_add_skips_concurrently_added_members(self, client, test_circle, auth_token, db):
+        """Test that a member added after the lookup is reported as already_member instead of failing the batch."""
+        new_ids = self._create_users(db, 2)
+
+        # The lookup sees neither user as a member, as if the second joined right after it
+        with patch("resources.circle.bulk_membership_lookup", return_value={user_id: None for user_id in new_ids}):
+            db.session.add(CircleMembershipModel(circle_id=test_circle.id, user_id=new_ids[1]))
+            db.session.commit()
+            response = client.post(
+                f"/circle/{test_circle.id}/users/bulk",
+                json={"user_ids": new_ids},
+                headers={"Authorization": f"Bearer {auth_token}"}
+            )
+
+        assert response.status_code == 200
+        assert response.json["results"] == [
+            {"user_id": new_ids[0], "status": "added"},
+            {"user_id": new_ids[1], "status": "already_member"},
+        ]
+        assert CircleMembershipModel.query.filter_by(circle_id=test_circle.id).count() == 2
+
+    def test_bulk_changes_require_membership(self, app, client, test_circle, db):
+        """Test that a user who neither created nor belongs to the circle cannot add or remove members."""
+        outsider_id, member_id = self._create_users(db, 2)
+        db.session.add(CircleMembershipModel(circle_id=test_circle.id, user_id=member_id))
+        db.session.commit()
+        with app.app_context():
+            token = create_access_token(identity=str(outsider_id))
+        headers = {"Authorization": f"Bearer {token}"}
+
+        added = client.post(f"/circle/{test_circle.id}/users/bulk", json={"user_ids": [outsider_id]}, headers=headers)
+        removed = client.delete(f"/circle/{test_circle.id}/users/bulk", json={"user_ids": [member_id]},
+                                headers=headers)
+
+        assert added.status_code == 403
+        assert removed.status_code == 403
+        members = {m.user_id for m in CircleMembershipModel.query.filter_by(circle_id=test_circle.id)}
+        assert members == {member_id}
+
+    def test_bulk_add_rejects_oversized_batches(self, client, test_circle, auth_token):
+        """Test that empty and oversized ID lists are rejected."""
+        for user_ids in ([], list(range(1, 5002))):
+            response = client.post(
+                f"/circle/{test_circle.id}/users/bulk",
+                json={"user_ids": user_ids},
+                headers={"Authorization": f"Bearer {auth_token}"}
+            )
+            assert response.status_code == 422
+
+
+class TestCircleLeaderboard:
+    def _add_member(self, db, circle, username, check_ins=0, active=True):
+        user = UserModel(
+            username=username,
+            email=f"{username}@example.com",
+            password_hash="hash",
+            is_staff=False
+        )
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(CircleMembershipModel(circle_id=circle.id, user_id=user.id))
+        goal = GoalModel(title="Goal", goal_type="daily", user_id=user.id,
+                         circle_id=circle.id, is_active=active)
+        db.session.add(goal)
+        db.session.flush()
+        for _ in range(check_ins):
+            db.session.add(CheckInModel(user_id=user.id, goal_id=goal.id, content="Done"))
+        db.session.commit()
+        return user
+
+    def test_get_leaderboard_ranks_members(self, client, test_circle, test_user, auth_token, db):
+        """Test that members are ranked by circle check-ins with their goal stats."""
+        db.session.add(CircleMembershipModel(circle_id=test_circle.id, user_id=test_user.id, role="owner"))
+        db.session.commit()
+        self._add_member(db, test_circle, "busy", check_ins=3)
+        self._add_member(db, test_circle, "idle", check_ins=0, active=False)
+
+        response = client.get(
+            f"/circle/{test_circle.id}/leaderboard",
+            headers={"Authorization": f"Bearer {auth_token}"}
+        )
+
+        assert response.status_code == 200
+        board = response.json["leaderboard"]
+        assert [entry["username"] for entry in board] == ["busy", "testuser", "idle"]
+        assert board[0]["total_check_ins"] == 3
+        assert board[0]["active_goals"] == 1
+        assert board[0]["last_check_in"] is not None
+        assert board[0]["current_streak"] == 1
+        assert board[1]["current_streak"] == 0
+        assert board[1]["role"] == "owner"
+        assert board[1]["last_check_in"] is None
+        assert board[2]["active_goals"] == 0
+
+    def test_get_leaderboard_requires_membership(self, client, test_circle, auth_token):
+        """Test that non-members cannot view the leaderboard."""
+        response = client.get(
+            f"/circle/{test_circle.id}/leaderboard",
+            headers={"Authorization": f"Bearer {auth_token}"}
+        )
+
+        assert response.status_code == 403
+
+    def test_get_leaderboard_query_count_independent_of_members(self, client, test_circle, test_user,
+                                                                auth_token, db, query_counter):
+        """Test that the leaderboard costs the same number of queries for 2 or 40 members."""
+        db.session.add(CircleMembershipModel(circle_id=test_circle.id, user_id=test_user.id))
+        db.session.commit()
+        circle_id = test_circle.id
+        url = f"/circle/{circle_id}/leaderboard"
+        headers = {"Authorization": f"Bearer {auth_token}"}
+
+        self._add_member(db, test_circle, "member0", check_ins=1)
+        with query_counter() as small:
+            assert len(client.get(url, headers=headers).json["leaderboard"]) == 2
+
+        circle = db.session.get(CircleModel, circle_id)
+        for i in range(1, 40):
+            self._add_member(db, circle, f"member{i}", check_ins=i % 3)
+        with query_counter() as large:
+            assert len(client.get(url, headers=headers).json["leaderboard"]) == 41
+
+        assert large.count == small.count
+
+    def test_stats_follow_check_ins_and_goal_changes(self, client, test_circle, test_user, auth_token, db):
+        """Test that circle_member_stats tracks check-ins and is_active flips as they happen."""
+        goal = GoalModel(title="Goal", goal_type="daily", user_id=test_user.id,
+                         circle_id=test_circle.id, is_active=True)
+        db.session.add(goal)
+        db.session.commit()
+        circle_id, user_id, goal_id = test_circle.id, test_user.id, goal.id
+        headers = {"Authorization": f"Bearer {auth_token}"}
+
+        for content in ("One", "Two"):
+            client.post(f"/goal/{goal_id}/check-ins", json={"content": content}, headers=headers)
+        stats = db.session.get(CircleMemberStatsModel, (circle_id, user_id))
+        assert (stats.total_check_ins, stats.active_goals) == (2, 1)
+        assert stats.last_check_in is not None
+
+        client.put(f"/goal/{goal_id}", json={"is_active": False}, headers=headers)
+        db.session.expire_all()
+        assert db.session.get(CircleMemberStatsModel, (circle_id, user_id)).active_goals == 0
+
+        db.session.delete(CheckInModel.query.filter_by(content="Two").one())
+        db.session.commit()
+        assert db.session.get(CircleMemberStatsModel, (circle_id, user_id)).total_check_ins == 1
+
+    def test_rebuild_stats_command_reconciles_drift(self, app, test_circle, test_user, db):
+        """Test that rebuild-stats recomputes the table from check-ins and goals."""
+        self._add_member(db, test_circle, "busy", check_ins=3)
+        db.session.execute(CircleMemberStatsModel.__table__.update().values(total_check_ins=99, active_goals=5))
+        db.session.commit()
+
+        result = app.test_cli_runner().invoke(args=["circles", "rebuild-stats"])
+
+        assert result.exit_code == 0
+        stats = CircleMemberStatsModel.query.one()
+        assert (stats.total_check_ins, stats.active_goals) == (3, 1)
+
+    def test_get_leaderboard_by_window(self, client, test_circle, test_user, auth_token, db):
+        """Test that ?window= ranks by check-ins inside the window only."""
+        db.session.add(CircleMembershipModel(circle_id=test_circle.id, user_id=test_user.id))
+        db.session.commit()
+        veteran = self._add_member(db, test_circle, "veteran")
+        goal = GoalModel.query.filter_by(user_id=veteran.id).one()
+        now = datetime.utcnow()
+        for days_ago in (40, 40, 40, 20):
+            db.session.add(CheckInModel(user_id=veteran.id, goal_id=goal.id, content="Old",
+                                        created_at=now - timedelta(days=days_ago)))
+        db.session.commit()
+        self._add_member(db, test_circle, "newcomer", check_ins=2)
+        headers = {"Authorization": f"Bearer {auth_token}"}
+
+        def ranking(window):
+            response = client.get(f"/circle/{test_circle.id}/leaderboard?window={window}", headers=headers)
+            assert response.json["window"] == window
+            return [(entry["username"], entry["total_check_ins"]) for entry in response.json["leaderboard"]]
+
+        assert ranking("all")[0] == ("veteran", 4)
+        assert ranking("30d")[:2] == [("newcomer", 2), ("veteran", 1)]
+        assert ranking("week")[:2] == [("newcomer", 2), ("testuser", 0)]
+
+        response = client.get(f"/circle/{test_circle.id}/leaderboard?window=year", headers=headers)
+        assert response.status_code == 422
+
+    def test_old_daily_buckets_are_compacted(self, test_circle, db):
+        """Test that the first check-in of a day drops buckets older than the retention window."""
+        member = self._add_member(db, test_circle, "member")
+        db.session.add(CircleMemberDailyStatsModel(
+            circle_id=test_circle.id, user_id=member.id,
+            day=datetime.utcnow().date() - timedelta(days=circle_stats.BUCKET_RETENTION_DAYS + 5),
+            check_ins=3,
+        ))
+        db.session.commit()
+        circle_stats._last_compacted = None
+
+        goal = GoalModel.query.filter_by(user_id=member.id).one()
+        db.session.add(CheckInModel(user_id=member.id, goal_id=goal.id, content="Today"))
+        db.session.commit()
+
+        buckets = CircleMemberDailyStatsModel.query.filter_by(user_id=member.id).all()
+        assert [(bucket.day, bucket.check_ins) for bucket in buckets] == [(datetime.utcnow().date(), 1)]
+
+
+class TestCircleReadCache:
+    def test_circle_detail_is_cached_until_edited(self, client, test_circle, auth_token, query_counter):
+        """Test that repeat detail reads skip the database and an edit invalidates them."""
+        circle_id = test_circle.id
+        client.get(f"/circle/{circle_id}")
+
+        with query_counter() as counter:
+            response = client.get(f"/circle/{circle_id}")
+        assert response.json["name"] == "Test Circle"
+        assert counter.count == 0
+
+        client.put(
+            f"/circle/{circle_id}",
+            json={"name": "Renamed", "description": "Changed"},
+            headers={"Authorization": f"Bearer {auth_token}"}
+        )
+        assert client.get(f"/circle/{circle_id}").json["name"] == "Renamed"
+
+    def test_leaderboard_is_shared_between_members(self, client, app, test_circle, test_user, auth_token, db):
+        """Test that a second member's leaderboard read is a cache hit, and a join invalidates it."""
+        other = UserModel(username="other", email="other@example.com", password_hash="hash", is_staff=False)
+        db.session.add(other)
+        db.session.flush()
+        db.session.add(CircleMembershipModel(circle_id=test_circle.id, user_id=test_user.id))
+        db.session.add(CircleMembershipModel(circle_id=test_circle.id, user_id=other.id))
+        db.session.commit()
+        with app.app_context():
+            other_token = create_access_token(identity=str(other.id), fresh=False)
+        url = f"/circle/{test_circle.id}/leaderboard"
+
+        client.get(url, headers={"Authorization": f"Bearer {auth_token}"})
+        hits = metrics.get("read_cache.hits")
+        response = client.get(url, headers={"Authorization": f"Bearer {other_token}"})
+        assert len(response.json["leaderboard"]) == 2
+        assert metrics.get("read_cache.hits") == hits + 1
+
+        newcomer = UserModel(username="newcomer", email="new@example.com", password_hash="hash", is_staff=False)
+        db.session.add(newcomer)
+        db.session.flush()
+        db.session.add(CircleMembershipModel(circle_id=test_circle.id, user_id=newcomer.id))
+        db.session.commit()
+        response = client.get(url, headers={"Authorization": f"Bearer {auth_token}"})
+        assert len(response.json["leaderboard"]) == 3
+
+
+class TestSingleFlight:
+    def test_concurrent_calls_share_one_computation(self):
+        """Test that callers arriving during a computation wait for it instead of running their own."""
+        flight = SingleFlight()
+        calls = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait(timeout=5)
+            return "result"
+
+        coalesced = metrics.get("single_flight.coalesced")
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do("key", compute)))
+        leader.start()
+        started.wait(timeout=5)
+        followers = [threading.Thread(target=lambda: results.append(flight.do("key", compute))) for _ in range(4)]
+        for follower in followers:
+            follower.start()
+        while metrics.get("single_flight.coalesced") < coalesced + 4:
+            time.sleep(0.01)
+        release.set()
+        for thread in [leader, *followers]:
+            thread.join(timeout=5)
+
+        assert calls == [1]
+        assert results == ["result"] * 5
+
+    def test_errors_reach_every_waiter_and_are_not_remembered(self):
+        """Test that a failed computation raises in the leader and every waiting follower, then is retried."""
+        flight = SingleFlight()
+        calls = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def fail():
+            calls.append(1)
+            started.set()
+            release.wait(timeout=5)
+            raise ValueError("boom")
+
+        def call():
+            try:
+                flight.do("key", fail)
+            except ValueError as exc:
+                errors.append(exc)
+
+        coalesced = metrics.get("single_flight.coalesced")
+        errors = []
+        leader = threading.Thread(target=call)
+        leader.start()
+        started.wait(timeout=5)
+        followers = [threading.Thread(target=call) for _ in range(4)]
+        for follower in followers:
+            follower.start()
+        while metrics.get("single_flight.coalesced") < coalesced + 4:
+            time.sleep(0.01)
+        release.set()
+        for thread in [leader, *followers]:
+            thread.join(timeout=5)
+
+        assert calls == [1]
+        assert [str(exc) for exc in errors] == ["boom"] * 5
+        assert flight.do("key", lambda: "recovered") == "recovered"
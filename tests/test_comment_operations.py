@@ -49,6 +49,20 @@ class TestComment:
         if response.data:
             assert response.json["message"] == "Comment successfully deleted."
 
+    def test_delete_comment_decrements_count(self, client, test_comment, test_check_in, app, test_user, db):
+        """Test that deleting a comment lowers the check-in's comment_count."""
+        check_in_id = test_check_in.id
+        assert db.session.get(CheckInModel, check_in_id).comment_count == 1
+
+        with app.app_context():
+            fresh_token = create_access_token(identity=str(test_user.id), fresh=True)
+        client.delete(
+            f"/comments/{test_comment.id}",
+            headers={"Authorization": f"Bearer {fresh_token}"}
+        )
+
+        assert db.session.get(CheckInModel, check_in_id).comment_count == 0
+
     def test_delete_comment_not_found(self, client, app, test_user):
         """Test deleting a non-existent comment."""
         with app.app_context():
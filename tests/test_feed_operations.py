@@ -1,12 +1,25 @@
 import pytest
+import json
+import logging
+import time
 from flask_jwt_extended import create_access_token
 from models import (
     UserModel, CheckInModel, GoalModel, FollowModel,
-    CircleModel, CircleMembershipModel
+    CircleModel, CircleMembershipModel, BuddyRequestModel, FeedEntryModel,
+    FeedTombstoneModel, CommentModel
 )
+from services.feed_entries import rebuild_feed_entries
+from services.feed_query import pull_feed_query, VARIANT_ALL
+from services.feed_cache import CacheBackend, LRUCacheBackend
+from services.feed_delta import encode_since_cursor
+from services.broker import Broker, BrokerBackend, LocalBackend
+from services import metrics
+from sqlalchemy import insert
 from passlib.hash import pbkdf2_sha256
 from datetime import datetime, timedelta
 
+logger = logging.getLogger(__name__)
+
 
 class TestFeed:
     def test_get_feed_empty_when_no_activity(self, client, test_user, auth_token):
@@ -335,7 +348,82 @@ class TestFeed:
         assert response.status_code == 200
         # Should only return 50 most recent
         assert len(response.json["feed"]) == 50
+        assert response.json["next_cursor"] is not None
+
+
+    def test_get_feed_pages_with_cursor(self, client, app, test_user, test_goal, db):
+        """Test that following next_cursor walks the whole feed without gaps or duplicates."""
+        for i in range(60):
+            db.session.add(CheckInModel(
+                user_id=test_user.id,
+                goal_id=test_goal.id,
+                content=f"Check-in {i}",
+                created_at=datetime.utcnow() - timedelta(hours=i % 20)
+            ))
+        db.session.commit()
+
+        with app.app_context():
+            token = create_access_token(identity=str(test_user.id), fresh=False)
 
+        seen = []
+        pages = 0
+        cursor = None
+        while True:
+            url = "/feed?limit=25" + (f"&before={cursor}" if cursor else "")
+            response = client.get(url, headers={"Authorization": f"Bearer {token}"})
+            assert response.status_code == 200
+            seen.extend(item["id"] for item in response.json["feed"])
+            pages += 1
+            cursor = response.json["next_cursor"]
+            if cursor is None:
+                break
+
+        assert pages == 3
+        assert len(seen) == 60
+        assert len(set(seen)) == 60
+
+    def test_get_feed_rejects_invalid_cursor(self, client, auth_token):
+        """Test that a malformed cursor is rejected."""
+        response = client.get(
+            "/feed?before=not-a-cursor",
+            headers={"Authorization": f"Bearer {auth_token}"}
+        )
+        assert response.status_code == 400
+
+    def test_get_feed_rejects_limit_out_of_range(self, client, auth_token):
+        """Test that page size is bounded."""
+        response = client.get(
+            "/feed?limit=1000",
+            headers={"Authorization": f"Bearer {auth_token}"}
+        )
+        assert response.status_code == 422
+
+    def test_get_feed_query_count_independent_of_page_size(self, client, app, test_user, db, query_counter):
+        """Test that serializing nested user/goal/target does not issue a query per item."""
+        def add_followed_authors(count, offset):
+            for i in range(offset, offset + count):
+                author = _make_user(db, f"author{i}")
+                goal = _make_goal(db, author)
+                db.session.add(CheckInModel(user_id=author.id, goal_id=goal.id, content=f"Check-in {i}"))
+                db.session.add(FollowModel(follower_id=test_user.id, following_id=author.id))
+            db.session.commit()
+
+        with app.app_context():
+            token = create_access_token(identity=str(test_user.id), fresh=False)
+
+        counts = []
+        for count, offset in ((3, 0), (30, 3)):
+            add_followed_authors(count, offset)
+            with query_counter() as counter:
+                response = client.get("/feed", headers={"Authorization": f"Bearer {token}"})
+            assert response.status_code == 200
+            assert response.json["feed"][0]["user"]["username"].startswith("author")
+            assert response.json["feed"][0]["goal"]["title"] == "Goal"
+            counts.append(counter.count)
+
+        assert len(response.json["feed"]) == 33
+        # One ETag version lookup, one feed SELECT and one counts lookup
+        assert counts[0] == counts[1] == 3
 
 class TestFollowingFeed:
     def test_get_following_feed_shows_only_followed_users(self, client, app, test_user, db):
@@ -594,3 +682,972 @@ class TestCirclesFeed:
         """Test that circles feed requires authentication."""
         response = client.get("/feed/circles")
         assert response.status_code == 401
+
+
+def _make_user(db, username):
+    user = UserModel(
+        username=username,
+        email=f"{username}@example.com",
+        password_hash=pbkdf2_sha256.hash("password"),
+        is_staff=False
+    )
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def _make_goal(db, user):
+    goal = GoalModel(
+        title="Goal",
+        description="Goal",
+        goal_type="daily",
+        user_id=user.id,
+        is_active=True
+    )
+    db.session.add(goal)
+    db.session.commit()
+    return goal
+
+
+class TestFeedEntries:
+    def test_check_in_post_fans_out_to_followers(self, client, app, test_user, db):
+        """Test that a check-in created through the API lands in followers' feeds."""
+        author = _make_user(db, "author")
+        goal = _make_goal(db, author)
+        db.session.add(FollowModel(follower_id=test_user.id, following_id=author.id))
+        db.session.commit()
+
+        with app.app_context():
+            author_token = create_access_token(identity=str(author.id), fresh=False)
+            token = create_access_token(identity=str(test_user.id), fresh=False)
+
+        response = client.post(
+            f"/goal/{goal.id}/check-ins",
+            json={"content": "Fanned out"},
+            headers={"Authorization": f"Bearer {author_token}"}
+        )
+        assert response.status_code == 200
+
+        entry = FeedEntryModel.query.filter_by(owner_id=test_user.id).one()
+        assert entry.author_id == author.id
+        assert entry.via_follow is True
+        assert entry.via_circle is False
+
+        response = client.get("/feed/following", headers={"Authorization": f"Bearer {token}"})
+        assert [item["content"] for item in response.json["feed"]] == ["Fanned out"]
+
+    def test_unfollow_prunes_feed_entries(self, client, app, test_user, db):
+        """Test that unfollowing removes the user's check-ins from the feed."""
+        author = _make_user(db, "author")
+        goal = _make_goal(db, author)
+        db.session.add(CheckInModel(user_id=author.id, goal_id=goal.id, content="Gone soon"))
+        db.session.add(FollowModel(follower_id=test_user.id, following_id=author.id))
+        db.session.commit()
+
+        with app.app_context():
+            token = create_access_token(identity=str(test_user.id), fresh=False)
+
+        assert len(client.get("/feed", headers={"Authorization": f"Bearer {token}"}).json["feed"]) == 1
+
+        response = client.delete(f"/follow/{author.id}", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 201
+
+        assert FeedEntryModel.query.filter_by(owner_id=test_user.id).count() == 0
+        assert client.get("/feed", headers={"Authorization": f"Bearer {token}"}).json["feed"] == []
+
+    def test_unfollow_keeps_entries_still_shared_through_circle(self, client, app, test_user, db):
+        """Test that unfollowing a circle co-member keeps their check-ins in the circles feed."""
+        author = _make_user(db, "author")
+        goal = _make_goal(db, author)
+        circle = CircleModel(name="Circle", description="Test", created_by_id=test_user.id)
+        db.session.add(circle)
+        db.session.commit()
+        db.session.add(CircleMembershipModel(circle_id=circle.id, user_id=test_user.id))
+        db.session.add(CircleMembershipModel(circle_id=circle.id, user_id=author.id))
+        db.session.add(FollowModel(follower_id=test_user.id, following_id=author.id))
+        db.session.add(CheckInModel(user_id=author.id, goal_id=goal.id, content="Shared"))
+        db.session.commit()
+
+        with app.app_context():
+            token = create_access_token(identity=str(test_user.id), fresh=False)
+
+        client.delete(f"/follow/{author.id}", headers={"Authorization": f"Bearer {token}"})
+
+        entry = FeedEntryModel.query.filter_by(owner_id=test_user.id, author_id=author.id).one()
+        assert entry.via_follow is False
+        assert entry.via_circle is True
+        assert client.get("/feed/following", headers={"Authorization": f"Bearer {token}"}).json["feed"] == []
+        assert len(client.get("/feed/circles", headers={"Authorization": f"Bearer {token}"}).json["feed"]) == 1
+
+    def test_circle_join_and_leave_backfill_and_prune(self, client, app, test_user, test_circle, db):
+        """Test that joining a circle backfills both directions and leaving prunes them."""
+        member = _make_user(db, "member")
+        member_goal = _make_goal(db, member)
+        own_goal = _make_goal(db, test_user)
+        db.session.add(CircleMembershipModel(circle_id=test_circle.id, user_id=test_user.id))
+        db.session.add(CheckInModel(user_id=member.id, goal_id=member_goal.id, content="Member"))
+        db.session.add(CheckInModel(user_id=test_user.id, goal_id=own_goal.id, content="Mine"))
+        db.session.commit()
+
+        with app.app_context():
+            token = create_access_token(identity=str(test_user.id), fresh=False)
+
+        response = client.post(
+            f"/circle/{test_circle.id}/users",
+            json={"user_id": member.id},
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.status_code == 201
+        assert FeedEntryModel.query.filter_by(owner_id=test_user.id, author_id=member.id).count() == 1
+        assert FeedEntryModel.query.filter_by(owner_id=member.id, author_id=test_user.id).count() == 1
+
+        response = client.delete(
+            f"/circle/{test_circle.id}/users",
+            json={"user_id": member.id},
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.status_code == 200
+        assert FeedEntryModel.query.filter_by(owner_id=test_user.id, author_id=member.id).count() == 0
+        assert FeedEntryModel.query.filter_by(owner_id=member.id, author_id=test_user.id).count() == 0
+        # Own check-ins stay in the member's feed after leaving
+        assert FeedEntryModel.query.filter_by(owner_id=member.id, author_id=member.id).count() == 1
+
+    def test_circle_delete_prunes_circle_feed(self, client, app, test_user, test_circle, db):
+        """Test that deleting a circle removes former co-members' check-ins from the circle feed."""
+        member = _make_user(db, "member")
+        member_goal = _make_goal(db, member)
+        db.session.add(CircleMembershipModel(circle_id=test_circle.id, user_id=test_user.id))
+        db.session.add(CircleMembershipModel(circle_id=test_circle.id, user_id=member.id))
+        db.session.add(CheckInModel(user_id=member.id, goal_id=member_goal.id, content="Member"))
+        db.session.commit()
+        circle_id, user_id = test_circle.id, test_user.id
+
+        with app.app_context():
+            token = create_access_token(identity=str(user_id), fresh=True)
+        headers = {"Authorization": f"Bearer {token}"}
+        assert len(client.get("/feed/circles", headers=headers).json["feed"]) == 1
+
+        response = client.delete(f"/circle/{circle_id}", headers=headers)
+
+        assert response.status_code == 200
+        assert CircleMembershipModel.query.filter_by(circle_id=circle_id).count() == 0
+        assert client.get("/feed/circles", headers=headers).json["feed"] == []
+        assert FeedEntryModel.query.filter_by(owner_id=user_id, author_id=member.id).count() == 0
+
+    def test_buddy_accept_backfills_both_feeds(self, client, app, test_user, db):
+        """Test that accepting a buddy request backfills each buddy's check-ins."""
+        requester = _make_user(db, "requester")
+        requester_goal = _make_goal(db, requester)
+        own_goal = _make_goal(db, test_user)
+        db.session.add(CheckInModel(user_id=requester.id, goal_id=requester_goal.id, content="Theirs"))
+        db.session.add(CheckInModel(user_id=test_user.id, goal_id=own_goal.id, content="Mine"))
+        request = BuddyRequestModel(from_user_id=requester.id, to_user_id=test_user.id)
+        db.session.add(request)
+        db.session.commit()
+
+        with app.app_context():
+            token = create_access_token(identity=str(test_user.id), fresh=False)
+
+        response = client.post(
+            f"/buddy/request/{request.id}/accept",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.status_code == 200
+        assert FeedEntryModel.query.filter_by(
+            owner_id=test_user.id, author_id=requester.id, via_follow=True
+        ).count() == 1
+        assert FeedEntryModel.query.filter_by(
+            owner_id=requester.id, author_id=test_user.id, via_follow=True
+        ).count() == 1
+
+    def test_rebuild_matches_incremental_maintenance(self, app, test_user, test_circle, db):
+        """Test that a full rebuild reproduces the incrementally maintained table."""
+        author = _make_user(db, "author")
+        member = _make_user(db, "member")
+        for user in (test_user, author, member):
+            goal = _make_goal(db, user)
+            db.session.add(CheckInModel(user_id=user.id, goal_id=goal.id, content=user.username))
+        db.session.add(FollowModel(follower_id=test_user.id, following_id=author.id))
+        db.session.add(CircleMembershipModel(circle_id=test_circle.id, user_id=test_user.id))
+        db.session.add(CircleMembershipModel(circle_id=test_circle.id, user_id=member.id))
+        db.session.commit()
+
+        def snapshot():
+            return sorted(
+                (e.owner_id, e.check_in_id, e.via_self, e.via_follow, e.via_circle)
+                for e in FeedEntryModel.query.all()
+            )
+
+        incremental = snapshot()
+        rebuild_feed_entries(db.session.connection())
+        db.session.commit()
+
+        assert snapshot() == incremental
+
+
+class TestPullFeed:
+    @pytest.fixture(autouse=True)
+    def pull_strategy(self, app):
+        app.config["FEED_STRATEGY"] = "pull"
+        yield
+        app.config["FEED_STRATEGY"] = "fanout"
+
+    def test_pull_feed_matches_materialized_feed(self, client, app, test_user, test_circle, db):
+        """Test that the single-statement pull feed returns the same items as feed_entries."""
+        author = _make_user(db, "author")
+        member = _make_user(db, "member")
+        stranger = _make_user(db, "stranger")
+        for user in (test_user, author, member, stranger):
+            goal = _make_goal(db, user)
+            db.session.add(CheckInModel(user_id=user.id, goal_id=goal.id, content=user.username))
+        db.session.add(FollowModel(follower_id=test_user.id, following_id=author.id))
+        db.session.add(CircleMembershipModel(circle_id=test_circle.id, user_id=test_user.id))
+        db.session.add(CircleMembershipModel(circle_id=test_circle.id, user_id=member.id))
+        db.session.commit()
+
+        with app.app_context():
+            token = create_access_token(identity=str(test_user.id), fresh=False)
+
+        results = {}
+        for strategy in ("pull", "fanout"):
+            app.config["FEED_STRATEGY"] = strategy
+            results[strategy] = {
+                url: [item["id"] for item in client.get(
+                    url, headers={"Authorization": f"Bearer {token}"}
+                ).json["feed"]]
+                for url in ("/feed", "/feed/following", "/feed/circles")
+            }
+
+        assert results["pull"] == results["fanout"]
+        assert len(results["pull"]["/feed"]) == 3
+        assert len(results["pull"]["/feed/following"]) == 1
+        assert len(results["pull"]["/feed/circles"]) == 2
+
+
+class TestHybridFeed:
+    @pytest.fixture(autouse=True)
+    def hybrid_strategy(self, app):
+        app.config["FEED_STRATEGY"] = "hybrid"
+        app.config["FEED_HIGH_FANOUT_THRESHOLD"] = 2
+        app.config["FEED_HIGH_FANOUT_EXIT_THRESHOLD"] = 2
+        yield
+        app.config["FEED_STRATEGY"] = "fanout"
+        app.config["FEED_HIGH_FANOUT_THRESHOLD"] = 10000
+        app.config["FEED_HIGH_FANOUT_EXIT_THRESHOLD"] = 9000
+
+    def _celebrity(self, db, test_user):
+        """An author followed by test_user and one other user, i.e. at the threshold."""
+        celebrity = _make_user(db, "celebrity")
+        fan = _make_user(db, "fan")
+        db.session.add(FollowModel(follower_id=test_user.id, following_id=celebrity.id))
+        db.session.add(FollowModel(follower_id=fan.id, following_id=celebrity.id))
+        db.session.commit()
+        return celebrity, fan
+
+    def test_high_fanout_check_ins_are_pulled_not_fanned_out(self, client, auth_token, test_user, test_goal, db):
+        """Test that a high-fanout author's check-in skips fan-out but is merged into followers' feeds."""
+        celebrity, _ = self._celebrity(db, test_user)
+        assert celebrity.follower_count == 2
+        goal = _make_goal(db, celebrity)
+        now = datetime.utcnow()
+        skipped = metrics.get("feed.fanout.skipped")
+
+        db.session.add(CheckInModel(user_id=test_user.id, goal_id=test_goal.id, content="Own old",
+                                    created_at=now - timedelta(minutes=2)))
+        db.session.add(CheckInModel(user_id=celebrity.id, goal_id=goal.id, content="Pulled",
+                                    created_at=now - timedelta(minutes=1)))
+        db.session.add(CheckInModel(user_id=test_user.id, goal_id=test_goal.id, content="Own new",
+                                    created_at=now))
+        db.session.commit()
+
+        assert metrics.get("feed.fanout.skipped") == skipped + 1
+        assert FeedEntryModel.query.filter_by(author_id=celebrity.id).count() == 1  # the author's own entry
+
+        headers = {"Authorization": f"Bearer {auth_token}"}
+        response = client.get("/feed", headers=headers)
+        assert [item["content"] for item in response.json["feed"]] == ["Own new", "Pulled", "Own old"]
+
+        response = client.get("/feed/following", headers=headers)
+        assert [item["content"] for item in response.json["feed"]] == ["Pulled"]
+
+    def test_merged_pages_follow_the_cursor_without_duplicates(self, client, auth_token, test_user, test_goal, db):
+        """Test paging through a merged feed, including check-ins fanned out before the author crossed the threshold."""
+        celebrity = _make_user(db, "celebrity")
+        goal = _make_goal(db, celebrity)
+        db.session.add(FollowModel(follower_id=test_user.id, following_id=celebrity.id))
+        db.session.commit()
+
+        now = datetime.utcnow()
+        for i in range(3):
+            db.session.add(CheckInModel(user_id=celebrity.id, goal_id=goal.id, content=f"Early {i}",
+                                        created_at=now - timedelta(minutes=10 - i)))
+        db.session.commit()
+        # Second follower: from here on the celebrity is pulled, the early entries stay in feed_entries
+        db.session.add(FollowModel(follower_id=_make_user(db, "fan").id, following_id=celebrity.id))
+        db.session.commit()
+        for i in range(3):
+            db.session.add(CheckInModel(user_id=celebrity.id, goal_id=goal.id, content=f"Late {i}",
+                                        created_at=now - timedelta(minutes=5 - i)))
+            db.session.add(CheckInModel(user_id=test_user.id, goal_id=test_goal.id, content=f"Own {i}",
+                                        created_at=now - timedelta(minutes=5 - i, seconds=30)))
+        db.session.commit()
+
+        headers = {"Authorization": f"Bearer {auth_token}"}
+        seen = []
+        url = "/feed?limit=4"
+        while url:
+            body = client.get(url, headers=headers).json
+            seen += [item["content"] for item in body["feed"]]
+            url = f"/feed?limit=4&before={body['next_cursor']}" if body["next_cursor"] else None
+
+        assert seen == [
+            "Late 2", "Own 2", "Late 1", "Own 1", "Late 0", "Own 0",
+            "Early 2", "Early 1", "Early 0",
+        ]
+
+    def test_dropping_under_threshold_backfills_followers(self, client, auth_token, test_user, db):
+        """Test that once an author falls under the threshold their check-ins are fanned out again."""
+        celebrity, fan = self._celebrity(db, test_user)
+        goal = _make_goal(db, celebrity)
+        db.session.add(CheckInModel(user_id=celebrity.id, goal_id=goal.id, content="Pulled"))
+        db.session.commit()
+        assert FeedEntryModel.query.filter_by(owner_id=test_user.id).count() == 0
+
+        db.session.delete(FollowModel.query.get((fan.id, celebrity.id)))
+        db.session.commit()
+
+        assert celebrity.follower_count == 1
+        entry = FeedEntryModel.query.filter_by(owner_id=test_user.id).one()
+        assert entry.via_follow is True
+
+        response = client.get("/feed", headers={"Authorization": f"Bearer {auth_token}"})
+        assert [item["content"] for item in response.json["feed"]] == ["Pulled"]
+
+    def test_hovering_around_threshold_does_not_backfill(self, app, test_user, db, monkeypatch):
+        """Test that an author stays high-fanout until they drop below the exit threshold."""
+        monkeypatch.setitem(app.config, "FEED_HIGH_FANOUT_EXIT_THRESHOLD", 1)
+        celebrity, fan = self._celebrity(db, test_user)
+        celebrity_id = celebrity.id
+        goal = _make_goal(db, celebrity)
+        db.session.add(CheckInModel(user_id=celebrity.id, goal_id=goal.id, content="Pulled"))
+        db.session.commit()
+
+        for _ in range(3):
+            db.session.delete(FollowModel.query.get((fan.id, celebrity_id)))
+            db.session.commit()
+            db.session.add(FollowModel(follower_id=fan.id, following_id=celebrity_id))
+            db.session.commit()
+
+        assert db.session.get(UserModel, celebrity_id).high_fanout is True
+        assert FeedEntryModel.query.filter_by(author_id=celebrity_id).count() == 1  # the author's own entry
+
+        db.session.delete(FollowModel.query.get((fan.id, celebrity_id)))
+        db.session.delete(FollowModel.query.get((test_user.id, celebrity_id)))
+        db.session.commit()
+        assert db.session.get(UserModel, celebrity_id).high_fanout is False
+
+    def test_pulled_check_in_changes_etag(self, client, auth_token, test_user, db):
+        """Test that a new pulled check-in produces a new ETag and a fresh (uncached) page."""
+        celebrity, _ = self._celebrity(db, test_user)
+        goal = _make_goal(db, celebrity)
+        headers = {"Authorization": f"Bearer {auth_token}"}
+        first = client.get("/feed", headers=headers)
+        assert first.json["feed"] == []
+
+        db.session.add(CheckInModel(user_id=celebrity.id, goal_id=goal.id, content="Pulled"))
+        db.session.commit()
+
+        second = client.get("/feed", headers={**headers, "If-None-Match": first.headers["ETag"]})
+        assert second.status_code == 200
+        assert [item["content"] for item in second.json["feed"]] == ["Pulled"]
+
+    def test_since_includes_pulled_check_ins_and_deletions(self, client, auth_token, test_user, db):
+        """Test that /feed/since reports check-ins and deletions of pulled authors."""
+        celebrity, _ = self._celebrity(db, test_user)
+        goal = _make_goal(db, celebrity)
+        headers = {"Authorization": f"Bearer {auth_token}"}
+        cursor = client.get("/feed", headers=headers).json["since_cursor"]
+
+        check_in = CheckInModel(user_id=celebrity.id, goal_id=goal.id, content="Pulled")
+        db.session.add(check_in)
+        db.session.commit()
+        check_in_id = check_in.id
+
+        delta = client.get(f"/feed/since/{cursor}", headers=headers).json
+        assert [item["id"] for item in delta["feed"]] == [check_in_id]
+
+        db.session.delete(check_in)
+        db.session.commit()
+
+        delta = client.get(f"/feed/since/{delta['since_cursor']}", headers=headers).json
+        assert delta["feed"] == []
+        assert delta["deleted"] == [check_in_id]
+
+    def test_deleting_pulled_check_in_does_not_write_per_follower(self, client, auth_token, test_user, db):
+        """Test that a high-fanout author's deletion writes one tombstone and no follower versions, yet leaves feeds."""
+        celebrity, fan = self._celebrity(db, test_user)
+        goal = _make_goal(db, celebrity)
+        check_in = CheckInModel(user_id=celebrity.id, goal_id=goal.id, content="Oops")
+        db.session.add(check_in)
+        db.session.commit()
+        headers = {"Authorization": f"Bearer {auth_token}"}
+        first = client.get("/feed", headers=headers)
+        assert [item["content"] for item in first.json["feed"]] == ["Oops"]
+        versions = {u.id: u.feed_version for u in UserModel.query.filter(UserModel.id.in_([test_user.id, fan.id]))}
+
+        db.session.delete(check_in)
+        db.session.commit()
+
+        # One author-level tombstone (beside the author's own entry), none per follower
+        assert FeedTombstoneModel.query.filter_by(owner_id=None, author_id=celebrity.id).count() == 1
+        assert FeedTombstoneModel.query.filter(FeedTombstoneModel.owner_id.in_(versions)).count() == 0
+        db.session.expire_all()
+        assert {u.id: u.feed_version for u in UserModel.query.filter(UserModel.id.in_(versions))} == versions
+        response = client.get("/feed", headers={**headers, "If-None-Match": first.headers["ETag"]})
+        assert response.status_code == 200
+        assert response.json["feed"] == []
+
+    def test_rebuild_skips_high_fanout_authors(self, app, test_user, db):
+        """Test that a rebuild in hybrid mode recomputes follower counts and leaves pulled authors out."""
+        celebrity, fan = self._celebrity(db, test_user)
+        goal = _make_goal(db, celebrity)
+        db.session.add(CheckInModel(user_id=celebrity.id, goal_id=goal.id, content="Pulled"))
+        db.session.commit()
+        celebrity_id = celebrity.id
+        db.session.execute(UserModel.__table__.update().values(follower_count=0))
+        db.session.commit()
+
+        result = app.test_cli_runner().invoke(args=["feed", "rebuild"])
+        assert result.exit_code == 0
+
+        assert db.session.get(UserModel, celebrity_id).follower_count == 2
+        assert db.session.get(UserModel, celebrity_id).high_fanout is True
+        assert {entry.owner_id for entry in FeedEntryModel.query.filter_by(author_id=celebrity_id)} == {celebrity_id}
+
+
+def _legacy_feed_check_in_ids(session, user_id):
+    """The pre-feed_entries /feed path: three ID lookups merged in Python, then an IN scan."""
+    following_ids = [row[0] for row in session.query(FollowModel.following_id).filter(
+        FollowModel.follower_id == user_id
+    ).all()]
+    circle_ids = [row[0] for row in session.query(CircleMembershipModel.circle_id).filter(
+        CircleMembershipModel.user_id == user_id
+    ).all()]
+    circle_member_ids = [row[0] for row in session.query(CircleMembershipModel.user_id).filter(
+        CircleMembershipModel.circle_id.in_(circle_ids),
+        CircleMembershipModel.user_id != user_id
+    ).distinct().all()]
+    feed_user_ids = list(set(following_ids + circle_member_ids + [user_id]))
+    return [check_in.id for check_in in CheckInModel.query.filter(
+        CheckInModel.user_id.in_(feed_user_ids)
+    ).order_by(CheckInModel.created_at.desc(), CheckInModel.id.desc()).limit(50).all()]
+
+
+class TestFeedQueryBenchmark:
+    FOLLOWS = 10_000
+    CIRCLE_SIZE = 500
+
+    def test_single_statement_vs_legacy_lookups(self, app, test_user, test_circle, db, query_counter):
+        """A/B: the EXISTS-based pull query against the legacy multi-query path at 10k follows."""
+        base = datetime.utcnow()
+        db.session.execute(insert(UserModel.__table__), [
+            {"username": f"bench{i}", "email": f"bench{i}@example.com",
+             "password_hash": "x", "is_staff": False}
+            for i in range(self.FOLLOWS + self.CIRCLE_SIZE)
+        ])
+        user_ids = [row[0] for row in db.session.query(UserModel.id).filter(UserModel.id != test_user.id)]
+        followed, circle_members = user_ids[:self.FOLLOWS], user_ids[self.FOLLOWS:]
+
+        db.session.execute(insert(FollowModel.__table__), [
+            {"follower_id": test_user.id, "following_id": user_id,
+             "relationship_type": "follow", "created_at": base}
+            for user_id in followed
+        ])
+        db.session.execute(insert(CircleMembershipModel.__table__), [
+            {"circle_id": test_circle.id, "user_id": user_id, "joined_at": base, "role": "member"}
+            for user_id in circle_members + [test_user.id]
+        ])
+        db.session.execute(insert(CheckInModel.__table__), [
+            {"user_id": user_id, "content": "bench", "created_at": base - timedelta(minutes=i)}
+            for i, user_id in enumerate(user_ids[::3])
+        ])
+        db.session.commit()
+        viewer_id = test_user.id
+
+        with query_counter() as legacy_counter:
+            started = time.perf_counter()
+            legacy_ids = _legacy_feed_check_in_ids(db.session, viewer_id)
+            legacy_seconds = time.perf_counter() - started
+
+        with query_counter() as pull_counter:
+            started = time.perf_counter()
+            query, created_at_column, id_column = pull_feed_query(viewer_id, VARIANT_ALL)
+            pull_ids = [check_in.id for check_in in query.order_by(
+                created_at_column.desc(), id_column.desc()
+            ).limit(50).all()]
+            pull_seconds = time.perf_counter() - started
+
+        # Timings vary by machine, so they are logged (pytest --log-cli-level=INFO) rather than asserted
+        logger.info("legacy: %d queries, %.1f ms; single statement: %d queries, %.1f ms",
+                    legacy_counter.count, legacy_seconds * 1000, pull_counter.count, pull_seconds * 1000)
+
+        assert pull_ids == legacy_ids
+        assert len(pull_ids) == 50
+        assert legacy_counter.count == 4
+        assert pull_counter.count == 1
+
+
+class TestFeedCache:
+    def test_repeat_request_is_served_from_cache(self, client, app, test_user, test_goal, db, query_counter):
+        """Test that an unchanged feed is not recomputed."""
+        db.session.add(CheckInModel(user_id=test_user.id, goal_id=test_goal.id, content="Cached"))
+        db.session.commit()
+
+        with app.app_context():
+            token = create_access_token(identity=str(test_user.id), fresh=False)
+
+        hits = metrics.get("feed_cache.hits")
+        first = client.get("/feed", headers={"Authorization": f"Bearer {token}"})
+        with query_counter() as counter:
+            second = client.get("/feed", headers={"Authorization": f"Bearer {token}"})
+
+        assert second.status_code == 200
+        assert second.json == first.json
+        # Only the ETag version lookup and the page's counts reach the database
+        assert counter.count == 2
+        assert metrics.get("feed_cache.hits") == hits + 1
+
+    def test_new_check_in_invalidates_followers(self, client, app, test_user, db):
+        """Test that a followed user's new check-in evicts the follower's cached feed."""
+        author = _make_user(db, "author")
+        goal = _make_goal(db, author)
+        db.session.add(FollowModel(follower_id=test_user.id, following_id=author.id))
+        db.session.commit()
+
+        with app.app_context():
+            token = create_access_token(identity=str(test_user.id), fresh=False)
+
+        assert client.get("/feed", headers={"Authorization": f"Bearer {token}"}).json["feed"] == []
+
+        db.session.add(CheckInModel(user_id=author.id, goal_id=goal.id, content="Fresh"))
+        db.session.commit()
+
+        response = client.get("/feed", headers={"Authorization": f"Bearer {token}"})
+        assert [item["content"] for item in response.json["feed"]] == ["Fresh"]
+
+    def test_unfollow_invalidates_feed(self, client, app, test_user, db):
+        """Test that unfollowing evicts the cached feed."""
+        author = _make_user(db, "author")
+        goal = _make_goal(db, author)
+        db.session.add(CheckInModel(user_id=author.id, goal_id=goal.id, content="Gone soon"))
+        db.session.add(FollowModel(follower_id=test_user.id, following_id=author.id))
+        db.session.commit()
+
+        with app.app_context():
+            token = create_access_token(identity=str(test_user.id), fresh=False)
+
+        assert len(client.get("/feed/following", headers={"Authorization": f"Bearer {token}"}).json["feed"]) == 1
+        client.delete(f"/follow/{author.id}", headers={"Authorization": f"Bearer {token}"})
+        assert client.get("/feed/following", headers={"Authorization": f"Bearer {token}"}).json["feed"] == []
+
+    def test_circle_join_invalidates_existing_members(self, client, app, test_user, test_circle, db):
+        """Test that a new member's check-ins show up for members with a cached circles feed."""
+        member = _make_user(db, "member")
+        goal = _make_goal(db, member)
+        db.session.add(CircleMembershipModel(circle_id=test_circle.id, user_id=test_user.id))
+        db.session.add(CheckInModel(user_id=member.id, goal_id=goal.id, content="Newcomer"))
+        db.session.commit()
+
+        with app.app_context():
+            token = create_access_token(identity=str(test_user.id), fresh=False)
+
+        assert client.get("/feed/circles", headers={"Authorization": f"Bearer {token}"}).json["feed"] == []
+
+        db.session.add(CircleMembershipModel(circle_id=test_circle.id, user_id=member.id))
+        db.session.commit()
+
+        response = client.get("/feed/circles", headers={"Authorization": f"Bearer {token}"})
+        assert [item["content"] for item in response.json["feed"]] == ["Newcomer"]
+
+    def test_rolled_back_changes_do_not_invalidate(self, app, test_user, test_goal, db):
+        """Test that invalidations collected during a flush are dropped on rollback."""
+        invalidations = metrics.get("feed_cache.invalidations")
+
+        db.session.add(CheckInModel(user_id=test_user.id, goal_id=test_goal.id, content="Rolled back"))
+        db.session.flush()
+        db.session.rollback()
+
+        assert metrics.get("feed_cache.invalidations") == invalidations
+
+
+class TestLRUCacheBackend:
+    def test_evicts_least_recently_used(self):
+        backend = LRUCacheBackend(maxsize=2)
+        backend.set("a", 1)
+        backend.set("b", 2)
+        backend.get("a")
+        backend.set("c", 3)
+
+        assert backend.get("a") == 1
+        assert backend.get("b") is None
+        assert backend.get("c") == 3
+
+    def test_generation_counters_are_not_evicted(self):
+        backend = LRUCacheBackend(maxsize=1)
+        backend.incr("feed:gen:1")
+        backend.set("a", 1)
+        backend.set("b", 2)
+
+        assert backend.get("feed:gen:1") == 1
+
+    def test_entries_expire_after_ttl(self):
+        backend = LRUCacheBackend()
+        backend.set("a", 1, ttl=-1)
+
+        assert backend.get("a") is None
+
+    def test_backends_must_implement_the_interface(self):
+        class Partial(CacheBackend):
+            def get(self, key):
+                return None
+
+        with pytest.raises(TypeError):
+            Partial()
+
+
+class TestFeedETag:
+    def _get(self, client, token, url="/feed", etag=None):
+        headers = {"Authorization": f"Bearer {token}"}
+        if etag:
+            headers["If-None-Match"] = etag
+        return client.get(url, headers=headers)
+
+    def test_unchanged_feed_returns_304(self, client, auth_token, test_user, test_goal, db):
+        """Test that a matching If-None-Match short-circuits with 304."""
+        db.session.add(CheckInModel(user_id=test_user.id, goal_id=test_goal.id, content="Seen"))
+        db.session.commit()
+
+        first = self._get(client, auth_token)
+        assert first.status_code == 200
+        assert first.headers["ETag"]
+
+        misses = metrics.get("feed_cache.misses")
+        second = self._get(client, auth_token, etag=first.headers["ETag"])
+        assert second.status_code == 304
+        assert second.data == b""
+        # The page came from the feed cache; nothing was serialized
+        assert metrics.get("feed_cache.misses") == misses
+
+    def test_new_check_in_changes_etag(self, client, auth_token, test_user, test_goal, db):
+        """Test that a new check-in in the feed produces a new ETag."""
+        etag = self._get(client, auth_token).headers["ETag"]
+
+        db.session.add(CheckInModel(user_id=test_user.id, goal_id=test_goal.id, content="New"))
+        db.session.commit()
+
+        response = self._get(client, auth_token, etag=etag)
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+    def test_unfollow_changes_etag(self, client, app, test_user, db):
+        """Test that graph changes that remove items also produce a new ETag."""
+        author = _make_user(db, "author")
+        goal = _make_goal(db, author)
+        db.session.add(CheckInModel(user_id=author.id, goal_id=goal.id, content="Old news"))
+        db.session.add(FollowModel(follower_id=test_user.id, following_id=author.id))
+        db.session.commit()
+
+        with app.app_context():
+            token = create_access_token(identity=str(test_user.id), fresh=False)
+
+        etag = self._get(client, token, url="/feed/following").headers["ETag"]
+        client.delete(f"/follow/{author.id}", headers={"Authorization": f"Bearer {token}"})
+
+        response = self._get(client, token, url="/feed/following", etag=etag)
+        assert response.status_code == 200
+        assert response.json["feed"] == []
+
+    def test_comment_changes_etag(self, client, auth_token, test_user, test_goal, db):
+        """Test that a new comment produces a new ETag and a page with the new count, without touching feed versions."""
+        check_in = CheckInModel(user_id=test_user.id, goal_id=test_goal.id, content="Discuss")
+        db.session.add(check_in)
+        db.session.commit()
+
+        first = self._get(client, auth_token)
+        assert first.json["feed"][0]["comment_count"] == 0
+        version = db.session.get(UserModel, test_user.id).feed_version
+
+        db.session.add(CommentModel(user_id=test_user.id, check_in_id=check_in.id, content="Nice"))
+        db.session.commit()
+
+        response = self._get(client, auth_token, etag=first.headers["ETag"])
+        assert response.status_code == 200
+        assert response.headers["ETag"] != first.headers["ETag"]
+        assert response.json["feed"][0]["comment_count"] == 1
+        db.session.expire_all()
+        assert db.session.get(UserModel, test_user.id).feed_version == version
+
+    def test_etag_differs_per_variant_and_page(self, client, auth_token):
+        """Test that different feed variants and page sizes do not share ETags."""
+        etags = {
+            self._get(client, auth_token, url=url).headers["ETag"]
+            for url in ("/feed", "/feed/following", "/feed/circles", "/feed?limit=10")
+        }
+        assert len(etags) == 4
+
+
+class TestFeedSince:
+    def _since_cursor(self, client, token, url="/feed"):
+        return client.get(url, headers={"Authorization": f"Bearer {token}"}).json["since_cursor"]
+
+    def test_returns_only_new_check_ins(self, client, auth_token, test_user, test_goal, db):
+        """Test that the delta contains only check-ins added after the cursor."""
+        db.session.add(CheckInModel(user_id=test_user.id, goal_id=test_goal.id, content="Old"))
+        db.session.commit()
+        cursor = self._since_cursor(client, auth_token)
+
+        for content in ("New 1", "New 2"):
+            db.session.add(CheckInModel(user_id=test_user.id, goal_id=test_goal.id, content=content))
+        db.session.commit()
+
+        response = client.get(f"/feed/since/{cursor}", headers={"Authorization": f"Bearer {auth_token}"})
+        assert response.status_code == 200
+        assert [item["content"] for item in response.json["feed"]] == ["New 2", "New 1"]
+        assert response.json["deleted"] == []
+        assert response.json["has_more"] is False
+
+        # Polling again with the returned cursor yields nothing new
+        response = client.get(
+            f"/feed/since/{response.json['since_cursor']}",
+            headers={"Authorization": f"Bearer {auth_token}"}
+        )
+        assert response.json["feed"] == []
+
+    def test_empty_feed_cursor_picks_up_first_check_in(self, client, auth_token, test_user, test_goal, db):
+        """Test that the cursor handed out for an empty feed still sees the first item."""
+        cursor = self._since_cursor(client, auth_token)
+
+        db.session.add(CheckInModel(user_id=test_user.id, goal_id=test_goal.id, content="First"))
+        db.session.commit()
+
+        response = client.get(f"/feed/since/{cursor}", headers={"Authorization": f"Bearer {auth_token}"})
+        assert [item["content"] for item in response.json["feed"]] == ["First"]
+
+    def test_reports_removed_check_ins(self, client, app, test_user, db):
+        """Test that check-ins leaving the feed after an unfollow are reported as deleted."""
+        author = _make_user(db, "author")
+        goal = _make_goal(db, author)
+        check_in = CheckInModel(user_id=author.id, goal_id=goal.id, content="Leaving")
+        db.session.add(check_in)
+        db.session.add(FollowModel(follower_id=test_user.id, following_id=author.id))
+        db.session.commit()
+        check_in_id = check_in.id
+
+        with app.app_context():
+            token = create_access_token(identity=str(test_user.id), fresh=False)
+
+        cursor = self._since_cursor(client, token)
+        client.delete(f"/follow/{author.id}", headers={"Authorization": f"Bearer {token}"})
+
+        response = client.get(f"/feed/since/{cursor}", headers={"Authorization": f"Bearer {token}"})
+        assert response.json["feed"] == []
+        assert response.json["deleted"] == [check_in_id]
+
+    def test_deleted_check_in_is_removed_from_feeds(self, client, auth_token, test_user, test_goal, db):
+        """Test that deleting a check-in drops its feed entries and reports it."""
+        check_in = CheckInModel(user_id=test_user.id, goal_id=test_goal.id, content="Oops")
+        db.session.add(check_in)
+        db.session.commit()
+        check_in_id = check_in.id
+        cursor = self._since_cursor(client, auth_token)
+
+        db.session.delete(check_in)
+        db.session.commit()
+
+        assert FeedEntryModel.query.filter_by(check_in_id=check_in_id).count() == 0
+        response = client.get(f"/feed/since/{cursor}", headers={"Authorization": f"Bearer {auth_token}"})
+        assert response.json["deleted"] == [check_in_id]
+
+    def test_caps_delta_at_limit(self, client, auth_token, test_user, test_goal, db):
+        """Test that a capped delta can be continued from the returned cursor."""
+        cursor = self._since_cursor(client, auth_token)
+        for i in range(5):
+            db.session.add(CheckInModel(user_id=test_user.id, goal_id=test_goal.id, content=f"New {i}"))
+        db.session.commit()
+
+        first = client.get(f"/feed/since/{cursor}?limit=3", headers={"Authorization": f"Bearer {auth_token}"})
+        assert [item["content"] for item in first.json["feed"]] == ["New 2", "New 1", "New 0"]
+        assert first.json["has_more"] is True
+
+        second = client.get(
+            f"/feed/since/{first.json['since_cursor']}?limit=3",
+            headers={"Authorization": f"Bearer {auth_token}"}
+        )
+        assert [item["content"] for item in second.json["feed"]] == ["New 4", "New 3"]
+        assert second.json["has_more"] is False
+
+    def test_rejects_invalid_cursor(self, client, auth_token):
+        """Test that a malformed cursor is rejected."""
+        response = client.get("/feed/since/garbage", headers={"Authorization": f"Bearer {auth_token}"})
+        assert response.status_code == 400
+
+    def test_expired_cursor_returns_gone(self, client, auth_token):
+        """Test that cursors older than the tombstone retention require a reload."""
+        issued_at = datetime.utcnow() - timedelta(days=30)
+        cursor = encode_since_cursor(issued_at, 0, issued_at)
+
+        response = client.get(f"/feed/since/{cursor}", headers={"Authorization": f"Bearer {auth_token}"})
+        assert response.status_code == 410
+
+    def test_requires_authentication(self, client):
+        """Test that the delta endpoint requires authentication."""
+        response = client.get("/feed/since/anything")
+        assert response.status_code == 401
+
+
+class TestFeedCommands:
+    def test_rebuild_command(self, app, test_user, test_goal, db):
+        """Test that `flask feed rebuild` restores missing feed entries."""
+        db.session.add(CheckInModel(user_id=test_user.id, goal_id=test_goal.id, content="Mine"))
+        db.session.commit()
+        FeedEntryModel.query.delete()
+        db.session.commit()
+
+        result = app.test_cli_runner().invoke(args=["feed", "rebuild"])
+
+        assert result.exit_code == 0
+        assert FeedEntryModel.query.filter_by(owner_id=test_user.id).count() == 1
+
+    def test_prune_tombstones_command(self, app, test_user, db):
+        """Test that `flask feed prune-tombstones` only deletes expired tombstones."""
+        db.session.add(FeedTombstoneModel(
+            owner_id=test_user.id, check_in_id=1, removed_at=datetime.utcnow() - timedelta(days=30)
+        ))
+        db.session.add(FeedTombstoneModel(owner_id=test_user.id, check_in_id=2))
+        db.session.commit()
+
+        result = app.test_cli_runner().invoke(args=["feed", "prune-tombstones"])
+
+        assert result.exit_code == 0
+        assert [t.check_in_id for t in FeedTombstoneModel.query.all()] == [2]
+
+
+class TestFeedStream:
+    def test_stream_pushes_new_check_ins_to_followers(self, client, app, test_user, db):
+        """Test that a followed user's new check-in is pushed to the follower's stream."""
+        author = _make_user(db, "author")
+        goal = _make_goal(db, author)
+        db.session.add(FollowModel(follower_id=test_user.id, following_id=author.id))
+        db.session.commit()
+        # The stream hands its session back before blocking, which detaches test objects
+        user_id, author_id, goal_id = test_user.id, author.id, goal.id
+
+        with app.app_context():
+            token = create_access_token(identity=str(user_id), fresh=False)
+            author_token = create_access_token(identity=str(author_id), fresh=False)
+
+        response = client.get(
+            "/feed/stream",
+            headers={"Authorization": f"Bearer {token}"},
+            buffered=False
+        )
+        assert response.status_code == 200
+        assert response.mimetype == "text/event-stream"
+        events = (chunk.decode() for chunk in response.response)
+        assert next(events).startswith("retry:")
+
+        client.post(
+            f"/goal/{goal_id}/check-ins",
+            json={"content": "Live"},
+            headers={"Authorization": f"Bearer {author_token}"}
+        )
+        check_in = CheckInModel.query.filter_by(content="Live").one()
+
+        event = next(events)
+        assert event.startswith("event: check_in\n")
+        payload = json.loads(event.split("data: ", 1)[1])
+        assert payload["check_in_id"] == check_in.id
+        assert payload["user_id"] == author_id
+
+        response.close()
+        assert app.extensions["broker"].subscriber_count(f"feed:{user_id}") == 0
+
+    def test_stream_sends_keepalive_when_idle(self, client, app, auth_token):
+        """Test that an idle stream emits keep-alive comments."""
+        app.config["STREAM_KEEPALIVE_SECONDS"] = 0
+        try:
+            response = client.get(
+                "/feed/stream",
+                headers={"Authorization": f"Bearer {auth_token}"},
+                buffered=False
+            )
+            events = (chunk.decode() for chunk in response.response)
+            next(events)
+            assert next(events) == ": keep-alive\n\n"
+            response.close()
+        finally:
+            app.config["STREAM_KEEPALIVE_SECONDS"] = 15
+
+    def test_stream_requires_authentication(self, client):
+        """Test that the stream requires authentication."""
+        response = client.get("/feed/stream")
+        assert response.status_code == 401
+
+
+class TestBroker:
+    def test_slow_subscriber_drops_oldest(self):
+        broker = Broker(queue_size=2)
+        subscription = broker.subscribe("feed:1")
+        for i in range(3):
+            broker.publish("feed:1", i)
+
+        assert subscription.get(timeout=0) == 1
+        assert subscription.get(timeout=0) == 2
+        assert subscription.get(timeout=0) is None
+
+    def test_publish_only_reaches_channel_subscribers(self):
+        broker = Broker()
+        mine = broker.subscribe("feed:1")
+        other = broker.subscribe("feed:2")
+        broker.publish("feed:1", "hello")
+
+        assert mine.get(timeout=0) == "hello"
+        assert other.get(timeout=0) is None
+
+    def test_custom_backend_carries_messages(self):
+        class RecordingBackend(LocalBackend):
+            def __init__(self):
+                self.sent = []
+
+            def publish(self, channel, message):
+                self.sent.append((channel, message))
+                super().publish(channel, message)
+
+        backend = RecordingBackend()
+        broker = Broker(backend)
+        subscription = broker.subscribe("feed:1")
+        broker.publish("feed:1", "hello")
+
+        assert backend.sent == [("feed:1", "hello")]
+        assert subscription.get(timeout=0) == "hello"
+
+    def test_backends_must_implement_the_interface(self):
+        class AttachOnly(BrokerBackend):
+            def attach(self, deliver):
+                self.deliver = deliver
+
+        with pytest.raises(TypeError):
+            Broker(AttachOnly())
+
+    def test_subscription_spans_several_channels(self):
+        broker = Broker()
+        subscription = broker.subscribe("feed:1", "author:2")
+        broker.publish("author:2", "pulled")
+        broker.publish("feed:1", "pushed")
+
+        assert subscription.get(timeout=0) == "pulled"
+        assert subscription.get(timeout=0) == "pushed"
+
+        broker.unsubscribe(subscription)
+        assert broker.subscriber_count("feed:1") == 0
+        assert broker.subscriber_count("author:2") == 0
@@ -4,7 +4,8 @@ from flask_jwt_extended import create_access_token
 from models import GoalModel, CheckInModel
 from db import db
 from sqlalchemy.exc import SQLAlchemyError
-from datetime import datetime
+from datetime import datetime, date, timedelta
+from services.streaks import period_index, recompute_goal_streaks
 
 
 class TestGoalList:
@@ -334,3 +335,123 @@ class TestGoalCheckInList:
         )
 
         assert response.status_code == 404
+
+    def test_get_goal_check_ins_not_modified(self, client, test_goal, auth_token, db):
+        """Test that an unchanged check-in list returns 304 and a new check-in changes the ETag."""
+        first = client.get(
+            f"/goal/{test_goal.id}/check-ins",
+            headers={"Authorization": f"Bearer {auth_token}"}
+        )
+        etag = first.headers["ETag"]
+
+        response = client.get(
+            f"/goal/{test_goal.id}/check-ins",
+            headers={"Authorization": f"Bearer {auth_token}", "If-None-Match": etag}
+        )
+        assert response.status_code == 304
+
+        db.session.add(CheckInModel(content="New", goal_id=test_goal.id, user_id=test_goal.user_id))
+        db.session.commit()
+
+        response = client.get(
+            f"/goal/{test_goal.id}/check-ins",
+            headers={"Authorization": f"Bearer {auth_token}", "If-None-Match": etag}
+        )
+        assert response.status_code == 200
+        assert len(response.json["check_ins"]) == 1
+
+
+class TestGoalStreaks:
+    def _check_in(self, db, goal, days_ago):
+        db.session.add(CheckInModel(content="Done", goal_id=goal.id, user_id=goal.user_id,
+                                    created_at=datetime.utcnow() - timedelta(days=days_ago)))
+        db.session.commit()
+
+    def _streaks(self, db, goal_id):
+        goal = db.session.get(GoalModel, goal_id)
+        db.session.refresh(goal)
+        return goal.current_streak, goal.longest_streak
+
+    def test_consecutive_check_ins_extend_streak(self, client, test_goal, auth_token, db):
+        """Test that daily check-ins on consecutive days build a streak exposed on the goal."""
+        goal_id = test_goal.id
+        for days_ago in (5, 4, 2, 1):
+            self._check_in(db, test_goal, days_ago)
+        assert self._streaks(db, goal_id) == (2, 2)
+
+        # A second check-in the same day does not count twice
+        client.post(f"/goal/{goal_id}/check-ins", json={"content": "Today"},
+                    headers={"Authorization": f"Bearer {auth_token}"})
+        client.post(f"/goal/{goal_id}/check-ins", json={"content": "Again"},
+                    headers={"Authorization": f"Bearer {auth_token}"})
+        assert self._streaks(db, goal_id) == (3, 3)
+
+        response = client.get(f"/goal/{goal_id}", headers={"Authorization": f"Bearer {auth_token}"})
+        assert response.json["current_streak"] == 3
+        assert response.json["longest_streak"] == 3
+
+    def test_missed_period_breaks_current_streak(self, client, test_goal, auth_token, db):
+        """Test that a streak reads as 0 once a whole period passes without a check-in."""
+        for days_ago in (6, 5, 4):
+            self._check_in(db, test_goal, days_ago)
+
+        response = client.get(f"/goal/{test_goal.id}", headers={"Authorization": f"Bearer {auth_token}"})
+        assert response.json["current_streak"] == 0
+        assert response.json["longest_streak"] == 3
+
+    def test_back_dated_and_deleted_check_ins_recompute(self, test_goal, db):
+        """Test that filling a gap joins two runs and deleting a check-in splits them again."""
+        goal_id = test_goal.id
+        for days_ago in (4, 3, 1, 0):
+            self._check_in(db, test_goal, days_ago)
+        assert self._streaks(db, goal_id) == (2, 2)
+
+        self._check_in(db, test_goal, 2)
+        assert self._streaks(db, goal_id) == (5, 5)
+
+        db.session.delete(CheckInModel.query.filter_by(goal_id=goal_id).order_by(CheckInModel.id).first())
+        db.session.commit()
+        assert self._streaks(db, goal_id) == (4, 4)
+
+    def test_weekly_goals_count_weeks(self, test_user, db):
+        """Test that weekly goals advance once per week."""
+        goal = GoalModel(title="Weekly", goal_type=GoalModel.TYPE_WEEKLY, user_id=test_user.id, is_active=True)
+        db.session.add(goal)
+        db.session.commit()
+        for days_ago in (14, 7, 7, 0):
+            self._check_in(db, goal, days_ago)
+
+        assert self._streaks(db, goal.id) == (3, 3)
+
+    def test_changing_goal_type_recomputes_streaks(self, test_goal, db):
+        """Test that switching a daily goal to weekly recounts its history in weeks."""
+        goal_id = test_goal.id
+        for days_ago in (14, 7, 0):
+            self._check_in(db, test_goal, days_ago)
+        assert self._streaks(db, goal_id) == (1, 1)
+
+        goal = db.session.get(GoalModel, goal_id)
+        goal.goal_type = GoalModel.TYPE_WEEKLY
+        db.session.commit()
+
+        assert self._streaks(db, goal_id) == (3, 3)
+
+    def test_recompute_streaks_command(self, app, test_goal, db):
+        """Test that the batch recompute repairs drifted streak state."""
+        goal_id = test_goal.id
+        for days_ago in (2, 1, 0):
+            self._check_in(db, test_goal, days_ago)
+        db.session.execute(GoalModel.__table__.update().values(current_streak=0, longest_streak=9, last_period=None))
+        db.session.commit()
+
+        result = app.test_cli_runner().invoke(args=["goals", "recompute-streaks"])
+
+        assert result.exit_code == 0
+        assert self._streaks(db, goal_id) == (3, 3)
+
+    def test_period_index(self):
+        monday = date(2026, 10, 12)
+        assert period_index(GoalModel.TYPE_WEEKLY, monday) == period_index(GoalModel.TYPE_WEEKLY, monday + timedelta(days=6))
+        assert period_index(GoalModel.TYPE_WEEKLY, monday + timedelta(days=7)) == period_index(GoalModel.TYPE_WEEKLY, monday) + 1
+        assert period_index(GoalModel.TYPE_MONTHLY, date(2026, 12, 31)) + 1 == period_index(GoalModel.TYPE_MONTHLY, date(2027, 1, 1))
+        assert period_index(GoalModel.TYPE_DAILY, datetime(2026, 10, 12, 23, 59)) == monday.toordinal()
@@ -0,0 +1,31 @@
+import pytest
+from services import metrics
+
+
+class TestMetrics:
+    def test_get_metrics_as_admin(self, client, admin_token):
+        """Test that admins can read the worker's counters."""
+        metrics.incr("test.counter")
+
+        response = client.get(
+            "/metrics",
+            headers={"Authorization": f"Bearer {admin_token}"}
+        )
+
+        assert response.status_code == 200
+        assert response.json["counters"]["test.counter"] >= 1
+
+    def test_get_metrics_requires_admin(self, client, admin_user, test_user, auth_token):
+        """Test that non-admin users cannot read metrics."""
+        response = client.get(
+            "/metrics",
+            headers={"Authorization": f"Bearer {auth_token}"}
+        )
+
+        assert response.status_code == 401
+
+    def test_get_metrics_requires_authentication(self, client):
+        """Test that metrics require authentication."""
+        response = client.get("/metrics")
+
+        assert response.status_code == 401
@@ -138,6 +138,18 @@ class TestReaction:
         assert response.status_code == 200
         assert response.json["message"] == "The reaction was successfully removed."
 
+    def test_delete_reaction_decrements_count(self, client, test_reaction_on_check_in, test_check_in, auth_token, db):
+        """Test that removing a reaction lowers the check-in's reaction_count."""
+        check_in_id = test_check_in.id
+        assert db.session.get(CheckInModel, check_in_id).reaction_count == 1
+
+        client.delete(
+            f"/reactions/{test_reaction_on_check_in.id}",
+            headers={"Authorization": f"Bearer {auth_token}"}
+        )
+
+        assert db.session.get(CheckInModel, check_in_id).reaction_count == 0
+
     def test_delete_reaction_unauthorized(self, client, test_reaction_on_check_in, app, db):
         """Test deleting a reaction by a different user (unauthorized)."""
         # Create another user